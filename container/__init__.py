@@ -12,7 +12,33 @@ from services.handle_auth import verify_jwt_token, AuthError
 from services.handle_api_keys import validate_api_key
 
 app = Flask(__name__)
-CORS(app, expose_headers=["X-Total-Count", "X-Page-Size", "X-Page-Number", "X-Total-Pages"])
+CORS(app, expose_headers=["X-Total-Count", "X-Page-Size", "X-Page-Number", "X-Total-Pages", "X-Next-Cursor"])
+
+def authenticate_header(auth_header: str) -> dict:
+    """Resolve an Authorization header (API key or Bearer JWT) to the caller identity.
+
+    Shared by the Flask `login_required` decorator and the ASGI ask route.
+    Raises AuthError when the credentials are rejected.
+    """
+    # Check if it's an API key (starts with 'pk_')
+    if auth_header.startswith('pk_'):
+        # API key authentication
+        validation_result = validate_api_key(auth_header)
+        if not validation_result:
+            raise AuthError("Invalid API key", 401)
+        return {
+            "user_id": validation_result['user_id'],
+            "api_key_id": validation_result['api_key_id'],
+            "permissions": validation_result['permissions'],
+        }
+    # JWT token authentication
+    token = auth_header.split(" ")[1]
+    payload = verify_jwt_token(token)
+    return {
+        "user_id": payload['user_id'],
+        "api_key_id": None,
+        "permissions": [],
+    }
 
 def login_required(f):
     @wraps(f)
@@ -22,22 +48,10 @@ def login_required(f):
             return jsonify({"error": "No authorization header"}), 401
 
         try:
-            # Check if it's an API key (starts with 'pk_')
-            if auth_header.startswith('pk_'):
-                # API key authentication
-                validation_result = validate_api_key(auth_header)
-                if not validation_result:
-                    return jsonify({"error": "Invalid API key"}), 401
-                g.user_id = validation_result['user_id']
-                g.api_key_id = validation_result['api_key_id']
-                g.permissions = validation_result['permissions']
-            else:
-                # JWT token authentication
-                token = auth_header.split(" ")[1]
-                payload = verify_jwt_token(token)
-                g.user_id = payload['user_id']
-                g.api_key_id = None
-                g.permissions = []
+            identity = authenticate_header(auth_header)
+            g.user_id = identity['user_id']
+            g.api_key_id = identity['api_key_id']
+            g.permissions = identity['permissions']
             
             return f(*args, **kwargs)
         except AuthError as e:
@@ -47,6 +61,11 @@ def login_required(f):
 
     return decorated_function
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness probe. Must stay free of auth and database calls."""
+    return jsonify({"status": "ok"}), 200
+
 from controllers.auth_controller import *
 from controllers.document_controller import *
 from controllers.section_controller import *
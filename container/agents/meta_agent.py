@@ -6,7 +6,8 @@ from langchain_core.tools import tool
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
-from libs.weaviate_lib import client, search_documents, insert_to_collection, update_collection_object, delete_collection_object, COLLECTION_AGENTS
+from libs.weaviate_lib import client, search_documents, insert_to_collection, update_collection_object, delete_collection_object, COLLECTION_AGENTS, get_query_vector
+from services.agent_runtime import invalidate_agent_runtime
 from data_classes.common_classes import Message, Language, AgentStatus
 from datetime import datetime
 import uuid
@@ -142,6 +143,7 @@ def update_agent(agent_id: str, **kwargs) -> Dict[str, Any]:
         
         # Update in Weaviate
         success = update_collection_object(COLLECTION_AGENTS, agent_id, update_data)
+        invalidate_agent_runtime(agent_id)
         
         if success:
             return {"message": f"Agent '{agent_id}' updated successfully", "updated_fields": list(update_data.keys())}
@@ -163,6 +165,7 @@ def delete_agent(agent_id: str) -> Dict[str, Any]:
     """
     try:
         success = delete_collection_object(COLLECTION_AGENTS, agent_id)
+        invalidate_agent_runtime(agent_id)
         
         if success:
             return {"message": f"Agent '{agent_id}' deleted successfully"}
@@ -185,8 +188,8 @@ def search_agents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     """
     try:
         collection = client.collections.get(COLLECTION_AGENTS)
-        response = collection.query.near_text(
-            query=query,
+        response = collection.query.near_vector(
+            near_vector=get_query_vector(query),
             limit=limit,
             certainty=0.7
         )
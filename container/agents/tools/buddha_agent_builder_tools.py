@@ -2,7 +2,8 @@ import json
 from typing import List, Dict, Any
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate
-from libs.weaviate_lib import client, insert_to_collection, COLLECTION_AGENTS, COLLECTION_DOCUMENTS, get_object_by_id
+from libs.weaviate_lib import client, insert_to_collection, COLLECTION_AGENTS, COLLECTION_DOCUMENTS, get_object_by_id, get_query_vector, bump_collection_generation
+from services.agent_runtime import invalidate_agent_runtime
 from datetime import datetime
 import uuid
 from weaviate.collections.classes.filters import Filter
@@ -498,8 +499,8 @@ def search_buddhist_agents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     """
     try:
         collection = client.collections.get(COLLECTION_AGENTS)
-        response = collection.query.near_text(
-            query=query,
+        response = collection.query.near_vector(
+            near_vector=get_query_vector(query),
             limit=limit,
             certainty=0.7,
             filters=Filter.by_property("agent_type").equal("buddhist")
@@ -757,6 +758,8 @@ def update_buddhist_agent(agent_id: str, updates: Dict[str, Any]) -> Dict[str, A
             uuid=agent_id,
             properties=update_data
         )
+        bump_collection_generation(COLLECTION_AGENTS, update_data, agent_id)
+        invalidate_agent_runtime(agent_id)
         
         return {
             "agent_id": agent_id,
@@ -793,6 +796,8 @@ def delete_buddhist_agent(agent_id: str) -> Dict[str, Any]:
         
         # Delete the agent
         collection.data.delete_by_id(agent_id)
+        bump_collection_generation(COLLECTION_AGENTS, uuid=agent_id)
+        invalidate_agent_runtime(agent_id)
         
         return {
             "agent_id": agent_id,
@@ -0,0 +1,96 @@
+"""
+ASGI entry point.
+
+The ask endpoint is served natively on the event loop (services/handle_ask_async.py);
+every other route is the unchanged Flask app mounted through a WSGI bridge.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+or under gunicorn:
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+"""
+import asyncio
+import contextlib
+import logging
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from __init__ import app as flask_app, authenticate_header
+from services.handle_auth import AuthError
+from services.handle_ask import handle_ask_non_streaming, AskError
+from services.handle_ask_async import handle_ask_streaming_async
+from data_classes.common_classes import AskRequest, Message, Language
+from libs.weaviate_lib import close_async_client, flush_writes
+from libs.side_tasks import side_tasks
+
+logger = logging.getLogger(__name__)
+
+async def ask_endpoint(request: Request):
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return JSONResponse({"error": "No authorization header"}, status_code=401)
+    try:
+        # API key validation still uses the sync Weaviate client.
+        await asyncio.to_thread(authenticate_header, auth_header)
+    except AuthError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception:
+        return JSONResponse({"error": "Invalid authorization"}, status_code=401)
+
+    session_id = request.path_params["session_id"]
+    try:
+        # 1. prepare payload
+        body = await request.json()
+        messages = [Message(**msg) for msg in body.get('messages', [])]
+        ask_request = AskRequest(
+            messages=messages,
+            session_id=session_id,
+            language=body.get('language', Language.VI),
+            options=body.get('options'),
+            model=body.get('model', 'gpt-4o'),
+            agent_id=body.get('agent_id'),
+            context=body.get('context'),
+        )
+        # 2. handle request
+        is_streaming = ask_request.options and ask_request.options.get("stream", False)
+        try:
+            if is_streaming:
+                stream = await handle_ask_streaming_async(ask_request, False)
+                return StreamingResponse(stream, media_type='application/json')
+            results = await asyncio.to_thread(handle_ask_non_streaming, ask_request)
+            return JSONResponse(results, status_code=200)
+        except AskError as e:
+            return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        logger.error(f"Error processing ask: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    yield
+    await close_async_client()
+    await asyncio.to_thread(side_tasks.flush)
+    await asyncio.to_thread(flush_writes)
+
+app = Starlette(
+    routes=[
+        Route('/api/v1/chat/{session_id}/ask', ask_endpoint, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    # Same policy as flask_cors in __init__.py; the bridged Flask routes keep
+    # theirs, this one also answers preflight for the native ask route.
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["X-Total-Count", "X-Page-Size", "X-Page-Number", "X-Total-Pages", "X-Next-Cursor"],
+        ),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,147 @@
+"""
+Throughput/quality benchmark for the chunking strategies in libs/chunker.py.
+
+Every strategy chunks the same corpus and is reported with:
+
+- `seconds` and `tokens/s`: chunking time and throughput;
+- `chunks`, `avg tok`, `p95 tok`: how many chunks and how large;
+- `chunk embeds`: texts embedded while chunking (the semantic strategy
+  embeds one window per sentence);
+- `embeds/1k tok`: chunk embeds plus one embed per chunk at upload, per
+  thousand corpus tokens, i.e. the ingestion cost;
+- `purity`: share of each chunk's words that belong to its dominant topic,
+  averaged over chunks (synthetic corpus only, whose paragraphs switch topic).
+
+    python benchmarks/bench_chunking.py                       # synthetic corpus, hashed embeddings
+    python benchmarks/bench_chunking.py --text book.txt       # your own corpus
+    python benchmarks/bench_chunking.py --embeddings openai   # real embeddings (needs OPENAI_API_KEY)
+
+Hashed embeddings are bag-of-words vectors: deterministic, offline, and
+enough to separate the synthetic topics. Use `--embeddings openai` to measure
+real semantic breakpoints and latency.
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+CONTAINER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONTAINER_DIR)
+
+import numpy as np
+from data_classes.common_classes import ChunkingStrategy
+from libs.chunker import chunk_text, count_tokens, embed_model
+
+TOPICS = {
+    "breath": "breath inhale exhale lungs rhythm nostrils air counting pause calm",
+    "ethics": "precept honesty harm kindness speech conduct vow restraint virtue duty",
+    "impermanence": "change decay arising passing moment flux transient aging season river",
+    "community": "sangha monastery teacher student gathering retreat sharing support elder guest",
+    "food": "meal rice bowl alms gratitude hunger nourishment kitchen harvest tea",
+}
+FILLER = "the a of and to in with is are was this that it for on as".split()
+
+
+def build_corpus(paragraphs: int, seed: int = 0) -> Tuple[str, Dict[str, str]]:
+    """Paragraphs of 4-10 sentences, each drawn from one topic's vocabulary."""
+    rng = random.Random(seed)
+    word_topic = {word: topic for topic, words in TOPICS.items() for word in words.split()}
+    names = list(TOPICS)
+    parts = []
+    for _ in range(paragraphs):
+        vocabulary = TOPICS[rng.choice(names)].split()
+        sentences = []
+        for _ in range(rng.randint(4, 10)):
+            words = [rng.choice(vocabulary if rng.random() < 0.6 else FILLER) for _ in range(rng.randint(8, 18))]
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        parts.append(" ".join(sentences))
+    return "\n\n".join(parts), word_topic
+
+
+class HashedEmbeddings:
+    """Deterministic bag-of-words embeddings (hashing trick), counting the texts it embeds."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            word = word.strip(".?!,")
+            if word in FILLER:
+                continue
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class CountingEmbeddings:
+    """Wraps the production chunker embeddings to count embedded texts."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.embedded = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded += len(texts)
+        return self.embeddings.embed_documents(texts)
+
+
+def purity(chunks: List[str], word_topic: Dict[str, str]) -> Optional[float]:
+    scores = []
+    for chunk in chunks:
+        topics = [word_topic[w] for w in (word.strip(".?!,").lower() for word in chunk.split()) if w in word_topic]
+        if topics:
+            scores.append(max(topics.count(topic) for topic in set(topics)) / len(topics))
+    return statistics.mean(scores) if scores else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text", help="UTF-8 text file to chunk instead of the synthetic corpus")
+    parser.add_argument("--paragraphs", type=int, default=400, help="synthetic corpus size")
+    parser.add_argument("--embeddings", choices=["hashed", "openai"], default="hashed")
+    parser.add_argument(
+        "--strategies", nargs="+", default=[strategy.value for strategy in ChunkingStrategy],
+        choices=[strategy.value for strategy in ChunkingStrategy],
+    )
+    args = parser.parse_args()
+
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            text, word_topic = f.read(), {}
+    else:
+        text, word_topic = build_corpus(args.paragraphs)
+    corpus_tokens = count_tokens(text)
+    print(f"corpus: {len(text):,} chars, {corpus_tokens:,} tokens, embeddings: {args.embeddings}")
+
+    header = f"{'strategy':>16} {'seconds':>8} {'tokens/s':>10} {'chunks':>7} {'avg tok':>8} {'p95 tok':>8} {'chunk embeds':>13} {'embeds/1k tok':>14} {'purity':>7}"
+    print(header)
+    for name in args.strategies:
+        embeddings = HashedEmbeddings() if args.embeddings == "hashed" else CountingEmbeddings(embed_model)
+        started = time.perf_counter()
+        chunks = [chunk.page_content for chunk in chunk_text(text, name, embeddings=embeddings)]
+        seconds = time.perf_counter() - started
+        sizes = sorted(count_tokens(chunk) for chunk in chunks)
+        score = purity(chunks, word_topic) if word_topic else None
+        print(
+            f"{name:>16} {seconds:>8.2f} {corpus_tokens / seconds:>10,.0f} {len(chunks):>7} "
+            f"{statistics.mean(sizes):>8.0f} {sizes[int(len(sizes) * 0.95) - 1 if len(sizes) > 1 else 0]:>8} "
+            f"{embeddings.embedded:>13} {(embeddings.embedded + len(chunks)) / corpus_tokens * 1000:>14.2f} "
+            f"{score if score is None else round(score, 3)!s:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
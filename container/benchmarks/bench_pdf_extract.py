@@ -0,0 +1,112 @@
+"""
+Benchmark for page-parallel PDF text extraction (libs/pdf_extract.py).
+
+Builds a synthetic text PDF (or uses `--pdf`) and compares:
+
+- `baseline`: the previous single-threaded `text += page.extract_text()` loop;
+- `iter_pdf_pages` with each `--workers` count, reporting the time to the
+  first page (when chunking can start) and to the last page.
+
+    python benchmarks/bench_pdf_extract.py --pages 500 --workers 1 2 4 8
+
+Only pypdf is needed; nothing is embedded or uploaded.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from typing import Dict, List
+
+CONTAINER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONTAINER_DIR)
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from libs.pdf_extract import iter_pdf_pages
+
+WORDS = (
+    "mind breath attention practice suffering compassion wisdom impermanence "
+    "path effort concentration view intention speech action livelihood"
+).split()
+
+
+def build_pdf(path: str, pages: int, lines_per_page: int = 55, seed: int = 0):
+    """Write a `pages`-page PDF of Helvetica text lines."""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for _ in range(pages):
+        page = writer.add_blank_page(612, 792)
+        lines = []
+        for _ in range(lines_per_page):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "."
+            lines.append(f"({sentence}) '".encode())
+        content = DecodedStreamObject()
+        content.set_data(b"BT /F1 10 Tf 13 TL 40 760 Td " + b" ".join(lines) + b" ET")
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def run_baseline(path: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    reader = PdfReader(path)
+    text = ""
+    first = None
+    for page in reader.pages:
+        text += page.extract_text() + "\n\n"
+        first = first or time.perf_counter() - started
+    return {"first_page": first, "total": time.perf_counter() - started, "chars": len(text)}
+
+
+def run_parallel(path: str, workers: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    first = None
+    pages: List[str] = []
+    for _, text in iter_pdf_pages(path, workers=workers):
+        first = first or time.perf_counter() - started
+        pages.append(text + "\n\n")
+    return {"first_page": first, "total": time.perf_counter() - started, "chars": len("".join(pages))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="existing PDF to use instead of a synthetic one")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    path = args.pdf
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), f"bench_{args.pages}_pages.pdf")
+        if not os.path.exists(path):
+            print(f"Building {args.pages}-page PDF at {path}...")
+            build_pdf(path, args.pages)
+    print(f"{path}: {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+    baseline = run_baseline(path)
+    print(f"{'mode':>12} {'first page':>11} {'total':>8} {'speedup':>8}")
+    print(f"{'baseline':>12} {baseline['first_page']:>10.2f}s {baseline['total']:>7.2f}s {1:>7.2f}x")
+    for workers in args.workers:
+        # The first parallel run pays for spawning the pool; measure a warm one.
+        if workers > 1:
+            run_parallel(path, workers)
+        result = run_parallel(path, workers)
+        assert result["chars"] == baseline["chars"], "extracted text differs from the baseline"
+        print(
+            f"{f'workers={workers}':>12} {result['first_page']:>10.2f}s {result['total']:>7.2f}s "
+            f"{baseline['total'] / result['total']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Load test for concurrent SSE streams.
+
+Two modes:
+
+1. Scaling sweep against the stub app (no credentials needed). Starts gunicorn
+   with `benchmarks/stub_stream_app.py` once per worker count and fires
+   `--streams` concurrent streams at it:
+
+       python benchmarks/load_test_streams.py sweep --workers 1 2 4 --threads 1 --streams 16
+
+   With `--threads 1` every worker holds exactly one stream at a time, so wall
+   time should drop roughly linearly with the worker count.
+
+2. Load against a running server (e.g. the real `/api/v1/chat/<id>/ask`):
+
+       python benchmarks/load_test_streams.py target \\
+           --url http://localhost:8080/api/v1/chat/<session_id>/ask \\
+           --token "$JWT" --agent-id <agent_id> --streams 32
+
+Only the standard library is used on the client side, so the numbers are not
+skewed by an async client.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import statistics
+import subprocess
+import threading
+import urllib.request
+from typing import List, Dict, Any, Optional
+
+CONTAINER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_stream(url: str, body: Optional[bytes], headers: Dict[str, str]) -> Dict[str, Any]:
+    """Open one stream and read it to the end, recording TTFB and total time."""
+    started = time.perf_counter()
+    first_byte: Optional[float] = None
+    size = 0
+    try:
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST" if body else "GET")
+        with urllib.request.urlopen(request, timeout=600) as response:
+            while True:
+                chunk = response.read1(4096)
+                if not chunk:
+                    break
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+        return {"ok": True, "ttfb": first_byte, "total": time.perf_counter() - started, "bytes": size}
+    except Exception as e:
+        return {"ok": False, "error": str(e), "total": time.perf_counter() - started}
+
+
+def run_load(url: str, streams: int, body: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Fire `streams` concurrent streams and summarise the results."""
+    headers = headers or {}
+    results: List[Dict[str, Any]] = [None] * streams
+    barrier = threading.Barrier(streams)
+
+    def worker(index: int):
+        barrier.wait()
+        results[index] = run_stream(url, body, headers)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    ttfbs = sorted(r["ttfb"] for r in ok if r["ttfb"] is not None)
+    return {
+        "streams": streams,
+        "succeeded": len(ok),
+        "failed": streams - len(ok),
+        "wall_seconds": round(wall, 3),
+        "streams_per_second": round(len(ok) / wall, 3) if wall else 0,
+        "ttfb_p50": round(statistics.median(ttfbs), 3) if ttfbs else None,
+        "ttfb_max": round(ttfbs[-1], 3) if ttfbs else None,
+        "errors": sorted({r["error"] for r in results if not r["ok"]})[:3],
+    }
+
+
+def wait_until_healthy(base_url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/healthz", timeout=1):
+                return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy in {timeout}s")
+
+
+def sweep(worker_counts: List[int], threads: int, streams: int, port: int) -> List[Dict[str, Any]]:
+    """Start the stub app under gunicorn for each worker count and load it."""
+    rows = []
+    for workers in worker_counts:
+        command = [
+            sys.executable, "-m", "gunicorn",
+            # Skip ./gunicorn.conf.py: its hooks would connect to Weaviate.
+            "--config", os.devnull,
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "--worker-class", "gthread",
+            "--threads", str(threads),
+            # Same cap as gunicorn.conf.py: a busy worker must not accept
+            # connections it has no free thread for.
+            "--worker-connections", str(threads),
+            "--log-level", "warning",
+            "benchmarks.stub_stream_app:app",
+        ]
+        server = subprocess.Popen(command, cwd=CONTAINER_DIR)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_healthy(base_url)
+            result = run_load(f"{base_url}/stream", streams)
+            result["workers"] = workers
+            result["threads"] = threads
+            rows.append(result)
+            print(json.dumps(result))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    sweep_parser = sub.add_parser("sweep", help="Scale the stub app across worker counts")
+    sweep_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    sweep_parser.add_argument("--threads", type=int, default=1)
+    sweep_parser.add_argument("--streams", type=int, default=16)
+    sweep_parser.add_argument("--port", type=int, default=8765)
+
+    target_parser = sub.add_parser("target", help="Load a running server")
+    target_parser.add_argument("--url", required=True)
+    target_parser.add_argument("--token", default=os.environ.get("LOAD_TEST_TOKEN"))
+    target_parser.add_argument("--agent-id", default=os.environ.get("LOAD_TEST_AGENT_ID"))
+    target_parser.add_argument("--question", default="What is mindfulness?")
+    target_parser.add_argument("--streams", type=int, default=16)
+
+    args = parser.parse_args()
+    if args.mode == "sweep":
+        rows = sweep(args.workers, args.threads, args.streams, args.port)
+        baseline = rows[0]["wall_seconds"] if rows else None
+        for row in rows:
+            speedup = round(baseline / row["wall_seconds"], 2) if baseline and row["wall_seconds"] else None
+            print(f"workers={row['workers']:>3} threads={row['threads']:>3} "
+                  f"wall={row['wall_seconds']:>7}s streams/s={row['streams_per_second']:>7} speedup={speedup}")
+    else:
+        body = json.dumps({
+            "messages": [{"role": "user", "content": args.question}],
+            "agent_id": args.agent_id,
+            "options": {"stream": True, "text_only": True},
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if args.token:
+            headers["Authorization"] = args.token if args.token.startswith("pk_") else f"Bearer {args.token}"
+        print(json.dumps(run_load(args.url, args.streams, body, headers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
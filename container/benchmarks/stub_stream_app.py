@@ -0,0 +1,29 @@
+"""
+Minimal stand-in for the ask endpoint, used by load_test_streams.py.
+
+Streams `STUB_TOKENS` SSE events spaced `STUB_TOKEN_DELAY` seconds apart, the
+same way `handle_ask_streaming` forwards a slow LLM stream. It blocks its
+thread for the whole stream, exactly like the real endpoint does.
+"""
+import os
+import time
+import json
+from flask import Flask, Response, jsonify
+
+STUB_TOKENS = int(os.environ.get("STUB_TOKENS", 20))
+STUB_TOKEN_DELAY = float(os.environ.get("STUB_TOKEN_DELAY", 0.1))
+
+app = Flask(__name__)
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/stream', methods=['POST', 'GET'])
+def stream():
+    def generate():
+        for i in range(STUB_TOKENS):
+            time.sleep(STUB_TOKEN_DELAY)
+            yield f"data: {json.dumps({'type': 'text', 'data': f'token-{i} ', 'metadata': None})}"
+        yield f"data: {json.dumps({'type': 'end_of_stream', 'data': '', 'metadata': None})}"
+    return Response(generate(), content_type='application/json')
@@ -1,6 +1,8 @@
-from flask import request, jsonify, g
-from services.upload_file import upload_file, get_documents, create_document, update_document, delete_document, get_document_by_id
+import json
+from flask import request, jsonify, g, Response, stream_with_context
+from services.upload_file import upload_file, upload_files_streaming, resolve_chunking_strategy, get_documents, create_document, update_document, delete_document, get_document_by_id
 from data_classes.common_classes import Document
+from libs.weaviate_lib import InvalidCursorError
 import logging
 from __init__ import app, login_required
 logger = logging.getLogger(__name__)
@@ -18,8 +20,31 @@ def process_pdf_endpoint():
         files = request.files.getlist('files')
         description = request.form.get('description')
         author = g.user_id
+        try:
+            chunking_strategy = resolve_chunking_strategy(
+                request.form.get('chunking_strategy'),
+                request.form.get('agent_id'),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e), "status": "error"}), 400
+        if request.args.get('stream', 'true').lower() != 'false':
+            if not files:
+                return jsonify({"error": "No files uploaded", "status": "error"}), 400
+            # Progress updates of the ingestion pipeline, like the agent RAG upload
+            def generate():
+                try:
+                    for update in upload_files_streaming(files, description, author, chunking_strategy=chunking_strategy):
+                        yield f"{json.dumps(update)}\n\n"
+                except Exception as e:
+                    logger.error(f"Error processing PDF: {str(e)}")
+                    yield f"{json.dumps({'error': str(e), 'status': 'error', 'message': f'Upload failed: {str(e)}'})}\n\n"
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'Connection': 'keep-alive'},
+            )
         # 2. handle request
-        results, failed_objects = upload_file(files, description, author)
+        results, failed_objects = upload_file(files, description, author, chunking_strategy)
 
         # 3. return results
         return jsonify({
@@ -40,19 +65,25 @@ def get_documents_endpoint():
     try:
         limit = int(request.args.get('limit', 10))
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
         
-        documents, total_count = get_documents(limit, offset)
-        
-        # Calculate pagination info
-        page_number = (offset // limit) + 1 if limit > 0 else 1
-        total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
+        documents, total_count, next_cursor = get_documents(limit, offset, cursor, include_total)
         
         response = jsonify(documents)
-        response.headers['X-Total-Count'] = str(total_count)
         response.headers['X-Page-Size'] = str(limit)
-        response.headers['X-Page-Number'] = str(page_number)
-        response.headers['X-Total-Pages'] = str(total_pages)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if total_count is not None:
+            # Calculate pagination info
+            page_number = (offset // limit) + 1 if limit > 0 else 1
+            total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
+            response.headers['X-Total-Count'] = str(total_count)
+            response.headers['X-Page-Number'] = str(page_number)
+            response.headers['X-Total-Pages'] = str(total_pages)
         return response, 200
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting documents: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1,6 +1,7 @@
 from flask import request, jsonify, g
-from services.upload_file import get_files, get_file_by_id, create_file, update_file, delete_file
+from services.upload_file import get_files, get_file_by_id, create_file, update_file, delete_file, reingest_file, resolve_chunking_strategy
 from data_classes.common_classes import File
+from libs.weaviate_lib import InvalidCursorError
 import logging
 from __init__ import app, login_required
 logger = logging.getLogger(__name__)
@@ -13,18 +14,24 @@ def get_files_endpoint():
     try:
         limit = int(request.args.get('limit', 10))
         offset = int(request.args.get('offset', 0))
-        files, total_count = get_files(limit, offset)
-        
-        # Calculate pagination info
-        page_number = (offset // limit) + 1 if limit > 0 else 1
-        total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
+        files, total_count, next_cursor = get_files(limit, offset, cursor, include_total)
         
         response = jsonify(files)
-        response.headers['X-Total-Count'] = str(total_count)
         response.headers['X-Page-Size'] = str(limit)
-        response.headers['X-Page-Number'] = str(page_number)
-        response.headers['X-Total-Pages'] = str(total_pages)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if total_count is not None:
+            # Calculate pagination info
+            page_number = (offset // limit) + 1 if limit > 0 else 1
+            total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
+            response.headers['X-Total-Count'] = str(total_count)
+            response.headers['X-Page-Number'] = str(page_number)
+            response.headers['X-Total-Pages'] = str(total_pages)
         return response, 200
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting files: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -54,6 +61,30 @@ def update_file_endpoint(file_id):
         logger.error(f"Error updating file: {str(e)}")
         return jsonify({"error": str(e)}), 500
     
+@app.route('/api/v1/files/<file_id>/content', methods=['PUT'])
+@login_required
+def reingest_file_endpoint(file_id):
+    """Replace a file with a new version, re-embedding only the chunks that changed"""
+    try:
+        file = request.files.get('file')
+        if not file:
+            return jsonify({"error": "No file uploaded", "status": "error"}), 400
+        try:
+            chunking_strategy = resolve_chunking_strategy(
+                request.form.get('chunking_strategy'),
+                request.form.get('agent_id'),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e), "status": "error"}), 400
+        summary = reingest_file(file_id, file, request.form.get('description'), g.user_id, chunking_strategy)
+        return jsonify({
+            "status": "success" if summary["failed_objects"] == 0 else "failed",
+            **summary,
+        }), 200
+    except Exception as e:
+        logger.error(f"Error re-ingesting file: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/v1/files/<file_id>', methods=['DELETE'])
 @login_required
 def delete_file_endpoint(file_id):
@@ -2,16 +2,43 @@
 Fine-tuning controller for handling fine-tuning requests.
 """
 
+import json
+from datetime import datetime
 from flask import request, jsonify, g
 from __init__ import app, login_required
-from services.handle_messages import fine_tune_messages, get_messages_list
-from services.handle_fine_tuning_models import get_fine_tuning_model_by_id, update_fine_tuning_model, FineTuningModelError
-from data_classes.common_classes import FineTuningStatus, ApprovalStatus
-from libs.jsonl_converter import convert_json_to_jsonl, save_jsonl_to_file, validate_fine_tune_data
+from services.handle_messages import fine_tune_approved_messages
+from services.handle_fine_tuning_models import (
+    get_fine_tuning_model_by_id, update_fine_tuning_model, create_fine_tuning_model, FineTuningModelError,
+    get_fine_tuning_model_by_job_name, get_fine_tuning_models_with_jobs
+)
+from services.fine_tuning_poller import fine_tuning_poller, start_fine_tuning_poller, job_properties
+from data_classes.common_classes import FineTuningStatus
 import logging
-from libs.google_vertex import get_fine_tuning_job_list, upload_to_gcs
+from libs.google_vertex import get_one_fine_tuning_job
 logger = logging.getLogger(__name__)
 
+start_fine_tuning_poller()
+
+def _job_response(model: dict) -> dict:
+    """Job fields of a FineTuningModels row, as kept up to date by the fine-tuning poller."""
+    def iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    return {
+        "job_name": model.get("job_name"),
+        "model_id": model.get("uuid"),
+        "display_name": model.get("name"),
+        "status": model.get("job_state"),
+        "model_status": model.get("status"),
+        "error": model.get("job_error") or None,
+        "created_at": iso(model.get("created_at")),
+        "updated_at": iso(model.get("updated_at")),
+        "synced_at": iso(model.get("job_synced_at")),
+        "base_model": model.get("base_model"),
+        "training_data": model.get("training_data_path"),
+        "tuned_model": model.get("model_path") or None,
+        "metrics": json.loads(model["training_metrics"]) if model.get("training_metrics") else None,
+    }
+
 @app.route('/api/v1/fine-tuning/start', methods=['POST'])
 @login_required
 def start_fine_tuning():
@@ -33,38 +60,35 @@ def start_fine_tuning():
         # if not message_ids:
         #     return jsonify({"error": "message_ids must be provided"}), 400
 
-        result = get_messages_list(
-            limit=1000,
-            include_related=True,
-            approval_status=ApprovalStatus.APPROVED.value
-        )
-        if "error" in result:
-            return jsonify({"error": f"Failed to get messages: {result['error']}"}), 400
-        messages = result.get("messages", [])
-        
-        if not messages:
-            return jsonify({"error": "No messages found for fine-tuning"}), 400
-        
-        
-        # Start fine-tuning
-        result = fine_tune_messages(messages, base_model)
+        # Start fine-tuning on every approved pair, streamed from the collection
+        result = fine_tune_approved_messages(base_model)
         
         if "error" in result:
             return jsonify({"error": result["error"]}), 400
         
-        # Update model status if model_id is provided
-        if model_id:
-            try:
-                update_fine_tuning_model(model_id, {
-                    "status": FineTuningStatus.TRAINING.value,
-                    "training_data_path": result.get("training_data_path"),
-                    "hyperparameters": result.get("job_info", {}).get("hyperparameters")
-                })
-            except FineTuningModelError as e:
-                logger.warning(f"Failed to update model status: {e.message}")
+        # Record the job on its model (a new one if no model_id is provided), where the poller tracks it
+        job_info = result.get("job_info", {})
+        job_fields = {
+            "status": FineTuningStatus.TRAINING.value,
+            "training_data_path": result.get("training_data_path"),
+            "hyperparameters": json.dumps(job_info.get("hyperparameters")),
+            "job_name": job_info.get("job_name"),
+            "job_state": job_info.get("status"),
+        }
+        try:
+            if model_id:
+                update_fine_tuning_model(model_id, job_fields)
+            else:
+                model_id = create_fine_tuning_model(
+                    {"name": job_info.get("display_name"), "base_model": base_model, **job_fields}, g.user_id
+                )
+            fine_tuning_poller.track(model_id, job_info.get("job_name"), job_info.get("status"))
+        except FineTuningModelError as e:
+            logger.warning(f"Failed to update model status: {e.message}")
         
         return jsonify({
             "message": "Fine-tuning job started successfully",
+            "model_id": model_id,
             "job_info": result.get("job_info"),
             "training_pairs_count": result.get("training_pairs_count")
         }), 200
@@ -74,37 +98,33 @@ def start_fine_tuning():
         return jsonify({"error": "Internal server error"}), 500
 
 
-# @app.route('/api/v1/fine-tuning/job-status/<job_name>', methods=['GET'])
-# @login_required
-# def get_fine_tuning_job_status(job_name):
-#     """Get the status of a fine-tuning job"""
-#     try:
-#         from google.cloud import aiplatform
-#         from vertexai.preview.fine_tuning import FineTuningJob
-        
-#         # Initialize Vertex AI
-#         project_id = "llm-project-2d719"
-#         location = "us-central1"
-#         aiplatform.init(project=project_id, location=location)
-        
-#         # Get job status
-#         job = FineTuningJob.get(job_name)
-        
-#         return jsonify({
-#             "job_name": job.name,
-#             "display_name": job.display_name,
-#             "status": job.state.name,
-#             "created_at": job.create_time.isoformat(),
-#             "updated_at": job.update_time.isoformat() if job.update_time else None,
-#             "base_model": job.base_model,
-#             "training_data": job.training_data,
-#             "tuned_model": job.tuned_model.name if job.tuned_model else None
-#         }), 200
-        
-#     except Exception as e:
-#         logger.error(f"Error in get_fine_tuning_job_status: {str(e)}")
-#         return jsonify({"error": f"Failed to get job status: {str(e)}"}), 500
+@app.route('/api/v1/fine-tuning/job-status/<path:job_name>', methods=['GET'])
+@login_required
+def get_fine_tuning_job_status(job_name):
+    """Get the status of a fine-tuning job"""
+    try:
+        model = get_fine_tuning_model_by_job_name(job_name)
+        if model:
+            return jsonify(_job_response(model)), 200
 
+        # Jobs not tracked by a model are read from Vertex
+        job = get_one_fine_tuning_job(job_name)
+        if not job:
+            return jsonify({"error": "Fine-tuning job not found"}), 404
+        properties = job_properties(job)
+        return jsonify(_job_response({
+            "job_name": job.get("name"),
+            "name": job.get("tunedModelDisplayName"),
+            "base_model": job.get("baseModel"),
+            "created_at": job.get("createTime"),
+            "updated_at": job.get("updateTime"),
+            "training_data_path": (job.get("supervisedTuningSpec") or {}).get("trainingDatasetUri"),
+            **properties,
+        })), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_fine_tuning_job_status: {str(e)}")
+        return jsonify({"error": f"Failed to get job status: {str(e)}"}), 500
 
 
 @app.route('/api/v1/fine-tuning/jobs', methods=['GET'])
@@ -112,20 +132,11 @@ def start_fine_tuning():
 def list_fine_tuning_jobs():
     """List all fine-tuning jobs"""
     try:
-        
-        # List jobs
-        jobs = get_fine_tuning_job_list()
-        job_list = []
-        for job in jobs:
-            job_list.append({
-                "job_name": job["name"],
-                "display_name": job["tunedModelDisplayName"],
-                "status": job["state"],
-                "created_at": job["createTime"],
-                "updated_at": job["updateTime"] if job["updateTime"] else None,
-                "base_model": job["baseModel"],
-                "tuned_model": job["tunedModelDisplayName"] if job["tunedModelDisplayName"] else None
-            })
+        limit = request.args.get('limit', 100, type=int)
+        status = request.args.get('status')
+
+        # Served from the models the poller keeps in sync with Vertex
+        job_list = [_job_response(model) for model in get_fine_tuning_models_with_jobs(limit=limit, status=status)]
         
         return jsonify({
             "jobs": job_list,
@@ -134,4 +145,4 @@ def list_fine_tuning_jobs():
         
     except Exception as e:
         logger.error(f"Error in list_fine_tuning_jobs: {str(e)}")
-        return jsonify({"error": f"Failed to list jobs: {str(e)}"}), 500 
\ No newline at end of file
+        return jsonify({"error": f"Failed to list jobs: {str(e)}"}), 500
@@ -19,6 +19,8 @@ def get_messages_endpoint():
         search = request.args.get('search', type=str)
         include_related = request.args.get('include_related', 'false').lower() == 'true'
         approval_status = request.args.get('approval_status', type=str)
+        cursor = request.args.get('cursor', type=str)
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         # Get messages
         result = get_messages_list(
             limit=limit,
@@ -28,7 +30,9 @@ def get_messages_endpoint():
             agent_id=agent_id,
             search=search,
             include_related=include_related,
-            approval_status=approval_status
+            approval_status=approval_status,
+            cursor=cursor,
+            include_total=include_total
         )
         
         if "error" in result:
@@ -1,7 +1,9 @@
 from flask import request, jsonify, g
 from werkzeug.datastructures import FileStorage
-from libs.google_vertex import add_file, remove_file, get_files, read_one_file
+from libs.google_vertex import remove_file, get_files, read_one_file
+from services.handle_rag import upload_files_to_corpus_blocking
 from services.handle_agent import get_agent_by_id
+from services.answer_cache import invalidate_answer_cache_for_corpus
 from __init__ import app, login_required
 import logging
 
@@ -25,18 +27,18 @@ def upload_rag_file():
         if not corpus_id:
             return jsonify({"error": "No corpus_id provided"}), 400
         
-        results = []
         for file in files:
             if file.filename == '':
                 return jsonify({"error": "No file selected"}), 400
-            
-            result = add_file(file, corpus_id)
-            results.append(result)
         
-        # Check if any results contain errors
-        for result in results:
-            if isinstance(result, dict) and "Error" in result:
-                return jsonify({"error": result}), 500
+        # Uploaded concurrently (or imported through GCS), with quota backoff
+        # Also drops the cached answers of the corpus' agents
+        updates = upload_files_to_corpus_blocking(files, corpus_id)
+        
+        results = [update.get("result") or update["message"] for update in updates if update["status"] != "failed"]
+        errors = [update["message"] for update in updates if update["status"] == "failed"]
+        if errors:
+            return jsonify({"error": errors, "message": results}), 500
         
         return jsonify({"message": results}), 200
         
@@ -126,6 +128,7 @@ def delete_rag_file(file_name):
             return jsonify({"error": "No corpus_id provided"}), 400
         
         result = remove_file(file_name, corpus_id)
+        invalidate_answer_cache_for_corpus(corpus_id)
         
         return jsonify({"message": result}), 200
         
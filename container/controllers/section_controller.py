@@ -8,6 +8,7 @@ from services.handle_sections import (
     search_sections
 )
 from data_classes.common_classes import Section
+from libs.weaviate_lib import InvalidCursorError
 import logging
 from __init__ import app, login_required
 logger = logging.getLogger(__name__)
@@ -39,18 +40,24 @@ def get_sections_endpoint():
         print(email)
         limit = int(request.args.get('limit', 10))
         offset = int(request.args.get('offset', 0))
-        sections, total_count = get_sections(email, limit, offset)
-        
-        # Calculate pagination info
-        page_number = (offset // limit) + 1 if limit > 0 else 1
-        total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
+        sections, total_count, next_cursor = get_sections(email, limit, offset, cursor, include_total)
         
         response = jsonify(sections)
-        response.headers['X-Total-Count'] = str(total_count)
         response.headers['X-Page-Size'] = str(limit)
-        response.headers['X-Page-Number'] = str(page_number)
-        response.headers['X-Total-Pages'] = str(total_pages)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if total_count is not None:
+            # Calculate pagination info
+            page_number = (offset // limit) + 1 if limit > 0 else 1
+            total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
+            response.headers['X-Total-Count'] = str(total_count)
+            response.headers['X-Page-Number'] = str(page_number)
+            response.headers['X-Total-Pages'] = str(total_pages)
         return response, 200
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting sections: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -6,7 +6,7 @@ import json
 
 @dataclass
 class StreamEvent:
-    type: Literal["text", "end_of_stream", "thought"]
+    type: Literal["text", "end_of_stream", "thought", "audio"]
     data: str
     metadata: Optional[Dict[str, Any]] = None
     def to_dict_json(self):
@@ -65,6 +65,14 @@ class AgentStatus(Enum):
 class AgentProvider(Enum):
     OPENAI = "openai"
     GOOGLE_VERTEX = "google_vertex"
+
+class ChunkingStrategy(Enum):
+    # token-bounded splits on paragraphs, lines, then words; no embeddings
+    RECURSIVE = "recursive"
+    # fixed runs of sentences with overlap; no embeddings
+    SENTENCE_WINDOW = "sentence_window"
+    # sentence groups split where consecutive embeddings diverge
+    SEMANTIC = "semantic"
     
 @dataclass
 class Agent:
@@ -150,6 +158,8 @@ class File:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     author: Optional[str] = None
+    content_hash: Optional[str] = None
+    size: Optional[int] = None
     
 class UserRole(Enum):
     ADMIN = "admin"
@@ -218,6 +228,10 @@ class FineTuningModel:
     training_metrics: Optional[Dict[str, Any]] = None
     model_path: Optional[str] = None
     version: Optional[str] = None
+    job_name: Optional[str] = None
+    job_state: Optional[str] = None
+    job_error: Optional[str] = None
+    job_synced_at: Optional[datetime] = None
 
 @dataclass
 class AppMessageResponse:
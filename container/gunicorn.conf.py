@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for the production server.
+
+Run with:
+    gunicorn -c gunicorn.conf.py main:app
+
+Every knob can be overridden through environment variables so the same image
+can be tuned per deployment without a rebuild.
+"""
+import os
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# One process per core by default. Each process serves `threads` requests at a
+# time, so an SSE stream only ever pins one thread, never the whole server.
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+# For gthread this caps the connections a worker accepts; keeping it equal to
+# `threads` stops a busy worker from hoarding streams that another idle worker
+# could serve. Green-thread classes (gevent / eventlet) can go much higher.
+worker_connections = int(os.environ.get(
+    "GUNICORN_WORKER_CONNECTIONS",
+    threads if worker_class == "gthread" else 1000,
+))
+
+# LLM streams can be silent for a long time while the model is thinking.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# The app must NOT be preloaded: the Weaviate client and the Google clients
+# hold gRPC channels that cannot be shared across fork().
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Create missing collections once, in the master, before any worker forks."""
+    from libs.weaviate_lib import initialize_schema, close_client
+    initialize_schema()
+    close_client()
+
+
+def post_fork(server, worker):
+    """Give every worker its own Weaviate connection."""
+    if worker_class.startswith("gevent"):
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    from libs.weaviate_lib import reconnect_client
+    reconnect_client()
+
+
+def worker_exit(server, worker):
+    """Finish queued side tasks and writes before the connection goes away."""
+    from libs.side_tasks import side_tasks
+    from libs.weaviate_lib import close_client
+    side_tasks.flush()
+    close_client()
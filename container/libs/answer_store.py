@@ -0,0 +1,100 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import List, Tuple
+
+class PrecomputedAnswerStore:
+    """
+    Generated answers shared by every worker on the machine, stored in SQLite.
+
+    Answers are grouped by key (e.g. an agent) and stamped with the generation
+    they were computed at. Before computing a key's answers for a generation, a
+    worker claims it; the others see the claim and read the stored answers
+    instead of computing them again. A claim whose worker died is taken over
+    once its lease expires. Claiming a new generation drops the key's answers
+    from older ones.
+
+    Args:
+        path: SQLite file holding the answers.
+        lease_seconds: How long a claim stays with its worker before another may take it.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 900):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT NOT NULL, question TEXT NOT NULL, generation TEXT NOT NULL,"
+            " answer TEXT NOT NULL, thought TEXT NOT NULL, PRIMARY KEY (key, question))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS claims ("
+            " key TEXT PRIMARY KEY, generation TEXT NOT NULL, lease_until REAL NOT NULL, done INTEGER NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, generation: str) -> bool:
+        """Reserve computing `key`'s answers for `generation`; False if done or claimed elsewhere."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT generation, lease_until, done FROM claims WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == generation and (row[2] or row[1] > now):
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO claims (key, generation, lease_until, done) VALUES (?, ?, ?, 0)",
+                (key, generation, now + self.lease_seconds),
+            )
+            conn.execute("DELETE FROM answers WHERE key = ? AND generation != ?", (key, generation))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def finish(self, key: str, generation: str):
+        """Mark `key`'s answers for `generation` complete."""
+        self._connect().execute(
+            "UPDATE claims SET done = 1 WHERE key = ? AND generation = ?", (key, generation)
+        )
+
+    def release(self, key: str, generation: str):
+        """Give up a claim without finishing it, so another worker may compute the answers."""
+        self._connect().execute(
+            "UPDATE claims SET lease_until = 0 WHERE key = ? AND generation = ? AND done = 0", (key, generation)
+        )
+
+    def is_done(self, key: str, generation: str) -> bool:
+        row = self._connect().execute(
+            "SELECT done FROM claims WHERE key = ? AND generation = ?", (key, generation)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def put(self, key: str, generation: str, question: str, answer: str, thought: str = ""):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO answers (key, question, generation, answer, thought) VALUES (?, ?, ?, ?, ?)",
+            (key, question, generation, answer, thought),
+        )
+
+    def get(self, key: str, generations: List[str]) -> List[Tuple[str, str, str]]:
+        """(question, answer, thought) of `key` stored at any of `generations`."""
+        if not generations:
+            return []
+        placeholders = ", ".join("?" for _ in generations)
+        return self._connect().execute(
+            f"SELECT question, answer, thought FROM answers WHERE key = ? AND generation IN ({placeholders})",
+            (key, *generations),
+        ).fetchall()
@@ -1,63 +1,174 @@
-from typing import List, Optional
+import os
+import re
+import logging
+from typing import List, Optional, Union
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_experimental.text_splitter import SemanticChunker
 from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from dotenv import load_dotenv
+from data_classes.common_classes import ChunkingStrategy
+from libs.embedding_cache import CachedEmbeddings, BatchedOpenAIEmbeddings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 
 load_dotenv()
 
-# Initialize OpenAI embeddings with proper configuration
-embed_model = OpenAIEmbeddings(
-    model="text-embedding-3-small"  # Using the latest embedding model
+logger = logging.getLogger(__name__)
+
+CHUNKER_EMBEDDING_MODEL = "text-embedding-3-small"  # Using the latest embedding model
+# Sentence-based strategies split on this and join a chunk's sentences with one space.
+SENTENCE_SPLIT_REGEX = '(?<=[.?!])\\s+'
+
+# Chunking strategy used when an upload or its agent does not choose one.
+# "semantic" embeds every sentence while chunking; "recursive" and
+# "sentence_window" need no embeddings, so a document is only embedded once.
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", ChunkingStrategy.SEMANTIC.value)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+SENTENCE_WINDOW_SIZE = int(os.getenv("SENTENCE_WINDOW_SIZE", "6"))
+SENTENCE_WINDOW_OVERLAP = int(os.getenv("SENTENCE_WINDOW_OVERLAP", "1"))
+SEMANTIC_BUFFER_SIZE = int(os.getenv("SEMANTIC_BUFFER_SIZE", "1"))
+SEMANTIC_BREAKPOINT_PERCENTILE = float(os.getenv("SEMANTIC_BREAKPOINT_PERCENTILE", "95"))
+
+_encoding = None
+_encoding_loaded = False
+
+# Initialize OpenAI embeddings with proper configuration. Sentence embeddings
+# are cached by content hash, so re-uploading a document only embeds the
+# sentences that changed. Misses go through the embedding micro-batcher, so
+# documents chunked at the same time share requests.
+embed_model = CachedEmbeddings(
+    BatchedOpenAIEmbeddings(model=CHUNKER_EMBEDDING_MODEL),
+    model=CHUNKER_EMBEDDING_MODEL,
 )
 
-# Semantic Chunking
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            # Downloads the BPE file on first use unless TIKTOKEN_CACHE_DIR has it.
+            _encoding = tiktoken.encoding_for_model(CHUNKER_EMBEDDING_MODEL) if tiktoken else None
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Tokens of `text` for CHUNKER_EMBEDDING_MODEL (estimated as chars / 4 without tiktoken)."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in re.split(SENTENCE_SPLIT_REGEX, text.strip()) if sentence]
+
+def recursive_chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> List[Document]:
+    """Split on paragraphs, then lines, then words, into chunks of at most `max_tokens` tokens."""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=max_tokens,
+        chunk_overlap=overlap_tokens,
+        separators=["\n\n", "\n", " ", ""],
+        length_function=count_tokens,
+        is_separator_regex=False
+    )
+    return text_splitter.create_documents([text])
+
+def sentence_window_chunk_text(
+    text: str,
+    window: int = SENTENCE_WINDOW_SIZE,
+    overlap: int = SENTENCE_WINDOW_OVERLAP,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+) -> List[Document]:
+    """
+    Runs of up to `window` sentences (and `max_tokens` tokens), each sharing
+    `overlap` sentences with the previous one.
+    """
+    sentences = split_sentences(text)
+    tokens = [count_tokens(sentence) for sentence in sentences]
+    chunks = []
+    start = 0
+    while start < len(sentences):
+        end, size = start + 1, tokens[start]
+        while end < len(sentences) and end - start < window and size + tokens[end] <= max_tokens:
+            size += tokens[end]
+            end += 1
+        chunks.append(Document(page_content=" ".join(sentences[start:end])))
+        if end >= len(sentences):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
 def semantic_chunk_text(
     text: str,
-    separators: Optional[List[str]] = None
+    embeddings: Optional[Embeddings] = None,
+    buffer_size: int = SEMANTIC_BUFFER_SIZE,
+    breakpoint_percentile: float = SEMANTIC_BREAKPOINT_PERCENTILE,
 ) -> List[Document]:
     """
-    Split text into semantically meaningful chunks using LangChain's RecursiveCharacterTextSplitter.
-    
+    Split text where the meaning shifts, like LangChain's SemanticChunker.
+
+    Every sentence is embedded together with its `buffer_size` neighbours on
+    each side, in one batched call. A chunk ends after sentence i when the
+    cosine distance between windows i and i+1 is above the
+    `breakpoint_percentile` percentile of all such distances. Distances and
+    breakpoints are computed on the whole matrix at once.
+
     Args:
         text (str): The input text to be chunked
-        separators (List[str], optional): List of separators to use for splitting text. 
-            If None, uses default separators: ["\n\n", "\n", " ", ""]
-    
+        embeddings: Model for the sentence windows; defaults to the cached, batched chunker model
+        buffer_size: Neighbouring sentences embedded with each sentence
+        breakpoint_percentile: Distance percentile above which a chunk ends
+
     Returns:
-        List[Document]: A list of Document objects containing the chunked text
+        List[Document]: Chunks of whole sentences joined by single spaces
     """
-    if separators is None:
-        separators = ["\n\n", "\n", " ", ""]
-    
-#     class langchain_experimental.text_splitter.SemanticChunker(
-# embeddings: Embeddings,
-# buffer_size: int = 1,
-# add_start_index: bool = False,
-# breakpoint_threshold_type: Literal['percentile', 'standard_deviation', 'interquartile', 'gradient'] = 'percentile',
-# breakpoint_threshold_amount: float | None = None,
-# number_of_chunks: int | None = None,
-# sentence_split_regex: str = '(?<=[.?!])\\s+',
-# min_chunk_size: int | None = None,
-# )
-    # Initialize the text splitter
-    text_splitter = SemanticChunker(
-        embeddings=embed_model,
-        buffer_size=1,
-        add_start_index=False,
-        breakpoint_threshold_type='percentile',
-        breakpoint_threshold_amount=None,
-        number_of_chunks=None,
-        sentence_split_regex='(?<=[.?!])\\s+',
-        min_chunk_size=None
-    )
-    
-    # Split the text into chunks
-    chunks = text_splitter.create_documents([text])
-    
-    return chunks
+    sentences = split_sentences(text)
+    if len(sentences) < 2:
+        return [Document(page_content=" ".join(sentences))] if sentences else []
+
+    windows = [
+        " ".join(sentences[max(i - buffer_size, 0):i + buffer_size + 1])
+        for i in range(len(sentences))
+    ]
+    vectors = np.asarray((embeddings or embed_model).embed_documents(windows), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    distances = 1.0 - np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+    threshold = np.percentile(distances, breakpoint_percentile)
+    boundaries = [0, *(np.flatnonzero(distances > threshold) + 1).tolist(), len(sentences)]
+    return [
+        Document(page_content=" ".join(sentences[start:end]))
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+def chunk_text(
+    text: str,
+    strategy: Optional[Union[ChunkingStrategy, str]] = None,
+    embeddings: Optional[Embeddings] = None,
+) -> List[Document]:
+    """
+    Chunk `text` with `strategy` (default: CHUNKING_STRATEGY).
+
+    Raises:
+        ValueError: if `strategy` is not a ChunkingStrategy value
+    """
+    strategy = ChunkingStrategy(strategy or CHUNKING_STRATEGY)
+    match strategy:
+        case ChunkingStrategy.RECURSIVE:
+            return recursive_chunk_text(text)
+        case ChunkingStrategy.SENTENCE_WINDOW:
+            return sentence_window_chunk_text(text)
+        case ChunkingStrategy.SEMANTIC:
+            return semantic_chunk_text(text, embeddings=embeddings)
 
 def semantic_chunk_documents(
     documents: List[Document],
@@ -108,7 +219,7 @@ if __name__ == "__main__":
     """
     
     # Chunk the text
-    chunks = semantic_chunk_text(sample_text, chunk_size=100, chunk_overlap=20)
+    chunks = chunk_text(sample_text, ChunkingStrategy.RECURSIVE)
     
     # Print the chunks
     for i, chunk in enumerate(chunks):
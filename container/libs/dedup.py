@@ -0,0 +1,53 @@
+import os
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+# Upload deduplication. Uploads are hashed before any work is done on them:
+# a file whose bytes are already stored (as a Files row, or as a RagFile of
+# the same Vertex corpus) is not ingested again, and chunks whose content is
+# already embedded in Documents reuse that vector instead of being embedded.
+# Hashes live next to the data they describe (Files/Documents `content_hash`,
+# RagFile descriptions), so deleting a file also forgets it.
+UPLOAD_DEDUP_ENABLED = os.getenv("UPLOAD_DEDUP_ENABLED", "true").lower() != "false"
+
+# RagFile descriptions carry the file's hash with this prefix.
+RAG_FILE_HASH_PREFIX = "sha256:"
+
+def file_digest(path: str) -> Tuple[str, int]:
+    """SHA-256 hex digest and size in bytes of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+class DedupStats:
+    """Process-wide counters of the work deduplication avoided."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "duplicate_files": 0,
+            "duplicate_chunks": 0,
+            "bytes_saved": 0,
+            "embeddings_saved": 0,
+        }
+
+    def record(self, duplicate_files: int = 0, duplicate_chunks: int = 0, bytes_saved: int = 0, embeddings_saved: int = 0):
+        with self._lock:
+            self._stats["duplicate_files"] += duplicate_files
+            self._stats["duplicate_chunks"] += duplicate_chunks
+            self._stats["bytes_saved"] += bytes_saved
+            self._stats["embeddings_saved"] += embeddings_saved
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+dedup_stats = DedupStats()
@@ -0,0 +1,303 @@
+import os
+import ssl
+import time
+import atexit
+import sqlite3
+import logging
+import smtplib
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Outgoing mail is written to a SQLite outbox and sent by a background thread,
+# so a request only waits for a local insert. Every worker on the machine
+# shares the outbox file: a message is claimed in a transaction with a lease,
+# so it is sent by one worker only, and a message whose worker died mid-send
+# is picked up again once its lease expires. The send rate limit is also kept
+# in the file, so it holds for the machine and not per worker.
+EMAIL_OUTBOX_PATH = os.getenv("EMAIL_OUTBOX_PATH", os.path.join(os.getcwd(), "temp", "email_outbox.sqlite"))
+EMAIL_SEND_MAX_PER_MINUTE = float(os.getenv("EMAIL_SEND_MAX_PER_MINUTE", "30"))
+EMAIL_SEND_MAX_ATTEMPTS = int(os.getenv("EMAIL_SEND_MAX_ATTEMPTS", "6"))
+# Retry n waits EMAIL_SEND_BACKOFF_SECONDS * 2^(n-1), capped at EMAIL_SEND_MAX_BACKOFF_SECONDS.
+EMAIL_SEND_BACKOFF_SECONDS = float(os.getenv("EMAIL_SEND_BACKOFF_SECONDS", "5"))
+EMAIL_SEND_MAX_BACKOFF_SECONDS = float(os.getenv("EMAIL_SEND_MAX_BACKOFF_SECONDS", "900"))
+# The SMTP session is closed after being idle this long; providers drop idle sessions anyway.
+EMAIL_SMTP_IDLE_SECONDS = float(os.getenv("EMAIL_SMTP_IDLE_SECONDS", "60"))
+# How often the sender looks for mail enqueued by other workers and for expired leases.
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+# Sent and failed messages are deleted after this long. Their rendered body
+# (which may hold a reset token) is blanked as soon as they finish; only the
+# metadata is retained.
+EMAIL_OUTBOX_RETENTION_HOURS = float(os.getenv("EMAIL_OUTBOX_RETENTION_HOURS", "72"))
+
+# A claimed message is invisible to other workers for this long.
+_LEASE_SECONDS = 120
+
+class SMTPConnection:
+    """
+    One authenticated SMTP session, opened on first use and reused.
+
+    Port 465 uses implicit TLS; other ports upgrade with STARTTLS unless
+    `starttls` is False (local stand-ins). Login is skipped without credentials.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str], starttls: bool = True, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _open(self) -> smtplib.SMTP:
+        context = ssl.create_default_context()
+        if self.port == 465:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls(context=context)
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    def send(self, sender: str, recipient: str, message: str):
+        self.close_if_idle()
+        for attempt in range(2):
+            if self._server is None:
+                self._server = self._open()
+            try:
+                self._server.sendmail(sender, recipient, message)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                # The server closed the reused session; reconnect once
+                self._server = None
+                if attempt:
+                    raise
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > EMAIL_SMTP_IDLE_SECONDS:
+            self.close()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies to a message (bad recipient, rejected content) will not succeed on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+class EmailOutbox:
+    """
+    Durable outgoing mail queue with retries, backoff and a send rate limit.
+
+    Args:
+        path: SQLite file holding the outbox.
+        connection_factory: Builds the SMTPConnection the sender thread reuses.
+        max_per_minute: Messages sent per minute, across all workers using `path`.
+        max_attempts: Sends tried before a message is marked failed.
+        backoff_seconds: Delay before the first retry; doubled for each further one.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        connection_factory: Callable[[], SMTPConnection],
+        max_per_minute: float = EMAIL_SEND_MAX_PER_MINUTE,
+        max_attempts: int = EMAIL_SEND_MAX_ATTEMPTS,
+        backoff_seconds: float = EMAIL_SEND_BACKOFF_SECONDS,
+    ):
+        self.path = path
+        self.connection_factory = connection_factory
+        self.interval = 60 / max_per_minute if max_per_minute > 0 else 0
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._connection: Optional[SMTPConnection] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, sender TEXT NOT NULL,"
+            " recipient TEXT NOT NULL, message TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, lease_until REAL NOT NULL DEFAULT 0,"
+            " last_error TEXT, created_at REAL NOT NULL, finished_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS pacing (id INTEGER PRIMARY KEY CHECK (id = 0), next_send_at REAL NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO pacing (id, next_send_at) VALUES (0, 0)")
+        # Outboxes written before bodies were blanked on completion
+        conn.execute("UPDATE outbox SET message = '' WHERE status != 'pending' AND message != ''")
+        # Mail left by a previous run is sent without waiting for a new enqueue
+        if conn.execute("SELECT 1 FROM outbox WHERE status = 'pending' LIMIT 1").fetchone():
+            self._ensure_thread()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, sender: str, recipient: str, message: str, kind: str = "email") -> int:
+        """Store a rendered message for sending and return its outbox id."""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO outbox (kind, sender, recipient, message, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, sender, recipient, message, now, now),
+        )
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+        self._ensure_thread()
+        self._wake.set()
+        return cursor.lastrowid
+
+    def _claim(self):
+        """
+        Claim the next due message and reserve its send slot.
+
+        Returns (row, send_at), or (None, next_due_at) when nothing is due.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, sender, recipient, message, attempts FROM outbox"
+                " WHERE status = 'pending' AND next_attempt_at <= ? AND lease_until <= ?"
+                " ORDER BY next_attempt_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                next_due = conn.execute(
+                    "SELECT MIN(MAX(next_attempt_at, lease_until)) FROM outbox WHERE status = 'pending'"
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+                return None, next_due
+            send_at = max(now, conn.execute("SELECT next_send_at FROM pacing WHERE id = 0").fetchone()[0])
+            conn.execute("UPDATE pacing SET next_send_at = ? WHERE id = 0", (send_at + self.interval,))
+            conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                (send_at + _LEASE_SECONDS, row[0]),
+            )
+            conn.execute("COMMIT")
+            return row, send_at
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _deliver(self, row):
+        outbox_id, sender, recipient, message, attempts = row
+        attempts += 1
+        conn = self._connect()
+        if self._connection is None:
+            self._connection = self.connection_factory()
+        try:
+            self._connection.send(sender, recipient, message)
+        except Exception as e:
+            # A refusal leaves the session usable; anything else may not
+            if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                self._connection.close()
+            if _is_permanent(e) or attempts >= self.max_attempts:
+                logger.error(f"Giving up on email {outbox_id} to {recipient} after {attempts} attempts: {e}")
+                conn.execute(
+                    "UPDATE outbox SET status = 'failed', message = '', last_error = ?, finished_at = ?, lease_until = 0 WHERE id = ?",
+                    (str(e), time.time(), outbox_id),
+                )
+                with self._stats_lock:
+                    self._stats["failed"] += 1
+                return
+            delay = min(self.backoff_seconds * 2 ** (attempts - 1), EMAIL_SEND_MAX_BACKOFF_SECONDS)
+            logger.warning(f"Email {outbox_id} to {recipient} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+            conn.execute(
+                "UPDATE outbox SET next_attempt_at = ?, last_error = ?, lease_until = 0 WHERE id = ?",
+                (time.time() + delay, str(e), outbox_id),
+            )
+            with self._stats_lock:
+                self._stats["retried"] += 1
+            return
+        conn.execute(
+            "UPDATE outbox SET status = 'sent', message = '', finished_at = ?, lease_until = 0 WHERE id = ?",
+            (time.time(), outbox_id),
+        )
+        with self._stats_lock:
+            self._stats["sent"] += 1
+        logger.info(f"Email {outbox_id} sent to {recipient}")
+
+    def _prune(self):
+        self._connect().execute(
+            "DELETE FROM outbox WHERE status != 'pending' AND finished_at < ?",
+            (time.time() - EMAIL_OUTBOX_RETENTION_HOURS * 3600,),
+        )
+
+    def _run(self):
+        last_pruned = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_pruned > 3600:
+                    self._prune()
+                    last_pruned = time.monotonic()
+                # Cleared before looking, so an enqueue from here on wakes the wait below
+                self._wake.clear()
+                row, at = self._claim()
+                if row is not None:
+                    time.sleep(max(at - time.time(), 0))
+                    self._deliver(row)
+                    continue
+                if self._connection is not None:
+                    self._connection.close_if_idle()
+                wait = EMAIL_OUTBOX_POLL_SECONDS if at is None else min(max(at - time.time(), 0), EMAIL_OUTBOX_POLL_SECONDS)
+            except Exception as e:
+                logger.error(f"Email outbox error: {e}")
+                wait = EMAIL_OUTBOX_POLL_SECONDS
+            self._wake.wait(wait)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+
+    def stats(self) -> Dict[str, int]:
+        counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        with self._stats_lock:
+            return {**self._stats, "pending": counts.get("pending", 0), "failed_total": counts.get("failed", 0)}
+
+_outbox: Optional[EmailOutbox] = None
+_outbox_lock = threading.Lock()
+
+def get_email_outbox(connection_factory: Callable[[], SMTPConnection]) -> EmailOutbox:
+    """Process-wide outbox at EMAIL_OUTBOX_PATH, created on first use."""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = EmailOutbox(EMAIL_OUTBOX_PATH, connection_factory)
+                atexit.register(_outbox.close)
+    return _outbox
@@ -0,0 +1,177 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _EmbeddingRequest:
+    texts: List[str]
+    model: str
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+class EmbeddingBatcher:
+    """
+    Coalesces embedding requests from concurrent callers into shared provider calls.
+
+    A batch opens when the first request arrives and is sent once it holds
+    `max_batch_size` texts or `max_wait_ms` have passed, whichever is first.
+    Requests for different models go in different batches, and a text asked
+    for by several callers of one batch is embedded once. Up to `concurrency`
+    batches are in flight while the next one collects.
+
+    Args:
+        embed: Provider call, `embed(texts, model) -> vectors`.
+        max_batch_size: Most texts per batch (the provider's per-request limit).
+        max_wait_ms: Longest a request waits for others to join its batch.
+        concurrency: Batches sent at the same time.
+        log_interval_seconds: How often metrics are logged; 0 disables logging.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str], str], List[List[float]]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        concurrency: int,
+        log_interval_seconds: float = 60,
+    ):
+        self._embed = embed
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000
+        self.concurrency = concurrency
+        self.log_interval = log_interval_seconds
+        self._cond = threading.Condition()
+        self._pending: List[_EmbeddingRequest] = []
+        self._pool = None
+        self._thread = None
+        self._last_log = time.monotonic()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "texts": 0,
+            "deduplicated": 0,
+            "failed_batches": 0,
+            "largest_batch": 0,
+            "queue_ms_total": 0.0,
+            "max_queue_ms": 0.0,
+        }
+
+    def _ensure_started(self):
+        # Started on first use so forked workers each get their own thread.
+        if self._thread is None or not self._thread.is_alive():
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding-batch")
+            self._thread = threading.Thread(target=self._collect_loop, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, texts: List[str], model: str) -> Future:
+        """Queue `texts`; the future resolves to their vectors, in order."""
+        request = _EmbeddingRequest(texts=list(texts), model=model)
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        with self._cond:
+            self._ensure_started()
+            self._pending.append(request)
+            self._cond.notify()
+        return request.future
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        return self.submit(texts, model).result()
+
+    async def embed_async(self, texts: List[str], model: str) -> List[List[float]]:
+        return await asyncio.wrap_future(self.submit(texts, model))
+
+    def _take_batch(self) -> List[_EmbeddingRequest]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            first = self._pending[0]
+            deadline = first.enqueued_at + self.max_wait
+            while True:
+                queued = sum(len(r.texts) for r in self._pending if r.model == first.model)
+                remaining = deadline - time.monotonic()
+                if queued >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Oldest requests of the first model, up to the size limit; the
+            # first request always goes even if it alone is over the limit.
+            batch, size = [], 0
+            for request in self._pending:
+                if request.model != first.model:
+                    continue
+                if batch and size + len(request.texts) > self.max_batch_size:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            taken = set(map(id, batch))
+            self._pending = [r for r in self._pending if id(r) not in taken]
+            return batch
+
+    def _collect_loop(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._pool.submit(self._send, batch)
+            except RuntimeError:
+                # The pool is shutting down; send on this thread.
+                self._send(batch)
+
+    def _send(self, batch: List[_EmbeddingRequest]):
+        now = time.monotonic()
+        texts = [text for request in batch for text in request.texts]
+        unique = list(dict.fromkeys(texts))
+        queue_ms = [(now - request.enqueued_at) * 1000 for request in batch]
+        with self._cond:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(texts)
+            self._stats["deduplicated"] += len(texts) - len(unique)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(unique))
+            self._stats["queue_ms_total"] += sum(queue_ms)
+            self._stats["max_queue_ms"] = max(self._stats["max_queue_ms"], max(queue_ms))
+        try:
+            vectors = dict(zip(unique, self._embed(unique, batch[0].model)))
+        except Exception as e:
+            with self._cond:
+                self._stats["failed_batches"] += 1
+            for request in batch:
+                request.future.set_exception(e)
+        else:
+            for request in batch:
+                request.future.set_result([vectors[text] for text in request.texts])
+        self._maybe_log()
+
+    def _maybe_log(self):
+        if not self.log_interval or time.monotonic() - self._last_log < self.log_interval:
+            return
+        self._last_log = time.monotonic()
+        logger.info(f"Embedding batcher: {self.stats()}")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Counters since start, plus derived averages.
+
+        `avg_batch_size` is texts sent per provider call; `avg_queue_ms` is how
+        long a request waited before its batch was sent.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            pending = len(self._pending)
+        batches, requests = stats["batches"], stats["requests"]
+        sent = stats["texts"] - stats["deduplicated"]
+        queue_ms_total = stats.pop("queue_ms_total")
+        return {
+            **stats,
+            "pending": pending,
+            "avg_batch_size": round(sent / batches, 2) if batches else 0.0,
+            "avg_requests_per_batch": round(requests / batches, 2) if batches else 0.0,
+            "avg_queue_ms": round(queue_ms_total / requests, 2) if requests else 0.0,
+            "max_queue_ms": round(stats["max_queue_ms"], 2),
+        }
@@ -0,0 +1,290 @@
+import os
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from openai import OpenAI
+from langchain_core.embeddings import Embeddings
+from libs.embedding_batcher import EmbeddingBatcher
+
+logger = logging.getLogger(__name__)
+
+# Embeddings are deterministic for a given (model, text), so they are kept on
+# disk and shared by every worker on the machine. The SQLite index maps
+# (model, sha256(text)) to a row in a float32 matrix file per dimension; the
+# matrices are memory-mapped, so lookups copy only the rows they need.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "false"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.getcwd(), "temp", "embedding_cache"))
+# Matrix files grow by at least this many rows at a time.
+EMBEDDING_CACHE_GROW_ROWS = int(os.getenv("EMBEDDING_CACHE_GROW_ROWS", "4096"))
+# Inputs per OpenAI embeddings request.
+EMBEDDING_REQUEST_BATCH_SIZE = int(os.getenv("EMBEDDING_REQUEST_BATCH_SIZE", "512"))
+
+# Concurrent embedding calls (query vectors of parallel asks, chunker
+# sentences) are coalesced into shared requests by the micro-batcher. A
+# request waits at most EMBEDDING_BATCH_MAX_WAIT_MS for others to join it;
+# raising it trades latency for fewer, larger requests.
+EMBEDDING_BATCHER_ENABLED = os.getenv("EMBEDDING_BATCHER_ENABLED", "true").lower() != "false"
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", str(EMBEDDING_REQUEST_BATCH_SIZE)))
+EMBEDDING_BATCH_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))
+EMBEDDING_BATCH_LOG_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_BATCH_LOG_INTERVAL_SECONDS", "60"))
+
+_openai_client: Optional[OpenAI] = None
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent (model, text) -> float32 vector cache.
+
+    Safe to share between threads and between processes using the same
+    directory: row allocation and index writes go through SQLite transactions,
+    and a vector is written to its matrix before its index row is committed.
+
+    Args:
+        directory: Where `index.sqlite` and the `vectors_<dim>.f32` files live.
+    """
+
+    def __init__(self, directory: str = EMBEDDING_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._maps: Dict[int, np.memmap] = {}
+        self._stats = {"hits": 0, "misses": 0}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text_hash TEXT NOT NULL, dim INTEGER NOT NULL, row INTEGER NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS matrices (dim INTEGER PRIMARY KEY, rows INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _matrix_path(self, dim: int) -> str:
+        return os.path.join(self.directory, f"vectors_{dim}.f32")
+
+    def _matrix(self, dim: int, min_rows: int) -> np.memmap:
+        """Memory map of the `dim` matrix covering at least `min_rows` rows."""
+        with self._lock:
+            matrix = self._maps.get(dim)
+            if matrix is None or matrix.shape[0] < min_rows:
+                rows = os.path.getsize(self._matrix_path(dim)) // (dim * 4)
+                matrix = np.memmap(self._matrix_path(dim), dtype=np.float32, mode="r+", shape=(rows, dim))
+                self._maps[dim] = matrix
+            return matrix
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for `texts`, with None where there is no entry."""
+        if not texts:
+            return []
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, tuple] = {}
+        conn = self._connect()
+        unique = list(set(hashes))
+        # SQLite limits the number of bound parameters per statement.
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for h, dim, row in conn.execute(
+                f"SELECT text_hash, dim, row FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch],
+            ):
+                found[h] = (dim, row)
+
+        results: List[Optional[np.ndarray]] = []
+        for h in hashes:
+            entry = found.get(h)
+            if entry is None:
+                results.append(None)
+                continue
+            dim, row = entry
+            results.append(np.array(self._matrix(dim, row + 1)[row]))
+        hits = sum(vector is not None for vector in results)
+        with self._lock:
+            self._stats["hits"] += hits
+            self._stats["misses"] += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store `vectors` for `texts`; texts already cached for `model` keep their vector."""
+        if not texts:
+            return
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.ndim != 2 or array.shape[0] != len(texts):
+            raise ValueError("Expected one vector per text")
+        dim = array.shape[1]
+        hashes = [text_hash(text) for text in texts]
+        conn = self._connect()
+
+        # Reserve rows (and grow the matrix file) in one write transaction so
+        # concurrent writers never share a row.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("SELECT rows FROM matrices WHERE dim = ?", (dim,)).fetchone()
+            first_row = current[0] if current else 0
+            conn.execute(
+                "INSERT INTO matrices (dim, rows) VALUES (?, ?) ON CONFLICT(dim) DO UPDATE SET rows = excluded.rows",
+                (dim, first_row + len(texts)),
+            )
+            path = self._matrix_path(dim)
+            capacity = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+            if capacity < first_row + len(texts):
+                new_capacity = max(first_row + len(texts), capacity * 2, EMBEDDING_CACHE_GROW_ROWS)
+                with open(path, "ab") as f:
+                    f.truncate(new_capacity * dim * 4)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        matrix = self._matrix(dim, first_row + len(texts))
+        matrix[first_row:first_row + len(texts)] = array
+        matrix.flush()
+        conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (model, text_hash, dim, row) VALUES (?, ?, ?, ?)",
+            [(model, h, dim, first_row + i) for i, h in enumerate(hashes)],
+        )
+
+    def get_or_embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        embed: Callable[[List[str]], List[List[float]]],
+    ) -> List[List[float]]:
+        """
+        Vectors for `texts`, calling `embed` once for the texts that are not cached yet.
+
+        Duplicate texts within one call are embedded once.
+        """
+        cached = self.get_many(model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        computed: Dict[str, List[float]] = {}
+        if missing:
+            vectors = embed(missing)
+            self.put_many(model, missing, vectors)
+            computed = dict(zip(missing, vectors))
+        return [
+            vector.tolist() if vector is not None else list(computed[text])
+            for text, vector in zip(texts, cached)
+        ]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses = self._stats["hits"], self._stats["misses"]
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0}
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process-wide cache, or None when EMBEDDING_CACHE_ENABLED is false."""
+    global _embedding_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` that consults the embedding cache before `embeddings`.
+
+    Args:
+        embeddings: The embeddings model to call on a miss.
+        model: Model name the vectors are cached under.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cache = get_embedding_cache()
+        if cache is None:
+            return self.embeddings.embed_documents(texts)
+        return cache.get_or_embed(self.model, texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        cache = get_embedding_cache()
+        if cache is None:
+            return self.embeddings.embed_query(text)
+        return cache.get_or_embed(self.model, [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+def _openai_embed(texts: List[str], model: str) -> List[List[float]]:
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), EMBEDDING_REQUEST_BATCH_SIZE):
+        response = _openai_client.embeddings.create(model=model, input=texts[start:start + EMBEDDING_REQUEST_BATCH_SIZE])
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+embedding_batcher = EmbeddingBatcher(
+    embed=_openai_embed,
+    max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+    max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS,
+    concurrency=EMBEDDING_BATCH_CONCURRENCY,
+    log_interval_seconds=EMBEDDING_BATCH_LOG_INTERVAL_SECONDS,
+)
+
+def _embed_uncached(texts: List[str], model: str) -> List[List[float]]:
+    # Large inputs already fill provider requests; only small ones gain from waiting.
+    if not EMBEDDING_BATCHER_ENABLED or len(texts) >= EMBEDDING_BATCH_MAX_SIZE:
+        return _openai_embed(texts, model)
+    return embedding_batcher.embed(texts, model)
+
+class BatchedOpenAIEmbeddings(Embeddings):
+    """LangChain `Embeddings` for OpenAI `model` that goes through the micro-batcher."""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _embed_uncached(texts, self.model)
+
+    def embed_query(self, text: str) -> List[float]:
+        return _embed_uncached([text], self.model)[0]
+
+def embed_texts(texts: List[str], model: str, use_cache: bool = True) -> List[List[float]]:
+    """
+    Embed `texts` with OpenAI `model`.
+
+    Args:
+        texts: Texts to embed
+        model: OpenAI embedding model
+        use_cache: Go through the on-disk cache (when enabled). Pass False for
+            one-off texts such as search queries that should not grow it.
+    """
+    cache = get_embedding_cache() if use_cache else None
+    if cache is None:
+        return _embed_uncached(texts, model)
+    return cache.get_or_embed(model, texts, lambda missing: _embed_uncached(missing, model))
+
+async def embed_texts_async(texts: List[str], model: str) -> List[List[float]]:
+    """Async variant of embed_texts without the on-disk cache, for search queries."""
+    if not EMBEDDING_BATCHER_ENABLED:
+        return await asyncio.to_thread(_openai_embed, texts, model)
+    return await embedding_batcher.embed_async(texts, model)
+
+def embedding_batcher_stats() -> Dict[str, float]:
+    return embedding_batcher.stats()
+
+def embedding_cache_stats() -> Dict[str, float]:
+    cache = get_embedding_cache()
+    return cache.stats() if cache else {"hits": 0, "misses": 0, "hit_rate": 0.0}
@@ -3,7 +3,7 @@ from vertexai.generative_models import GenerativeModel, GenerationConfig, ground
 from vertexai.generative_models import Tool
 from vertexai import rag
 from vertexai.rag.utils.resources import TransformationConfig, ChunkingConfig
-from typing import Generator, List, Optional
+from typing import Generator, AsyncGenerator, List, Optional
 from data_classes.common_classes import Agent, Message, Language, StreamEvent
 from dotenv import load_dotenv
 from vertexai.preview.generative_models import Content, Part
@@ -20,7 +20,16 @@ import logging
 from datetime import datetime
 from typing import Dict, Any
 from constants.separators import STARTING_SEPARATOR, ENDING_SEPARATOR
+from libs.dedup import UPLOAD_DEDUP_ENABLED, RAG_FILE_HASH_PREFIX, dedup_stats, file_digest
 import asyncio
+import re
+import time
+import random
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from google.api_core import exceptions as google_exceptions
 logger = logging.getLogger(__name__)
 from google.genai import Client
 from google.genai import types
@@ -62,78 +71,150 @@ RULES:
 {{context}}
 """
 
-def generate_gemini_response(
-    agent: Agent,
-    messages: List[Message], 
-    context: Optional[str] = None,
-    stream: bool = False
-) -> str | Generator[StreamEvent, None, None]:
-    """
-    Sends a query to a Gemini model, grounded with a Vertex AI Search data store.
-
-    Args:
-        user_query: The user's question or input.
-
-    Returns:
-        The text response from the Gemini model, potentially with citations.
-    """
-    if not agent:
-        raise Exception("Agent is required")
+def render_gemini_prompt_template(agent: Agent) -> str:
+    """Render every agent-specific placeholder, leaving only `{{context}}` for the request."""
     base_language = getattr(agent, "language", Language.VI.value)
-    base_model = getattr(agent, "model", "gemini-2.0-flash-001")
-    base_temperature = getattr(agent, "temperature", 1)
     agent_name = getattr(agent, "name", "Sư Tam Vô AI")
-    
+
     base_system_prompt = system_prompt
     base_system_prompt = base_system_prompt.replace("{{agent_name}}", agent_name)
     base_system_prompt = base_system_prompt.replace("{{STARTING_SEPARATOR}}", STARTING_SEPARATOR)
     base_system_prompt = base_system_prompt.replace("{{ENDING_SEPARATOR}}", ENDING_SEPARATOR)
     base_system_prompt = base_system_prompt.replace("{{base_language}}", "Vietnamese" if base_language == Language.VI.value else "English")
     base_system_prompt = base_system_prompt.replace("{{agent_persona}}", getattr(agent, "system_prompt", ""))
-    base_system_prompt = base_system_prompt.replace("{{context}}", context or "")
-    corpus_id = getattr(agent, "corpus_id", None)
-    
-    rag_retrieval_tool_2 = None
-    
-    if corpus_id:
-        RAG_CORPUS_NAME = f"projects/{PROJECT_ID}/locations/{RAG_LOCATION}/ragCorpora/{corpus_id}"
-        rag_retrieval_tool_2 = types.Tool(
-            retrieval=types.Retrieval(
-            vertex_rag_store=types.VertexRagStore(
-                    rag_resources=[
-                        types.VertexRagStoreRagResource(
-                            rag_corpus=RAG_CORPUS_NAME,
-                        )
-                    ],
-                    rag_retrieval_config=types.RagRetrievalConfig(
-                        top_k=20,
-                        filter=types.RagRetrievalConfigFilter(
-                            vector_distance_threshold=0.7,
-                        ),
+    return base_system_prompt
+
+def build_gemini_system_prompt(agent: Agent, context: Optional[str] = None, prompt_template: Optional[str] = None) -> str:
+    """Render the Gemini system instruction for an agent."""
+    if prompt_template is None:
+        prompt_template = render_gemini_prompt_template(agent)
+    return prompt_template.replace("{{context}}", context or "")
+
+def build_rag_retrieval_tool(corpus_id: Optional[str]) -> Optional[types.Tool]:
+    """Build the Vertex RAG retrieval tool for an agent's corpus, if it has one."""
+    if not corpus_id:
+        return None
+    RAG_CORPUS_NAME = f"projects/{PROJECT_ID}/locations/{RAG_LOCATION}/ragCorpora/{corpus_id}"
+    return types.Tool(
+        retrieval=types.Retrieval(
+        vertex_rag_store=types.VertexRagStore(
+                rag_resources=[
+                    types.VertexRagStoreRagResource(
+                        rag_corpus=RAG_CORPUS_NAME,
+                    )
+                ],
+                rag_retrieval_config=types.RagRetrievalConfig(
+                    top_k=20,
+                    filter=types.RagRetrievalConfigFilter(
+                        vector_distance_threshold=0.7,
                     ),
                 ),
-            )
+            ),
         )
-    user_query = messages[-1].content
-    client = Client(
+    )
+
+def create_genai_client() -> Client:
+    return Client(
         vertexai=True,
         project=PROJECT_ID,
         location=RAG_LOCATION
     )
-    history = []
-    if messages:
-        history = [types.Content(role=x.role, parts=[types.Part(text=x.content)]) for x in messages]
-    
+
+_genai_client: Optional[Client] = None
+
+def get_genai_client() -> Client:
+    """Process-wide genai client, created on first use (i.e. after the gunicorn fork)."""
+    global _genai_client
+    if _genai_client is None:
+        _genai_client = create_genai_client()
+    return _genai_client
+
+@dataclass
+class GeminiRuntime:
+    """The per-agent pieces of a Gemini call that do not depend on the request."""
+    prompt_template: str
+    tools: List[types.Tool] = field(default_factory=list)
+    client: Optional[Client] = None
+
+def compile_gemini_runtime(agent: Agent) -> GeminiRuntime:
+    rag_retrieval_tool = build_rag_retrieval_tool(getattr(agent, "corpus_id", None))
+    return GeminiRuntime(
+        prompt_template=render_gemini_prompt_template(agent),
+        tools=[rag_retrieval_tool] if rag_retrieval_tool else [],
+        client=get_genai_client(),
+    )
+
+def build_gemini_config(
+    agent: Agent,
+    system_instruction: str,
+    tools: List[types.Tool],
+) -> types.GenerateContentConfig:
+    base_model = getattr(agent, "model", "gemini-2.0-flash-001")
+    base_temperature = getattr(agent, "temperature", 1)
     thinking_config = None
     if base_model.startswith("gemini-2.5"):
         thinking_config = types.ThinkingConfig(
             thinking_budget=-1,
             include_thoughts=True,
         )
-    tools = []
-    if rag_retrieval_tool_2:
-        tools.append(rag_retrieval_tool_2)
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        tools=tools,
+        response_mime_type="text/plain",
+        response_modalities=["TEXT"],
+        max_output_tokens=8192,
+        temperature=base_temperature,
+        top_p = 1,
+        top_k=40,
+        thinking_config=thinking_config,
+    )
+
+def build_gemini_history(messages: List[Message]) -> List[types.Content]:
+    if not messages:
+        return []
+    return [types.Content(role=x.role, parts=[types.Part(text=x.content)]) for x in messages]
+
+def chunk_to_stream_events(chunk) -> Generator[StreamEvent, None, None]:
+    """Split one streamed Gemini chunk into thought/text StreamEvents."""
+    if chunk and chunk.candidates and chunk.candidates[0] and chunk.candidates[0].content:
+        for part in chunk.candidates[0].content.parts or []:
+            if part and part.text:
+                if part.thought:
+                    yield StreamEvent(type="thought", data=part.text or "")
+                else:
+                    yield StreamEvent(type="text", data=part.text or "")
+
+def generate_gemini_response(
+    agent: Agent,
+    messages: List[Message], 
+    context: Optional[str] = None,
+    stream: bool = False,
+    runtime: Optional[GeminiRuntime] = None,
+) -> str | Generator[StreamEvent, None, None]:
+    """
+    Sends a query to a Gemini model, grounded with a Vertex AI Search data store.
+
+    Args:
+        user_query: The user's question or input.
+        runtime: Pre-compiled prompt/tools/client for the agent; compiled on the fly when omitted.
+
+    Returns:
+        The text response from the Gemini model, potentially with citations.
+    """
+    if not agent:
+        raise Exception("Agent is required")
+    if runtime is None:
+        runtime = compile_gemini_runtime(agent)
+    base_model = getattr(agent, "model", "gemini-2.0-flash-001")
+    base_system_prompt = build_gemini_system_prompt(agent, context, runtime.prompt_template)
+    
+    user_query = messages[-1].content
+    client = runtime.client or get_genai_client()
+    history = build_gemini_history(messages)
+    
+    tools = list(runtime.tools)
     print(f"tools: {len(tools)}")
+    config = build_gemini_config(agent, base_system_prompt, tools)
     try:
         if stream:
             generator = client.models.generate_content_stream(
@@ -141,34 +222,11 @@ def generate_gemini_response(
                 # model='projects/566310375218/locations/us-central1/models/7653184769995309056',
                 # model='projects/566310375218/locations/us-central1/endpoints/3767644817853513728',
                 contents=history,
-                config=types.GenerateContentConfig(
-                    system_instruction=base_system_prompt,
-                    tools=tools,
-                    response_mime_type="text/plain",
-                    response_modalities=["TEXT"],
-                    max_output_tokens=8192,
-                    temperature=base_temperature,
-                    top_p = 1,
-                    top_k=40,
-                    thinking_config=thinking_config,
-                )
+                config=config
             )
             def generate():
-                full_response = ""
                 for chunk in generator:
-                    if chunk:
-                        full_response += chunk.text or ""
-                        if chunk.candidates and chunk.candidates[0] and chunk.candidates[0].content:
-                            for part in chunk.candidates[0].content.parts or []:
-                                if part and part.text:
-                                    if part.thought:
-                                        yield StreamEvent(type="thought", data=part.text or "")
-                                    else:
-                                        yield StreamEvent(type="text", data=part.text or "")
-                        # yield StreamEvent(type="text", data=full_response or "")
-                
-                # Debug: Print response length
-                # print(f"DEBUG: Total response length: {len(full_response)} characters, approximately {len(full_response.split())} words")
+                    yield from chunk_to_stream_events(chunk)
                 
                 yield StreamEvent(type="end_of_stream", data="", metadata=None)
             return generate()
@@ -182,23 +240,10 @@ def generate_gemini_response(
                         parts=[types.Part(text=user_query)]
                     )
                 ],
-                config=types.GenerateContentConfig(
-                    system_instruction=base_system_prompt,
-                    tools=tools,
-                    response_mime_type="text/plain",
-                    response_modalities=["TEXT"],
-                    max_output_tokens=8192,
-                    temperature=base_temperature,
-                    top_p = 1,
-                    top_k=40,
-                    thinking_config=thinking_config,
-                )
+                config=config
             )
             # print(response)
             
-            # Debug: Print response length
-            # print(f"DEBUG: Response length: {len(response.text)} characters, approximately {len(response.text.split())} words")
-            
             # text_with_citations = add_citations(response)
             # print("*"*100)
             # print(text_with_citations)
@@ -208,6 +253,40 @@ def generate_gemini_response(
         print(f"Error sending grounded message to Gemini: {e}")
         return "Sorry, I couldn't process your request with the knowledge base."
 
+async def generate_gemini_response_async(
+    agent: Agent,
+    messages: List[Message],
+    context: Optional[str] = None,
+    runtime: Optional[GeminiRuntime] = None,
+) -> AsyncGenerator[StreamEvent, None]:
+    """
+    Async streaming variant of generate_gemini_response.
+
+    Uses the genai `aio` surface so the event loop is never blocked while
+    waiting for tokens.
+    """
+    if not agent:
+        raise Exception("Agent is required")
+    if runtime is None:
+        runtime = compile_gemini_runtime(agent)
+    base_model = getattr(agent, "model", "gemini-2.0-flash-001")
+    base_system_prompt = build_gemini_system_prompt(agent, context, runtime.prompt_template)
+    tools = list(runtime.tools)
+    client = runtime.client or get_genai_client()
+    try:
+        generator = await client.aio.models.generate_content_stream(
+            model=base_model,
+            contents=build_gemini_history(messages),
+            config=build_gemini_config(agent, base_system_prompt, tools)
+        )
+        async for chunk in generator:
+            for event in chunk_to_stream_events(chunk):
+                yield event
+    except Exception as e:
+        print(f"Error sending grounded message to Gemini: {e}")
+        yield StreamEvent(type="text", data="Sorry, I couldn't process your request with the knowledge base.")
+    yield StreamEvent(type="end_of_stream", data="", metadata=None)
+
 def add_citations(response):
     text = response.text
     supports = response.candidates[0].grounding_metadata.grounding_supports
@@ -259,10 +338,20 @@ def add_file(file: FileStorage, corpus_id: str) -> str:
                 file.save(temp_file.name)
                 temp_file_path = temp_file.name
 
+            description = None
+            if UPLOAD_DEDUP_ENABLED:
+                content_hash, size = file_digest(temp_file_path)
+                existing = get_rag_file_hashes(corpus_id).get(content_hash)
+                if existing:
+                    dedup_stats.record(duplicate_files=1, bytes_saved=size)
+                    return f"File '{display_name}' is already in RagCorpus. RagFile ID: {existing}"
+                description = RAG_FILE_HASH_PREFIX + content_hash
+
             rag_file: RagFile = rag.upload_file(
                 corpus_name=full_corpus_path,
                 display_name=display_name,
                 path=temp_file_path,
+                description=description,
                 transformation_config=TRANSFORMATION_CONFIG,
             )
             return f"File '{display_name}' uploaded successfully to RagCorpus. RagFile ID: {rag_file.name}"
@@ -276,23 +365,124 @@ def add_file(file: FileStorage, corpus_id: str) -> str:
                 except OSError as e:
                     print(f"Warning: Could not remove temporary file {temp_file_path}: {e}")
                 
+# RAG uploads
+#
+# Uploads to corpora run on a pool of RAG_UPLOAD_MAX_CONCURRENCY threads shared
+# by every request of the process, and calls rejected for quota (429) or
+# availability (503) are retried with exponential backoff. With
+# RAG_IMPORT_BUCKET set, uploads are staged to GCS instead, at
+# rag/<corpus_id>/<sha256>/<file name>, and imported RAG_IMPORT_BATCH_SIZE
+# files per `rag.import_files` call, which Vertex chunks and embeds
+# server-side. Staged objects are kept: they are what citations link to.
+RAG_UPLOAD_MAX_CONCURRENCY = int(os.getenv("RAG_UPLOAD_MAX_CONCURRENCY", "4"))
+RAG_UPLOAD_MAX_RETRIES = int(os.getenv("RAG_UPLOAD_MAX_RETRIES", "5"))
+RAG_UPLOAD_BACKOFF_SECONDS = float(os.getenv("RAG_UPLOAD_BACKOFF_SECONDS", "2"))
+RAG_IMPORT_BUCKET = os.getenv("RAG_IMPORT_BUCKET")
+RAG_IMPORT_BATCH_SIZE = int(os.getenv("RAG_IMPORT_BATCH_SIZE", "25"))
+RAG_IMPORT_MAX_EMBEDDING_REQUESTS_PER_MIN = int(os.getenv("RAG_IMPORT_MAX_EMBEDDING_REQUESTS_PER_MIN", "1000"))
+
+_QUOTA_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests, google_exceptions.ServiceUnavailable)
+_STAGED_HASH_PATTERN = re.compile(r"/rag/[^/]+/([0-9a-f]{64})/")
+
+_rag_upload_executor = ThreadPoolExecutor(max_workers=RAG_UPLOAD_MAX_CONCURRENCY, thread_name_prefix="rag-upload")
+# Vertex runs one import operation per corpus at a time. Each upload request
+# runs its own event loop, so an asyncio.Lock (bound to one loop) cannot order
+# them; the lock is a threading.Lock taken from the loop without blocking, so
+# waiting imports hold no pool worker.
+_corpus_import_locks: Dict[str, threading.Lock] = {}
+_corpus_import_locks_guard = threading.Lock()
+_CORPUS_IMPORT_LOCK_POLL_SECONDS = 1.0
+
+def _is_quota_error(e: Exception) -> bool:
+    # The SDK sometimes re-raises API errors as plain exceptions
+    return isinstance(e, _QUOTA_ERRORS) or "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e)
+
+def with_quota_backoff(fn, *args, **kwargs):
+    """Call `fn`, retrying quota and availability errors with exponential backoff and jitter."""
+    for attempt in range(RAG_UPLOAD_MAX_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == RAG_UPLOAD_MAX_RETRIES or not _is_quota_error(e):
+                raise
+            delay = RAG_UPLOAD_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.0)
+            logger.warning(f"{getattr(fn, '__name__', 'RAG call')} rate limited ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+async def _run_rag_call(fn, *args, **kwargs):
+    """Run a blocking RAG/GCS call on the shared upload pool, with quota backoff."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_rag_upload_executor, functools.partial(with_quota_backoff, fn, *args, **kwargs))
+
+async def stage_file_for_import_async(temp_file_path: str, display_name: str, corpus_id: str, content_hash: Optional[str] = None) -> str:
+    """Copy an upload to RAG_IMPORT_BUCKET for `import_files_async`; returns its gs:// URI."""
+    if content_hash is None:
+        content_hash, _ = file_digest(temp_file_path)
+    object_name = f"rag/{corpus_id}/{content_hash}/{display_name}"
+    return await _run_rag_call(upload_to_gcs, temp_file_path, RAG_IMPORT_BUCKET, object_name, "application/octet-stream")
+
+async def import_files_async(corpus_id: str, gcs_uris: List[str]) -> Dict[str, str]:
+    """
+    Import staged files into a corpus with one `rag.import_files` call.
+
+    Returns:
+        gs:// URI -> RagFile name, for the URIs that are in the corpus afterwards
+        (newly imported, or skipped because unchanged since an earlier import)
+    """
+    full_corpus_path = f"projects/{PROJECT_ID}/locations/{RAG_LOCATION}/ragCorpora/{corpus_id}"
+    with _corpus_import_locks_guard:
+        lock = _corpus_import_locks.setdefault(corpus_id, threading.Lock())
+    while not lock.acquire(blocking=False):
+        await asyncio.sleep(_CORPUS_IMPORT_LOCK_POLL_SECONDS)
+    try:
+        importing = asyncio.get_running_loop().run_in_executor(_rag_upload_executor, functools.partial(
+            with_quota_backoff,
+            rag.import_files,
+            full_corpus_path,
+            gcs_uris,
+            transformation_config=TRANSFORMATION_CONFIG,
+            max_embedding_requests_per_min=RAG_IMPORT_MAX_EMBEDDING_REQUESTS_PER_MIN,
+        ))
+    except Exception:
+        lock.release()
+        raise
+    # Released when the import ends, even if this coroutine is cancelled first
+    importing.add_done_callback(lambda _: lock.release())
+    response = await importing
+    logger.info(
+        f"Imported {response.imported_rag_files_count} files into {corpus_id} "
+        f"({response.skipped_rag_files_count} skipped, {response.failed_rag_files_count} failed)"
+    )
+
+    def imported_files():
+        wanted = set(gcs_uris)
+        return {
+            uri: rag_file.name
+            for rag_file in get_files(corpus_id)
+            for uri in _rag_file_uris(rag_file)
+            if uri in wanted
+        }
+    return await _run_rag_call(imported_files)
+
 async def add_file_async(file: FileStorage, corpus_id: str) -> str:
     """Async wrapper for add_file function to support concurrent uploads"""
     loop = asyncio.get_event_loop()
     # Run the synchronous add_file function in a thread pool executor
     return await loop.run_in_executor(None, add_file, file, corpus_id)
 
-async def upload_temp_file_async(temp_file_path: str, display_name: str, corpus_id: str) -> str:
+async def upload_temp_file_async(temp_file_path: str, display_name: str, corpus_id: str, description: Optional[str] = None) -> str:
     """Async function to upload a file from a temporary path to RAG corpus"""
     loop = asyncio.get_event_loop()
     
     def upload_temp_file():
         full_corpus_path = f"projects/{PROJECT_ID}/locations/{RAG_LOCATION}/ragCorpora/{corpus_id}"
         try:
-            rag_file: RagFile = rag.upload_file(
+            rag_file: RagFile = with_quota_backoff(
+                rag.upload_file,
                 corpus_name=full_corpus_path,
                 display_name=display_name,
                 path=temp_file_path,
+                description=description,
                 transformation_config=TRANSFORMATION_CONFIG,
             )
             return f"File '{display_name}' uploaded successfully to RagCorpus. RagFile ID: {rag_file.name}"
@@ -300,8 +490,8 @@ async def upload_temp_file_async(temp_file_path: str, display_name: str, corpus_
             print(f"Error uploading file: {e}")
             raise Exception(f"Error uploading file: {e}")
     
-    # Run the upload in a thread pool executor
-    return await loop.run_in_executor(None, upload_temp_file)
+    # Run the upload on the bounded RAG upload pool
+    return await loop.run_in_executor(_rag_upload_executor, upload_temp_file)
 
 def remove_file(file_id: str, corpus_id: str) -> str:
     full_corpus_path = f"projects/{PROJECT_ID}/locations/{RAG_LOCATION}/ragCorpora/{corpus_id}"
@@ -313,6 +503,27 @@ def get_files(corpus_id: str) -> ListRagFilesPager:
     full_corpus_path = f"projects/{PROJECT_ID}/locations/{RAG_LOCATION}/ragCorpora/{corpus_id}"
     return rag.list_files(full_corpus_path)
 
+def _rag_file_uris(rag_file) -> List[str]:
+    gcs_source = getattr(rag_file, "gcs_source", None)
+    return list(getattr(gcs_source, "uris", None) or [])
+
+def get_rag_file_hashes(corpus_id: str) -> Dict[str, str]:
+    """
+    Content hash -> RagFile name of the files of a corpus uploaded with their
+    hash as description, or imported from a staged object whose path carries
+    it (see libs/dedup.py).
+    """
+    hashes = {}
+    for rag_file in get_files(corpus_id):
+        description = rag_file.description or ""
+        if description.startswith(RAG_FILE_HASH_PREFIX):
+            hashes[description[len(RAG_FILE_HASH_PREFIX):]] = rag_file.name
+        for uri in _rag_file_uris(rag_file):
+            match = _STAGED_HASH_PATTERN.search(uri)
+            if match:
+                hashes[match.group(1)] = rag_file.name
+    return hashes
+
 def read_one_file(file_id: str, corpus_id: str) -> RagFile:
     """
     This one can be improved by upload to gg storage and return the url
@@ -343,14 +554,25 @@ def list_corpora():
         logger.error(f"Error listing corpora: {e}")
         return []
 
-def upload_to_gcs(file_path: str, bucket_name: str) -> str:
-    """Upload a file to Google Cloud Storage"""
+# Uploads are sent as resumable sessions in chunks of this size (a multiple of
+# 256 KiB), so a large training file is never read into memory at once and a
+# dropped connection only retries the current chunk.
+_GCS_CHUNK_UNIT = 256 * 1024
+GCS_UPLOAD_CHUNK_SIZE = max(int(os.getenv("GCS_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))) // _GCS_CHUNK_UNIT, 1) * _GCS_CHUNK_UNIT
+
+def upload_to_gcs(
+    file_path: str,
+    bucket_name: str,
+    object_name: Optional[str] = None,
+    content_type: str = "application/jsonl",
+) -> str:
+    """Upload a file to Google Cloud Storage (as jsonl/<file name> unless `object_name` is given)"""
     storage_client = storage.Client()
     bucket = storage_client.bucket(bucket_name)
     file_name = file_path.split("/")[-1]
-    final_file_path = f"jsonl/{file_name}"
-    blob = bucket.blob(final_file_path)
-    blob.upload_from_filename(file_path)
+    final_file_path = object_name or f"jsonl/{file_name}"
+    blob = bucket.blob(final_file_path, chunk_size=GCS_UPLOAD_CHUNK_SIZE)
+    blob.upload_from_filename(file_path, content_type=content_type)
     # should return gs://cloud-samples-data/training-file.jsonl
     return f"gs://{bucket_name}/{final_file_path}"
 
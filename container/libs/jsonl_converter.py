@@ -6,7 +6,7 @@ import json
 import os
 import uuid
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -91,6 +91,42 @@ def save_jsonl_to_file(jsonl_content: str, filename: str = None, directory: str
         logger.error(f"Error saving JSONL file: {str(e)}")
         raise ValueError(f"Failed to save JSONL file: {str(e)}")
 
+def message_to_fine_tune_example(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Convert one message with its `related_message` into a fine-tuning example.
+
+    Returns:
+        {"contents": [user, model]} or None when the message is not a user/assistant pair
+    """
+    related = message.get("related_message")
+    # Skip messages without related messages (we need conversation pairs)
+    if not related:
+        return None
+    
+    # Determine the conversation flow
+    if message["role"] == "user" and related["role"] == "assistant":
+        # User message followed by assistant response
+        user_text, model_text = message["content"], related["content"]
+    elif message["role"] == "assistant" and related["role"] == "user":
+        # Assistant message preceded by user message
+        user_text, model_text = related["content"], message["content"]
+    else:
+        # Skip invalid conversation pairs
+        return None
+    
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [{"text": user_text}]
+            },
+            {
+                "role": "model",
+                "parts": [{"text": model_text}]
+            }
+        ]
+    }
+
 def convert_messages_to_fine_tune_format(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Convert messages to the format required for Vertex AI fine-tuning.
@@ -111,46 +147,55 @@ def convert_messages_to_fine_tune_format(messages: List[Dict[str, Any]]) -> List
         List of dictionaries in the fine-tuning format
     """
     fine_tune_data = []
-    
     for message in messages:
-        # Skip messages without related messages (we need conversation pairs)
-        if not message.get("related_message"):
-            continue
+        example = message_to_fine_tune_example(message)
+        if example:
+            fine_tune_data.append(example)
+    return fine_tune_data
+
+def validate_fine_tune_example(item: Any, i: int = 0) -> bool:
+    """
+    Validate one fine-tuning example; `i` is its position, used in error messages.
+    
+    Returns:
+        True if valid, raises ValueError if invalid
+    """
+    if not isinstance(item, dict):
+        raise ValueError(f"Item {i} must be a dictionary")
+    
+    if "contents" not in item:
+        raise ValueError(f"Item {i} must have 'contents' key")
+    
+    if not isinstance(item["contents"], list):
+        raise ValueError(f"Item {i} 'contents' must be a list")
+    
+    if len(item["contents"]) < 2:
+        raise ValueError(f"Item {i} must have at least 2 content items (user and model)")
+    
+    for j, content in enumerate(item["contents"]):
+        if not isinstance(content, dict):
+            raise ValueError(f"Item {i}, content {j} must be a dictionary")
+        
+        if "role" not in content:
+            raise ValueError(f"Item {i}, content {j} must have 'role' key")
+        
+        if "parts" not in content:
+            raise ValueError(f"Item {i}, content {j} must have 'parts' key")
         
-        # Determine the conversation flow
-        if message["role"] == "user" and message["related_message"]["role"] == "assistant":
-            # User message followed by assistant response
-            conversation = [
-                {
-                    "role": "user",
-                    "parts": [{"text": message["content"]}]
-                },
-                {
-                    "role": "model",
-                    "parts": [{"text": message["related_message"]["content"]}]
-                }
-            ]
-        elif message["role"] == "assistant" and message["related_message"]["role"] == "user":
-            # Assistant message preceded by user message
-            conversation = [
-                {
-                    "role": "user",
-                    "parts": [{"text": message["related_message"]["content"]}]
-                },
-                {
-                    "role": "model",
-                    "parts": [{"text": message["content"]}]
-                }
-            ]
-        else:
-            # Skip invalid conversation pairs
-            continue
+        if not isinstance(content["parts"], list):
+            raise ValueError(f"Item {i}, content {j} 'parts' must be a list")
         
-        fine_tune_data.append({
-            "contents": conversation
-        })
+        for k, part in enumerate(content["parts"]):
+            if not isinstance(part, dict):
+                raise ValueError(f"Item {i}, content {j}, part {k} must be a dictionary")
+            
+            if "text" not in part:
+                raise ValueError(f"Item {i}, content {j}, part {k} must have 'text' key")
+            
+            if not isinstance(part["text"], str):
+                raise ValueError(f"Item {i}, content {j}, part {k} 'text' must be a string")
     
-    return fine_tune_data
+    return True
 
 def validate_fine_tune_data(data: List[Dict[str, Any]]) -> bool:
     """
@@ -169,39 +214,51 @@ def validate_fine_tune_data(data: List[Dict[str, Any]]) -> bool:
         raise ValueError("Data list cannot be empty")
     
     for i, item in enumerate(data):
-        if not isinstance(item, dict):
-            raise ValueError(f"Item {i} must be a dictionary")
-        
-        if "contents" not in item:
-            raise ValueError(f"Item {i} must have 'contents' key")
-        
-        if not isinstance(item["contents"], list):
-            raise ValueError(f"Item {i} 'contents' must be a list")
-        
-        if len(item["contents"]) < 2:
-            raise ValueError(f"Item {i} must have at least 2 content items (user and model)")
-        
-        for j, content in enumerate(item["contents"]):
-            if not isinstance(content, dict):
-                raise ValueError(f"Item {i}, content {j} must be a dictionary")
-            
-            if "role" not in content:
-                raise ValueError(f"Item {i}, content {j} must have 'role' key")
-            
-            if "parts" not in content:
-                raise ValueError(f"Item {i}, content {j} must have 'parts' key")
-            
-            if not isinstance(content["parts"], list):
-                raise ValueError(f"Item {i}, content {j} 'parts' must be a list")
-            
-            for k, part in enumerate(content["parts"]):
-                if not isinstance(part, dict):
-                    raise ValueError(f"Item {i}, content {j}, part {k} must be a dictionary")
-                
-                if "text" not in part:
-                    raise ValueError(f"Item {i}, content {j}, part {k} must have 'text' key")
-                
-                if not isinstance(part["text"], str):
-                    raise ValueError(f"Item {i}, content {j}, part {k} 'text' must be a string")
+        validate_fine_tune_example(item, i)
     
-    return True 
\ No newline at end of file
+    return True
+
+def write_fine_tune_jsonl(
+    messages: Iterable[Dict[str, Any]],
+    filename: str = None,
+    directory: str = None,
+) -> Tuple[str, int]:
+    """
+    Convert, validate and write messages to a JSONL file in a single pass.
+
+    Each example is written as soon as it is converted, so memory use does not
+    depend on how many messages `messages` yields.
+
+    Args:
+        messages: Messages with `related_message` attached (any iterable, e.g. a generator)
+        filename: Optional filename (if not provided, a temporary name will be generated)
+        directory: Optional directory path (if not provided, uses 'temp' directory)
+
+    Returns:
+        (path to the written file, number of examples written)
+    """
+    if not filename:
+        filename = f"fine_tune_data_{uuid.uuid4().hex[:8]}.jsonl"
+    if not directory:
+        directory = os.path.join(os.getcwd(), "temp")
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, filename)
+
+    count = 0
+    try:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for message in messages:
+                example = message_to_fine_tune_example(message)
+                if not example:
+                    continue
+                validate_fine_tune_example(example, count)
+                if count:
+                    f.write("\n")
+                f.write(json.dumps(example, ensure_ascii=False))
+                count += 1
+    except Exception:
+        os.remove(file_path)
+        raise
+
+    logger.info(f"JSONL file with {count} examples saved to: {file_path}")
+    return file_path, count
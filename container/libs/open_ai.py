@@ -1,12 +1,43 @@
 import os
-from openai import OpenAI
-from typing import List, Dict, Any, Optional, Generator
+from openai import OpenAI, AsyncOpenAI
+from typing import List, Dict, Any, Optional, Generator, AsyncGenerator
 from data_classes.common_classes import Message, Language, Agent
 from services.handle_agent import get_agent_by_id
 from data_classes.common_classes import StreamEvent
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize OpenAI client
 client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+def build_openai_messages(
+    agent: Agent,
+    messages: List[Message],
+    contexts: List[Dict[str, str]],
+) -> List[Dict[str, str]]:
+    """Build the chat completion messages (system prompt, RAG context, history)."""
+    base_language = getattr(agent, "language", Language.VI.value) if agent else Language.VI.value
+    base_system_prompt = getattr(agent, "system_prompt", "") if agent else ""
+    
+    # Prepare the context from relevant documents
+    context_text = "\n\n".join([
+        f"Source: {ctx['title']}\nContent: {ctx['content']}"
+        for ctx in contexts
+    ])
+    
+    if base_language == Language.VI.value:
+        instruction = "Đây là nội dung liên quan đến câu hỏi của bạn"
+    else:
+        instruction = "Here is the relevant context from our knowledge base"
+    # Prepare the messages for the chat
+    chat_messages = [
+        {"role": "system", "content": base_system_prompt},
+        {"role": "system", "content": f"{instruction}:\n\n{context_text}"}
+    ]
+        
+    # Add the conversation history
+    for msg in messages:
+        chat_messages.append({"role": msg.role, "content": msg.content})
+    return chat_messages
 
 def generate_openai_answer(
     agent: Agent,
@@ -15,36 +46,9 @@ def generate_openai_answer(
     stream: bool = False,
 ) -> str | Generator[StreamEvent, None, None]:
     try:
-        base_language = agent["language"] if agent else Language.VI
-        base_model = agent["model"] if agent else "gpt-4o"
-        base_temperature = agent["temperature"] if agent else 0
-        base_system_prompt = agent["system_prompt"] if agent else ""
-        
-        # Prepare the context from relevant documents
-        context_text = "\n\n".join([
-            f"Source: {ctx['title']}\nContent: {ctx['content']}"
-            for ctx in contexts
-        ])
-        
-        # if not system_prompt:
-        #     if language == Language.VI.value:
-        #         system_prompt = SYSTEM_PROMPT_VI
-        #     else:
-        #         system_prompt = SYSTEM_PROMPT_EN
-        
-        if base_language == Language.VI.value:
-            instruction = "Đây là nội dung liên quan đến câu hỏi của bạn"
-        else:
-            instruction = "Here is the relevant context from our knowledge base"
-        # Prepare the messages for the chat
-        chat_messages = [
-            {"role": "system", "content": base_system_prompt},
-            {"role": "system", "content": f"{instruction}:\n\n{context_text}"}
-        ]
-            
-        # Add the conversation history
-        for msg in messages:
-            chat_messages.append({"role": msg.role, "content": msg.content})
+        base_model = getattr(agent, "model", "gpt-4o") if agent else "gpt-4o"
+        base_temperature = getattr(agent, "temperature", 0) if agent else 0
+        chat_messages = build_openai_messages(agent, messages, contexts)
 
         if stream:
             generator = client.chat.completions.create(
@@ -74,6 +78,29 @@ def generate_openai_answer(
     except Exception as e:
         raise Exception(f"Error generating answer: {e}")
 
+async def generate_openai_answer_async(
+    agent: Agent,
+    messages: List[Message],
+    contexts: List[Dict[str, str]],
+) -> AsyncGenerator[StreamEvent, None]:
+    """Async streaming variant of generate_openai_answer."""
+    try:
+        base_model = getattr(agent, "model", "gpt-4o") if agent else "gpt-4o"
+        base_temperature = getattr(agent, "temperature", 0) if agent else 0
+        generator = await async_client.chat.completions.create(
+            model=base_model,
+            messages=build_openai_messages(agent, messages, contexts),
+            temperature=base_temperature,
+            max_completion_tokens=1500,
+            stream=True
+        )
+        async for chunk in generator:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield StreamEvent(type="text", data=chunk.choices[0].delta.content)
+        yield StreamEvent(type="end_of_stream", data="", metadata=contexts)
+    except Exception as e:
+        raise Exception(f"Error generating answer: {e}")
+
 
 def basic_openai_answer(query: str, model: str = "gpt-4o", temperature: float = 0) -> str:
     try:
@@ -0,0 +1,116 @@
+import os
+import atexit
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+from pypdf import PdfReader
+
+# Page-parallel text extraction. pypdf is pure Python, so a large book keeps
+# one core busy for as long as it takes to extract every page; here pages are
+# spread over a process pool in runs of PDF_EXTRACT_PAGES_PER_TASK, and come
+# back in order as soon as the run they belong to is done.
+#
+# This module only imports pypdf, so the pool's workers (started with "spawn",
+# which is safe next to the Weaviate/gRPC threads of the parent) stay light.
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 8))))
+PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", "8"))
+# Smaller documents are extracted in the calling process.
+PDF_EXTRACT_MIN_PARALLEL_PAGES = int(os.getenv("PDF_EXTRACT_MIN_PARALLEL_PAGES", "16"))
+
+PdfSource = Union[str, bytes, IO[bytes]]
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+# Reader of the last file a worker process opened, so the runs of one
+# document parse its cross-reference table once per worker.
+_worker_reader: Tuple[Optional[tuple], Optional[PdfReader]] = (None, None)
+
+def _extract_page_run(path: str, file_key: tuple, start: int, end: int) -> List[str]:
+    global _worker_reader
+    key, reader = _worker_reader
+    if key != file_key:
+        reader = PdfReader(path)
+        _worker_reader = (file_key, reader)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(pool.shutdown, wait=False, cancel_futures=True)
+            _pools[workers] = pool
+        return pool
+
+def _spool(source: PdfSource) -> Tuple[str, bool]:
+    """Path of `source` on disk, and whether it is a temporary copy."""
+    if isinstance(source, str):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"PDF file not found at: {source}")
+        return source, False
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        if isinstance(source, (bytes, bytearray)):
+            f.write(source)
+        else:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            while True:
+                block = source.read(1 << 20)
+                if not block:
+                    break
+                f.write(block)
+    return path, True
+
+def iter_pdf_pages(source: PdfSource, workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield `(page_number, text)` for every page of a PDF, in order, 1-based.
+
+    Args:
+        source: Path, bytes or binary file object (e.g. an uploaded FileStorage).
+        workers: Processes to extract with; defaults to PDF_EXTRACT_WORKERS.
+            1 extracts in the calling process.
+
+    Pages are extracted ahead of the consumer, at most two runs per worker, so
+    memory stays bounded however large the document is.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    path, temporary = _spool(source)
+    try:
+        reader = PdfReader(path)
+        page_count = len(reader.pages)
+        if workers <= 1 or page_count < PDF_EXTRACT_MIN_PARALLEL_PAGES:
+            for i, page in enumerate(reader.pages):
+                yield i + 1, page.extract_text() or ""
+            return
+
+        stat = os.stat(path)
+        file_key = (path, stat.st_mtime_ns, stat.st_size)
+        pool = _get_pool(workers)
+        runs = deque(
+            (start, min(start + PDF_EXTRACT_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PDF_EXTRACT_PAGES_PER_TASK)
+        )
+        in_flight = deque()
+        try:
+            while runs or in_flight:
+                while runs and len(in_flight) < workers * 2:
+                    start, end = runs.popleft()
+                    in_flight.append((start, pool.submit(_extract_page_run, path, file_key, start, end)))
+                start, future = in_flight.popleft()
+                for offset, text in enumerate(future.result()):
+                    yield start + offset + 1, text
+        finally:
+            # The consumer may stop early; don't leave runs reading a file about to be removed.
+            for _, future in in_flight:
+                future.cancel()
+            for _, future in in_flight:
+                if not future.cancelled():
+                    future.exception()
+    finally:
+        if temporary:
+            os.remove(path)
@@ -1,12 +1,21 @@
 import os
-from typing import List
-from pypdf import PdfReader
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
 from langchain.schema import Document
-from libs.chunker import semantic_chunk_text
+from libs.chunker import chunk_text, SENTENCE_SPLIT_REGEX
+from libs.embedding_cache import embedding_cache_stats, embedding_batcher_stats
+from libs.pdf_extract import PdfSource, iter_pdf_pages
 
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'pdf'}
+
+# Pages are chunked in windows of this many pages while later pages are
+# still being extracted. The last chunk of a window is re-chunked with the
+# next window, so windows do not cut chunks short.
+PDF_CHUNK_WINDOW_PAGES = int(os.getenv("PDF_CHUNK_WINDOW_PAGES", "10"))
+
 def read_pdf(file_path: str) -> str:
     """
     Read a PDF file and extract its text content.
@@ -17,22 +26,12 @@ def read_pdf(file_path: str) -> str:
     Returns:
         str: Extracted text from the PDF
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"PDF file not found at: {file_path}")
-    
-    # Initialize PDF reader
-    reader = PdfReader(file_path)
-    text = ""
-    
-    # Extract text from each page
-    for page in reader.pages:
-        text += page.extract_text() + "\n\n"
-    
-    return text
+    return "".join(text + "\n\n" for _, text in iter_pdf_pages(file_path))
 
 def process_pdf(
     text: str,
-    output_file: str = None
+    output_file: str = None,
+    strategy: Optional[str] = None,
 ) -> List[Document]:
     """
     Process text content and split it into semantic chunks.
@@ -40,28 +39,119 @@ def process_pdf(
     Args:
         text (str): Text content to process
         output_file (str, optional): Path to save the chunks. If None, chunks won't be saved.
+        strategy (str, optional): ChunkingStrategy value; defaults to CHUNKING_STRATEGY
         
     Returns:
         List[Document]: List of chunked documents
     """
     # Chunk the text
     print("Chunking text...")
-    chunks = semantic_chunk_text(
+    chunks = chunk_text(
         text,
+        strategy,
     )
+    print(f"Embedding cache: {embedding_cache_stats()}")
+    print(f"Embedding batcher: {embedding_batcher_stats()}")
     
     # Save chunks to file if output_file is specified
     if output_file:
-        print(f"Saving chunks to: {output_file}")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for i, chunk in enumerate(chunks):
-                f.write(f"\n{'='*50}\n")
-                f.write(f"Chunk {i + 1}\n")
-                f.write(f"{'='*50}\n\n")
-                f.write(chunk.page_content)
-                f.write("\n")
+        save_chunks(chunks, output_file)
     
     return chunks
+
+def save_chunks(chunks: List[Document], output_file: str):
+    print(f"Saving chunks to: {output_file}")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for i, chunk in enumerate(chunks):
+            f.write(f"\n{'='*50}\n")
+            f.write(f"Chunk {i + 1}\n")
+            f.write(f"{'='*50}\n\n")
+            f.write(chunk.page_content)
+            f.write("\n")
+
+def _chunk_window(
+    text: str,
+    page_offsets: List[int],
+    page_numbers: List[int],
+    strategy: Optional[str] = None,
+) -> List[Tuple[Document, int]]:
+    """Chunks of `text` with page metadata, each paired with its start offset in `text`."""
+    results = []
+    cursor = 0
+    for chunk in chunk_text(text, strategy):
+        # Sentences are verbatim pieces of `text`, so the first and last
+        # sentence of a chunk locate it even though their separators were
+        # normalized to single spaces.
+        sentences = re.split(SENTENCE_SPLIT_REGEX, chunk.page_content)
+        start = text.find(sentences[0], cursor)
+        start = start if start >= 0 else cursor
+        end = text.find(sentences[-1], start)
+        end = end + len(sentences[-1]) if end >= 0 else start + len(chunk.page_content)
+        # Chunks may overlap, so the next one is searched from this one's start.
+        cursor = start
+        chunk.metadata["page_start"] = page_numbers[bisect_right(page_offsets, start) - 1]
+        chunk.metadata["page_end"] = page_numbers[bisect_right(page_offsets, max(end - 1, start)) - 1]
+        results.append((chunk, start))
+    return results
+
+def chunk_pdf_pages(
+    pages: Iterable[Tuple[int, str]],
+    window_pages: int = PDF_CHUNK_WINDOW_PAGES,
+    strategy: Optional[str] = None,
+) -> Iterator[Document]:
+    """
+    Chunks of `(page_number, text)` pages, yielded while pages keep arriving.
+
+    Each chunk carries `page_start` and `page_end` metadata. `strategy` is a
+    ChunkingStrategy value (default: CHUNKING_STRATEGY).
+    """
+    text, page_offsets, page_numbers = "", [], []
+    window_count = 0
+
+    for page_number, page_text in pages:
+        page_offsets.append(len(text))
+        page_numbers.append(page_number)
+        text += page_text + "\n\n"
+        window_count += 1
+        if window_count < window_pages:
+            continue
+
+        chunks = _chunk_window(text, page_offsets, page_numbers, strategy)
+        window_count = 0
+        if len(chunks) < 2:
+            continue
+        for chunk, _ in chunks[:-1]:
+            yield chunk
+        # Carry the unfinished last chunk, with its page offsets, into the next window.
+        carry_start = chunks[-1][1]
+        first = bisect_right(page_offsets, carry_start) - 1
+        page_offsets = [0] + [offset - carry_start for offset in page_offsets[first + 1:]]
+        page_numbers = page_numbers[first:]
+        text = text[carry_start:]
+
+    if text.strip():
+        for chunk, _ in _chunk_window(text, page_offsets, page_numbers, strategy):
+            yield chunk
+
+def process_pdf_file(source: PdfSource, output_file: str = None, strategy: Optional[str] = None) -> List[Document]:
+    """
+    Extract a PDF page-parallel and chunk it as pages arrive.
+
+    Args:
+        source: Path, bytes or binary file object of the PDF
+        output_file (str, optional): Path to save the chunks. If None, chunks won't be saved.
+        strategy (str, optional): ChunkingStrategy value; defaults to CHUNKING_STRATEGY
+
+    Returns:
+        List[Document]: Chunks with `page_start`/`page_end` metadata
+    """
+    print("Extracting and chunking PDF...")
+    chunks = list(chunk_pdf_pages(iter_pdf_pages(source), strategy=strategy))
+    print(f"Embedding cache: {embedding_cache_stats()}")
+    print(f"Embedding batcher: {embedding_batcher_stats()}")
+    if output_file:
+        save_chunks(chunks, output_file)
+    return chunks
  
  
  
@@ -87,12 +177,4 @@ def read_pdf_from_buffer(file_buffer) -> str:
     Returns:
         str: Extracted text from the PDF
     """
-    # Initialize PDF reader with the buffer
-    reader = PdfReader(file_buffer)
-    text = ""
-    
-    # Extract text from each page
-    for page in reader.pages:
-        text += page.extract_text() + "\n\n"
-    
-    return text
+    return "".join(text + "\n\n" for _, text in iter_pdf_pages(file_buffer))
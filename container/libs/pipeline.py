@@ -0,0 +1,97 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+_DONE = object()
+
+Stage = Tuple[str, Callable[[Iterator[Any]], Iterable[Any]]]
+
+class StagePipeline:
+    """
+    Generator stages running on their own threads, connected by bounded queues.
+
+    Each stage is `fn(items) -> iterable`: it consumes what the previous stage
+    (or `source`) produced and yields items for the next one, so stages can
+    batch, split or drop items freely. Iterating the pipeline yields the last
+    stage's output. Queues hold at most `queue_size` items, so a slow stage
+    holds back the ones before it instead of buffering a whole file.
+
+    The first exception raised by the source or any stage stops every stage
+    and is re-raised to the consumer.
+
+    Usage:
+        pipeline = StagePipeline(pages, [("chunk", chunk_pages), ("embed", embed_batches)])
+        for batch in pipeline:
+            ...
+    """
+
+    def __init__(self, source: Iterable[Any], stages: List[Stage], queue_size: int = 8):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    @property
+    def stopped(self) -> bool:
+        """True once a stage failed or the consumer stopped early; stages then end without finishing their input."""
+        return self._stop.is_set()
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, q: queue.Queue) -> Iterator[Any]:
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _run(self, produce: Callable[[], Iterable[Any]], out: queue.Queue):
+        items = None
+        try:
+            items = produce()
+            for item in items:
+                if not self._put(out, item):
+                    return
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self._stop.set()
+        finally:
+            # Let generators clean up (temporary files, in-flight work) when stopped early.
+            if hasattr(items, "close"):
+                items.close()
+            self._put(out, _DONE)
+
+    def __iter__(self) -> Iterator[Any]:
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run, args=(lambda: self.source, queues[0]), name="pipeline-source", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            produce = lambda fn=fn, q=queues[i]: fn(self._drain(q))
+            threads.append(threading.Thread(target=self._run, args=(produce, queues[i + 1]), name=f"pipeline-{name}", daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            yield from self._drain(queues[-1])
+        finally:
+            if self._error is None:
+                # Stages finished, or the consumer stopped early.
+                self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,142 @@
+import os
+import copy
+import mmap
+import hashlib
+import tempfile
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from libs.ttl_cache import TTLCache
+
+_MISSING = object()
+
+class GenerationTable:
+    """
+    Write generations shared by every process on the machine.
+
+    Generations live in a small memory-mapped file of 8-byte slots. A write
+    stores a fresh random value in its slot rather than incrementing it, so two
+    processes racing on the same slot can never leave it looking unchanged.
+    Keys hash into a fixed number of slots; a collision only invalidates a few
+    extra entries.
+
+    Args:
+        path: File backing the table.
+        slots: Number of 8-byte slots.
+    """
+
+    def __init__(self, path: str, slots: int = 8192):
+        self.slots = slots
+        size = slots * 8
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _slot(self, key: Tuple[str, ...]) -> int:
+        digest = hashlib.blake2b("\x1f".join(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.slots * 8
+
+    def get(self, key: Tuple[str, ...]) -> bytes:
+        offset = self._slot(key)
+        return self._map[offset:offset + 8]
+
+    def bump(self, key: Tuple[str, ...]):
+        offset = self._slot(key)
+        self._map[offset:offset + 8] = os.urandom(8)
+
+class ResultCache:
+    """
+    TTL cache of query results that go stale as soon as their collection is written.
+
+    Every write bumps the collection's "all" generation. A write whose scope
+    is known (e.g. the session of an inserted message) also bumps that scope's
+    generation; otherwise the collection's "unscoped" generation is bumped.
+    An unscoped read is valid while "all" is unchanged, and a scoped read while
+    both "unscoped" and its scope are unchanged, so writes to one chat session
+    do not evict cached reads of another.
+
+    Args:
+        maxsize: Maximum number of cached results.
+        ttl: Seconds a result may be served; bounds staleness from writers on other machines.
+        generations: Table shared with the other workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, generations: GenerationTable):
+        self._entries: TTLCache[Tuple[Tuple[bytes, ...], Any]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = generations
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def _generation(self, collection: str, scope: Optional[str]) -> Tuple[bytes, ...]:
+        if scope is None:
+            return (self._generations.get((collection, "all")),)
+        return (
+            self._generations.get((collection, "unscoped")),
+            self._generations.get((collection, "scope", scope)),
+        )
+
+    def _lookup(self, collection: str, key: Hashable, scope: Optional[str]):
+        # Read the generation before the query: a write that lands while the
+        # query runs leaves the new entry already stale.
+        generation = self._generation(collection, scope)
+        cache_key = (collection, scope, key)
+        entry = self._entries.get(cache_key)
+        hit = entry is not None and entry[0] == generation
+        with self._lock:
+            self._stats["hits" if hit else "stale" if entry is not None else "misses"] += 1
+        return cache_key, generation, copy.deepcopy(entry[1]) if hit else _MISSING
+
+    def get_or_load(self, collection: str, key: Hashable, load: Callable[[], Any], scope: Optional[str] = None) -> Any:
+        """
+        Cached result of `load()` for `key`, reloading when `collection` (or `scope`) was written since.
+
+        Results are copied in and out, so callers may mutate what they get.
+        """
+        cache_key, generation, result = self._lookup(collection, key, scope)
+        if result is _MISSING:
+            result = load()
+            self._entries.set(cache_key, (generation, copy.deepcopy(result)))
+        return result
+
+    async def get_or_load_async(
+        self, collection: str, key: Hashable, load: Callable[[], Awaitable[Any]], scope: Optional[str] = None
+    ) -> Any:
+        """Async variant of get_or_load; `load` returns an awaitable."""
+        cache_key, generation, result = self._lookup(collection, key, scope)
+        if result is _MISSING:
+            result = await load()
+            self._entries.set(cache_key, (generation, copy.deepcopy(result)))
+        return result
+
+    def bump(self, collection: str, scope: Optional[str] = None):
+        """Mark cached reads of `collection` affected by a write (to `scope`, if known) as stale."""
+        self._generations.bump((collection, "all"))
+        if scope is None:
+            self._generations.bump((collection, "unscoped"))
+        else:
+            self._generations.bump((collection, "scope", scope))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+def freeze(value: Any) -> Hashable:
+    """Hashable, order-stable representation of query arguments (filters, sorts, lists) for cache keys."""
+    if value is None or isinstance(value, (str, int, float, bool, bytes)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    if hasattr(value, "filters") and hasattr(value, "operator"):
+        # Filter.and_/or_ combinations
+        return (str(value.operator), freeze(value.filters))
+    if hasattr(value, "sorts"):
+        return ("sort", tuple((sort.prop, sort.ascending) for sort in value.sorts))
+    return repr(value)
+
+def default_generations_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{name}.generations")
@@ -0,0 +1,119 @@
+import os
+import time
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Work that follows a request but does not affect its response (context
+# updates, section titles) runs here instead of on the request thread.
+#
+# Tasks are keyed (e.g. one key per chat section). Submitting to a key that
+# already has a pending task adds the payload to it and restarts the debounce
+# timer, so a burst of turns produces one call that sees all of them. Tasks for
+# the same key never run concurrently, and at most SIDE_TASK_WORKERS run at once.
+SIDE_TASK_WORKERS = int(os.getenv("SIDE_TASK_WORKERS", "4"))
+SIDE_TASK_DEBOUNCE_MS = int(os.getenv("SIDE_TASK_DEBOUNCE_MS", "1500"))
+SIDE_TASK_MAX_DELAY_MS = int(os.getenv("SIDE_TASK_MAX_DELAY_MS", "10000"))
+
+@dataclass
+class _PendingTask:
+    handler: Callable[[List[Any]], Any]
+    payloads: List[Any] = field(default_factory=list)
+    first_submitted_at: float = field(default_factory=time.monotonic)
+    timer: Optional[threading.Timer] = None
+    due: bool = False
+
+class SideTaskExecutor:
+    def __init__(self, max_workers: int, debounce_ms: int, max_delay_ms: int):
+        self.debounce = debounce_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="side-task")
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, _PendingTask] = {}
+        self._running: set = set()
+        self._stats = {"submitted": 0, "runs": 0, "failed": 0}
+
+    def submit(self, key: Hashable, handler: Callable[[List[Any]], Any], payload: Any = None):
+        """
+        Schedule `handler(payloads)` for `key` once submissions for it go quiet.
+
+        Args:
+            key: Coalescing key; payloads submitted under the same key are merged.
+            handler: Called with every payload collected since the last run.
+            payload: Value appended to the list passed to `handler`.
+        """
+        with self._lock:
+            self._stats["submitted"] += 1
+            task = self._pending.get(key)
+            if task is None:
+                task = _PendingTask(handler=handler)
+                self._pending[key] = task
+            task.handler = handler
+            task.payloads.append(payload)
+            if task.timer:
+                task.timer.cancel()
+            # Debounce, but never hold a task longer than max_delay after its first payload.
+            waited = time.monotonic() - task.first_submitted_at
+            delay = max(min(self.debounce, self.max_delay - waited), 0)
+            task.timer = threading.Timer(delay, self._fire, args=(key,))
+            task.timer.daemon = True
+            task.timer.start()
+
+    def _fire(self, key: Hashable):
+        with self._lock:
+            task = self._pending.get(key)
+            if task is None:
+                return
+            if key in self._running:
+                # Picked up again when the running task for this key finishes.
+                task.due = True
+                return
+            del self._pending[key]
+            self._running.add(key)
+        try:
+            self._pool.submit(self._run, key, task)
+        except RuntimeError:
+            # The pool is shutting down; finish the task on this thread.
+            self._run(key, task)
+
+    def _run(self, key: Hashable, task: _PendingTask):
+        try:
+            self._stats["runs"] += 1
+            task.handler(task.payloads)
+        except Exception as e:
+            self._stats["failed"] += 1
+            print(f"Side task {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(key)
+                next_task = self._pending.get(key)
+                run_next = next_task is not None and next_task.due
+            if run_next:
+                self._fire(key)
+
+    def flush(self):
+        """Run every pending task now and wait for all of them (used at shutdown)."""
+        with self._lock:
+            keys = list(self._pending.keys())
+            for key in keys:
+                timer = self._pending[key].timer
+                if timer:
+                    timer.cancel()
+        for key in keys:
+            self._fire(key)
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": len(self._pending), "running": len(self._running)}
+
+side_tasks = SideTaskExecutor(
+    max_workers=SIDE_TASK_WORKERS,
+    debounce_ms=SIDE_TASK_DEBOUNCE_MS,
+    max_delay_ms=SIDE_TASK_MAX_DELAY_MS,
+)
+atexit.register(side_tasks.flush)
+
+def submit_side_task(key: Hashable, handler: Callable[[List[Any]], Any], payload: Any = None):
+    side_tasks.submit(key, handler, payload)
@@ -0,0 +1,70 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STAGE_EXECUTOR_WORKERS = int(os.getenv("STAGE_EXECUTOR_WORKERS", "32"))
+
+# Shared by every request in the worker; the lookups it runs are I/O bound.
+_pool = ThreadPoolExecutor(max_workers=STAGE_EXECUTOR_WORKERS, thread_name_prefix="stage")
+
+class StageExecutor:
+    """
+    Run the independent lookups of one request concurrently and time them.
+
+    Usage:
+        stages = StageExecutor()
+        stages.submit("agent", get_agent_runtime, agent_id, language)
+        stages.submit("contexts", get_contexts, message)  # speculative
+        runtime = stages.result("agent")
+        if runtime.provider != AgentProvider.OPENAI:
+            stages.discard("contexts")
+        timings = stages.timings()
+    """
+
+    def __init__(self):
+        self._started_at = time.perf_counter()
+        self._futures: Dict[str, Future] = {}
+        self._durations: Dict[str, float] = {}
+        self._used: Set[str] = set()
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        def timed():
+            started_at = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._durations[name] = (time.perf_counter() - started_at) * 1000
+        future = _pool.submit(timed)
+        self._futures[name] = future
+        return future
+
+    def has(self, name: str) -> bool:
+        return name in self._futures
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Wait for a stage and return its value, re-raising its exception."""
+        self._used.add(name)
+        return self._futures[name].result(timeout=timeout)
+
+    def discard(self, name: str):
+        """Drop a stage whose result is not needed; it is cancelled if it has not started."""
+        future = self._futures.get(name)
+        if future is not None:
+            future.cancel()
+
+    def timings(self) -> Dict[str, float]:
+        """
+        Durations in ms of the stages whose result was taken, plus `wall_ms`
+        (submit to now) and `saved_ms` (what running those stages one after
+        another would have added). Discarded stages are left out.
+        """
+        wall_ms = (time.perf_counter() - self._started_at) * 1000
+        durations = {name: ms for name, ms in self._durations.items() if name in self._used}
+        timings = {f"{name}_ms": round(ms, 1) for name, ms in durations.items()}
+        timings["wall_ms"] = round(wall_ms, 1)
+        timings["saved_ms"] = round(max(sum(durations.values()) - wall_ms, 0), 1)
+        return timings
@@ -0,0 +1,115 @@
+import re
+import time
+from typing import Iterable, Iterator
+from google.cloud import texttospeech
+
+# Backends for Cloud TTS bidirectional streaming synthesis. Text goes in as a
+# series of inputs and audio comes back in frames while later text is still
+# being synthesized, so the first bytes can be played before the whole text
+# is done. Streaming output is headerless: raw samples for LINEAR16/MULAW/ALAW,
+# Ogg pages for OGG_OPUS.
+
+# Only Chirp HD voices support streaming synthesis.
+STREAMING_VOICE_PATTERN = re.compile(r"Chirp3?-HD", re.IGNORECASE)
+STREAMING_ENCODINGS = {
+    texttospeech.AudioEncoding.LINEAR16,
+    texttospeech.AudioEncoding.OGG_OPUS,
+    texttospeech.AudioEncoding.MULAW,
+    texttospeech.AudioEncoding.ALAW,
+}
+# (WAV format code, bits per sample) of the raw encodings
+_WAV_FORMATS = {
+    texttospeech.AudioEncoding.LINEAR16: (1, 16),
+    texttospeech.AudioEncoding.ALAW: (6, 8),
+    texttospeech.AudioEncoding.MULAW: (7, 8),
+}
+
+def wav_stream_header(audio_encoding: texttospeech.AudioEncoding, sample_rate_hertz: int) -> bytes:
+    """WAV header of unknown length for raw mono samples, or b"" for encodings that carry their own framing."""
+    if audio_encoding not in _WAV_FORMATS:
+        return b""
+    format_code, bits = _WAV_FORMATS[audio_encoding]
+    block_align = bits // 8
+    return b"".join([
+        b"RIFF", (0xFFFFFFFF).to_bytes(4, "little"), b"WAVE",
+        b"fmt ", (16).to_bytes(4, "little"),
+        format_code.to_bytes(2, "little"), (1).to_bytes(2, "little"),
+        sample_rate_hertz.to_bytes(4, "little"), (sample_rate_hertz * block_align).to_bytes(4, "little"),
+        block_align.to_bytes(2, "little"), bits.to_bytes(2, "little"),
+        b"data", (0xFFFFFFFF).to_bytes(4, "little"),
+    ])
+
+class GoogleStreamingSynthesizer:
+    """Streams audio from `TextToSpeechClient.streaming_synthesize`."""
+
+    name = "google"
+
+    def __init__(self, client: texttospeech.TextToSpeechClient):
+        self.client = client
+
+    def supports(self, voice_name: str) -> bool:
+        return bool(STREAMING_VOICE_PATTERN.search(voice_name or ""))
+
+    def stream(
+        self,
+        segments: Iterable[str],
+        voice_name: str,
+        language_code: str,
+        audio_encoding: texttospeech.AudioEncoding,
+        sample_rate_hertz: int,
+        speaking_rate: float = 1.0,
+    ) -> Iterator[bytes]:
+        audio_config = {"audio_encoding": audio_encoding, "sample_rate_hertz": sample_rate_hertz}
+        if speaking_rate != 1.0:
+            audio_config["speaking_rate"] = speaking_rate
+        config_request = texttospeech.StreamingSynthesizeRequest(
+            streaming_config=texttospeech.StreamingSynthesizeConfig(
+                voice=texttospeech.VoiceSelectionParams(name=voice_name, language_code=language_code),
+                streaming_audio_config=texttospeech.StreamingAudioConfig(**audio_config),
+            )
+        )
+
+        def requests():
+            yield config_request
+            for segment in segments:
+                yield texttospeech.StreamingSynthesizeRequest(input=texttospeech.StreamingSynthesisInput(text=segment))
+
+        for response in self.client.streaming_synthesize(requests()):
+            if response.audio_content:
+                yield response.audio_content
+
+class StubStreamingSynthesizer:
+    """
+    Offline stand-in for the streaming API: silence, paced like a real stream.
+
+    Each segment starts after `first_frame_ms` and yields `frame_ms` frames
+    covering about `ms_per_char` of audio per character, so latency and
+    pacing can be exercised without credentials or network.
+    """
+
+    name = "stub"
+
+    def __init__(self, first_frame_ms: float = 150, frame_ms: float = 100, ms_per_char: float = 60):
+        self.first_frame_ms = first_frame_ms
+        self.frame_ms = frame_ms
+        self.ms_per_char = ms_per_char
+
+    def supports(self, voice_name: str) -> bool:
+        return True
+
+    def stream(
+        self,
+        segments: Iterable[str],
+        voice_name: str,
+        language_code: str,
+        audio_encoding: texttospeech.AudioEncoding,
+        sample_rate_hertz: int,
+        speaking_rate: float = 1.0,
+    ) -> Iterator[bytes]:
+        _, bits = _WAV_FORMATS.get(audio_encoding, (1, 16))
+        frame = bytes(int(sample_rate_hertz * self.frame_ms / 1000) * bits // 8)
+        for segment in segments:
+            time.sleep(self.first_frame_ms / 1000)
+            frames = max(1, round(len(segment) * self.ms_per_char / speaking_rate / self.frame_ms))
+            for _ in range(frames):
+                yield frame
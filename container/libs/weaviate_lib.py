@@ -1,11 +1,21 @@
 import os
-from typing import List, Dict, Any, Optional, TypeVar
+import json
+import time
+import base64
+import queue
+import atexit
+import threading
+import uuid as uuid_lib
+from typing import List, Dict, Any, Iterator, Optional, TypeVar
 import weaviate
 from weaviate.auth import Auth
 import weaviate.classes as wvc
-from weaviate.collections.classes.grpc import Sorting
+from weaviate.collections.classes.grpc import Sorting, Sort
 from weaviate.collections.classes.filters import _Filters, Filter
 from datetime import datetime
+from libs.ttl_cache import TTLCache
+from libs.result_cache import ResultCache, GenerationTable, freeze, default_generations_path
+from libs.embedding_cache import embed_texts, embed_texts_async, embedding_cache_stats, text_hash
 # Environment variables
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
@@ -25,18 +35,70 @@ if not EMBEDDING_MODEL:
 if not OPENAI_API_KEY:
     error_message += "Missing required environment variables: OPENAI_API_KEY\n"
 
+# Compute Documents vectors here (through the embedding cache) instead of in
+# the Weaviate vectorizer. Uses EMBEDDING_MODEL, the vectorizer's model, but
+# embeds `content` alone while the vectorizer also embeds the other text
+# properties and the class name: rows vectorized either way do not share a
+# vector space, so only turn this on for a re-indexed Documents collection.
+DOCUMENT_CLIENT_VECTORS = os.getenv("DOCUMENT_CLIENT_VECTORS", "false").lower() == "true"
+
 if error_message:
     print('❌ Error initializing Weaviate client, missing required environment variables: ' + error_message)
     exit(1)
 
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=WEAVIATE_URL,                     # Weaviate URL: "REST Endpoint" in Weaviate Cloud console
-    auth_credentials=Auth.api_key(WEAVIATE_API_KEY),  # Weaviate API key: "ADMIN" API key in Weaviate Cloud console
-    headers=headers,
-    skip_init_checks=True
-)
+def connect_client() -> weaviate.WeaviateClient:
+    return weaviate.connect_to_weaviate_cloud(
+        cluster_url=WEAVIATE_URL,                     # Weaviate URL: "REST Endpoint" in Weaviate Cloud console
+        auth_credentials=Auth.api_key(WEAVIATE_API_KEY),  # Weaviate API key: "ADMIN" API key in Weaviate Cloud console
+        headers=headers,
+        skip_init_checks=True
+    )
+
+client = connect_client()
+
+def reconnect_client() -> weaviate.WeaviateClient:
+    """
+    Replace the module-level client with a fresh connection.
+
+    The gRPC channel behind the client is not fork-safe, so every server
+    worker process must call this once after fork, before the app modules
+    (which do `from libs.weaviate_lib import client`) are imported.
+    """
+    global client
+    try:
+        client.close()
+    except Exception as e:
+        print(f"Error closing inherited Weaviate client: {e}")
+    client = connect_client()
+    return client
+
 def close_client():
+    flush_writes()
     client.close()
+
+# Async client for the ASGI request path. It is bound to the event loop it
+# connects on, so it is created lazily from inside that loop.
+async_client: Optional[weaviate.WeaviateAsyncClient] = None
+
+async def get_async_client() -> weaviate.WeaviateAsyncClient:
+    global async_client
+    if async_client is None:
+        async_client = weaviate.use_async_with_weaviate_cloud(
+            cluster_url=WEAVIATE_URL,
+            auth_credentials=Auth.api_key(WEAVIATE_API_KEY),
+            headers=headers,
+            skip_init_checks=True
+        )
+    if not async_client.is_connected():
+        await async_client.connect()
+    return async_client
+
+async def close_async_client():
+    global async_client
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
+
 COLLECTION_DOCUMENTS = "Documents"
 COLLECTION_MESSAGES = "Messages"
 COLLECTION_CHATS = "Sections"
@@ -49,6 +111,57 @@ COLLECTION_FINE_TUNING_MODELS = "FineTuningModels"
 COLLECTION_API_KEYS = "ApiKeys"
 COLLECTION_PASSWORD_RESET_TOKENS = "PasswordResetTokens"
 
+# Read-result cache
+#
+# Searches called with cache=True are served from a per-process TTL cache.
+# Every write made through this module bumps a generation for its collection
+# in a table shared by all workers on the machine, which makes the cached
+# reads of that collection stale at once. The TTL only bounds staleness from
+# writers on other machines or outside this module.
+#
+# Collections listed in RESULT_CACHE_SCOPES are also tracked per scope: a
+# write that names its scope (an inserted message's session, an updated
+# section's id) only invalidates reads of that scope plus unscoped reads.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() != "false"
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "30"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_GENERATIONS_PATH = os.getenv("RESULT_CACHE_GENERATIONS_PATH", default_generations_path("weaviate_result_cache"))
+# collection -> property naming a write's scope ("_id" = the object's own uuid)
+RESULT_CACHE_SCOPES = {
+    COLLECTION_MESSAGES: "session_id",
+    COLLECTION_CHATS: "_id",
+}
+
+result_cache = ResultCache(
+    maxsize=RESULT_CACHE_SIZE,
+    ttl=RESULT_CACHE_TTL_SECONDS,
+    generations=GenerationTable(RESULT_CACHE_GENERATIONS_PATH),
+)
+
+def bump_collection_generation(
+    collection_name: str,
+    properties: Optional[Dict[str, Any]] = None,
+    uuid: Optional[Any] = None,
+):
+    """Invalidate cached reads affected by a write to `collection_name`."""
+    scope_property = RESULT_CACHE_SCOPES.get(collection_name)
+    scope = None
+    if scope_property == "_id":
+        scope = uuid
+    elif scope_property and properties:
+        scope = properties.get(scope_property)
+    result_cache.bump(collection_name, str(scope) if scope else None)
+
+def _cached_read(collection_name: str, cache: bool, key: Any, load, scope: Optional[str] = None):
+    if not cache or not RESULT_CACHE_ENABLED:
+        return load()
+    return result_cache.get_or_load(collection_name, freeze(key), load, scope=scope)
+
+async def _cached_read_async(collection_name: str, cache: bool, key: Any, load, scope: Optional[str] = None):
+    if not cache or not RESULT_CACHE_ENABLED:
+        return await load()
+    return await result_cache.get_or_load_async(collection_name, freeze(key), load, scope=scope)
+
 def initialize_schema() -> None:
     """Initialize the Weaviate schema if it doesn't exist."""
     print("Initializing schema...")
@@ -71,9 +184,25 @@ def initialize_schema() -> None:
                 wvc.config.Property(name="created_at", data_type=wvc.config.DataType.DATE),
                 wvc.config.Property(name="updated_at", data_type=wvc.config.DataType.DATE),
                 wvc.config.Property(name="file_id", data_type=wvc.config.DataType.UUID), # optional    
+                wvc.config.Property(name="page_start", data_type=wvc.config.DataType.INT), # optional
+                wvc.config.Property(name="page_end", data_type=wvc.config.DataType.INT), # optional
+                wvc.config.Property(name="content_hash", data_type=wvc.config.DataType.TEXT, skip_vectorization=True),
+                wvc.config.Property(name="client_vector", data_type=wvc.config.DataType.BOOL), # optional
             ]
         )
         print("🙌🏼 Collection Documents created successfully")
+    # add page range, content hash and client vector properties to Documents collection
+    documents_collection = client.collections.get(COLLECTION_DOCUMENTS)
+    for document_property in [
+        wvc.config.Property(name="page_start", data_type=wvc.config.DataType.INT),
+        wvc.config.Property(name="page_end", data_type=wvc.config.DataType.INT),
+        wvc.config.Property(name="content_hash", data_type=wvc.config.DataType.TEXT, skip_vectorization=True),
+        wvc.config.Property(name="client_vector", data_type=wvc.config.DataType.BOOL),
+    ]:
+        try:
+            documents_collection.config.add_property(document_property)
+        except Exception as e:
+            print(f"Error adding {document_property.name} property to Documents collection: {e}")
     exists = client.collections.exists(COLLECTION_MESSAGES)
     if not exists:
         client.collections.create(
@@ -136,9 +265,25 @@ def initialize_schema() -> None:
                 wvc.config.Property(name="training_metrics", data_type=wvc.config.DataType.TEXT),
                 wvc.config.Property(name="model_path", data_type=wvc.config.DataType.TEXT),
                 wvc.config.Property(name="version", data_type=wvc.config.DataType.TEXT),
+                wvc.config.Property(name="job_name", data_type=wvc.config.DataType.TEXT), # optional
+                wvc.config.Property(name="job_state", data_type=wvc.config.DataType.TEXT), # optional
+                wvc.config.Property(name="job_error", data_type=wvc.config.DataType.TEXT), # optional
+                wvc.config.Property(name="job_synced_at", data_type=wvc.config.DataType.DATE), # optional
             ]
         )
         print("🙌🏼 Collection FineTuningModels created successfully")
+    # add tuning job tracking properties to FineTuningModels collection
+    fine_tuning_models_collection = client.collections.get(COLLECTION_FINE_TUNING_MODELS)
+    for fine_tuning_property in [
+        wvc.config.Property(name="job_name", data_type=wvc.config.DataType.TEXT),
+        wvc.config.Property(name="job_state", data_type=wvc.config.DataType.TEXT),
+        wvc.config.Property(name="job_error", data_type=wvc.config.DataType.TEXT),
+        wvc.config.Property(name="job_synced_at", data_type=wvc.config.DataType.DATE),
+    ]:
+        try:
+            fine_tuning_models_collection.config.add_property(fine_tuning_property)
+        except Exception as e:
+            print(f"Error adding {fine_tuning_property.name} property to FineTuningModels collection: {e}")
     exists = client.collections.exists(COLLECTION_API_KEYS)
     if not exists:
         client.collections.create(
@@ -209,9 +354,21 @@ def initialize_schema() -> None:
                 wvc.config.Property(name="created_at", data_type=wvc.config.DataType.DATE),
                 wvc.config.Property(name="updated_at", data_type=wvc.config.DataType.DATE),
                 wvc.config.Property(name="author", data_type=wvc.config.DataType.TEXT),
+                wvc.config.Property(name="content_hash", data_type=wvc.config.DataType.TEXT), # optional
+                wvc.config.Property(name="size", data_type=wvc.config.DataType.INT), # optional
             ]
         )
         print("🙌🏼 Collection Files created successfully")
+    # add content hash and size properties to Files collection
+    files_collection = client.collections.get(COLLECTION_FILES)
+    for file_property in [
+        wvc.config.Property(name="content_hash", data_type=wvc.config.DataType.TEXT),
+        wvc.config.Property(name="size", data_type=wvc.config.DataType.INT),
+    ]:
+        try:
+            files_collection.config.add_property(file_property)
+        except Exception as e:
+            print(f"Error adding {file_property.name} property to Files collection: {e}")
     exists = client.collections.exists(COLLECTION_TOKEN_BLACKLIST)
     if not exists:
         client.collections.create(
@@ -247,9 +404,18 @@ def initialize_schema() -> None:
                 wvc.config.Property(name="corpus_id", data_type=wvc.config.DataType.TEXT),
                 wvc.config.Property(name="conversation_starters", data_type=wvc.config.DataType.TEXT),
                 wvc.config.Property(name="tags", data_type=wvc.config.DataType.TEXT),
+                wvc.config.Property(name="chunking_strategy", data_type=wvc.config.DataType.TEXT, skip_vectorization=True),
             ]
         )
         print("🙌🏼 Collection Agents created successfully")
+    # add chunking strategy property to Agents collection
+    try:
+        agents_collection = client.collections.get(COLLECTION_AGENTS)
+        agents_collection.config.add_property(
+            wvc.config.Property(name="chunking_strategy", data_type=wvc.config.DataType.TEXT, skip_vectorization=True),
+        )
+    except Exception as e:
+        print(f"Error adding chunking_strategy property to Agents collection: {e}")
     exists = client.collections.exists(COLLECTION_AGENT_SETTINGS)
     if not exists:
         client.collections.create(
@@ -284,7 +450,8 @@ def upload_documents(documents: List[Dict[str, str]]) -> Dict[str, Any]:
     Upload documents to Weaviate.
     
     Args:
-        documents: List of dictionaries containing document data
+        documents: List of dictionaries containing document data. A "vector" key,
+            if present, is stored as the object's vector instead of vectorizing it.
     
     Returns:
         Response from Weaviate
@@ -298,6 +465,8 @@ def upload_documents(documents: List[Dict[str, str]]) -> Dict[str, Any]:
             "description": doc.get("description", ""),
             "author": doc.get("author", "system"),
             "file_id": doc.get("file_id", ""),
+            # Lets a re-upload of the file keep chunks whose content is unchanged
+            "content_hash": text_hash(doc.get("content", "")),
             "created_at": datetime.now(),
             "updated_at": datetime.now(),
         }
@@ -311,20 +480,40 @@ def upload_documents(documents: List[Dict[str, str]]) -> Dict[str, Any]:
             data_object["source"] = doc["source"]
         if "knowledge_type" in doc:
             data_object["knowledge_type"] = doc["knowledge_type"]
+        if doc.get("page_start") is not None:
+            data_object["page_start"] = doc["page_start"]
+            data_object["page_end"] = doc.get("page_end", doc["page_start"])
         
         data_objects.append(data_object)
     
+    # Bring our own vectors: chunks whose content was embedded before (same
+    # file uploaded again, unchanged passages of an edited file) are not sent
+    # to OpenAI a second time by the vectorizer.
+    vectors = [doc.get("vector") for doc in documents]
+    if DOCUMENT_CLIENT_VECTORS:
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = embed_texts([data_objects[i]["content"] for i in missing], EMBEDDING_MODEL)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        print(f"Embedding cache: {embedding_cache_stats()}")
+    for data_object, vector in zip(data_objects, vectors):
+        # Marks vectors of `content` alone, the only ones another row may reuse
+        data_object["client_vector"] = vector is not None
+
     # response = 
     collection = client.collections.get(COLLECTION_DOCUMENTS)
 
     with collection.batch.fixed_size(batch_size=200) as batch:
-        for data_object in data_objects:
+        for data_object, vector in zip(data_objects, vectors):
             batch.add_object(
                 properties=data_object,
+                vector=vector,
             )
             if batch.number_errors > 10:
                 print("Batch import stopped due to excessive errors.")
                 break
+    bump_collection_generation(COLLECTION_DOCUMENTS)
     failed_objects = collection.batch.failed_objects
     if failed_objects:
         print(f"Number of failed imports: {len(failed_objects)}")
@@ -333,26 +522,92 @@ def upload_documents(documents: List[Dict[str, str]]) -> Dict[str, Any]:
     
     return failed_objects
 
-def search_documents(query: str, limit: int = 3) -> list[dict]:
+# Query vectors are computed here with the vectorizer's model (EMBEDDING_MODEL)
+# and searched with near_vector, instead of letting Weaviate embed the query
+# text on every near_text call. Recent queries are kept in an LRU, and the
+# question row of a chat turn reuses its query's vector (see cached_query_vector).
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv("QUERY_VECTOR_CACHE_SIZE", "4096"))
+query_vector_cache: TTLCache[List[float]] = TTLCache(maxsize=QUERY_VECTOR_CACHE_SIZE, ttl=None)
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+def get_query_vector(query: str) -> List[float]:
+    """Embedding of a search query, from the LRU or computed once."""
+    return query_vector_cache.get_or_set(query, lambda: embed_texts([query], EMBEDDING_MODEL, use_cache=False)[0])
+
+async def get_query_vector_async(query: str) -> List[float]:
+    vector = query_vector_cache.get(query)
+    if vector is None:
+        vector = (await embed_texts_async([query], EMBEDDING_MODEL))[0]
+        query_vector_cache.set(query, vector)
+    return vector
+
+def cached_query_vector(query: str) -> Optional[List[float]]:
+    """The vector of `query` if it was embedded recently, without computing it."""
+    return query_vector_cache.peek(query)
+
+def search_documents(query: str, limit: int = 3, cache: bool = True) -> list[dict]:
     """
     Search for relevant documents using vector similarity.
 
     Args:
         query: Search query string
         limit: Maximum number of results to return
+        cache: Serve repeated queries from the result cache until Documents changes
 
     Returns:
         List of matching documents
     """
+    def load():
+        collection = client.collections.get(COLLECTION_DOCUMENTS)
+        response = collection.query.near_vector(
+            near_vector=get_query_vector(query),
+            limit=limit,
+            certainty=0.7,
+        )
+        # Each object in response.objects contains .properties with your fields
+        return [obj.properties for obj in response.objects]
+    return _cached_read(COLLECTION_DOCUMENTS, cache, ("near", normalize_query(query), limit), load)
+
+def get_document_vectors_by_hash(content_hashes: List[str]) -> Dict[str, List[float]]:
+    """
+    Stored client-side vectors of Documents rows by content hash, for the hashes that have one.
+
+    Chunks identical to one already in the index (same passage in another
+    upload, another edition of a book) reuse its vector instead of being
+    embedded again. Only vectors computed from `content` alone qualify: one
+    built by the Weaviate vectorizer also encodes its row's title and
+    description, so it does not describe a row of another file.
+
+    Args:
+        content_hashes: text_hash values of chunk contents
+
+    Returns:
+        Dict of content hash to vector
+    """
     collection = client.collections.get(COLLECTION_DOCUMENTS)
-    response = collection.query.near_text(
-        query=query,
-        limit=limit,
-        certainty=0.7,
-        
-    )
-    # Each object in response.objects contains .properties with your fields
-    return [obj.properties for obj in response.objects]
+    remaining = set(content_hashes)
+    vectors: Dict[str, List[float]] = {}
+    # A hash can have many rows; each round drops the hashes found so far.
+    while remaining:
+        response = collection.query.fetch_objects(
+            limit=len(remaining),
+            return_properties=["content_hash"],
+            filters=Filter.by_property("content_hash").contains_any(list(remaining)) & Filter.by_property("client_vector").equal(True),
+            include_vector=True,
+        )
+        found = False
+        for obj in response.objects:
+            content_hash = obj.properties.get("content_hash")
+            vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+            if content_hash in remaining and vector:
+                vectors[content_hash] = vector
+                remaining.discard(content_hash)
+                found = True
+        if not found:
+            break
+    return vectors
 
 def search_non_vector_collection(
     collection_name: str,
@@ -361,6 +616,9 @@ def search_non_vector_collection(
     filters: Optional[_Filters] = None,
     offset: Optional[int] = None,
     sort: Optional[Sorting] = None,
+    after: Optional[str] = None,
+    cache: bool = False,
+    cache_scope: Optional[str] = None,
 ) -> list[dict]:
     """
     For non vector search, use this function.
@@ -373,20 +631,155 @@ def search_non_vector_collection(
         filters: Filters to apply to the search
         offset: Offset to start from
         sort: Sorting to apply to the search
+        after: UUID to continue a full scan after (Weaviate cursor API; cannot
+            be combined with filters, sort or offset)
+        cache: Serve repeated reads from the result cache until the collection is written
+        cache_scope: Scope the read depends on (see RESULT_CACHE_SCOPES), e.g. the
+            session id of a message history; writes to other scopes keep it cached
 
     Returns:
         List of matching collection
     """
-    collection = client.collections.get(collection_name)
-    response = collection.query.fetch_objects(
+    def load():
+        collection = client.collections.get(collection_name)
+        response = collection.query.fetch_objects(
+            limit=limit,
+            return_properties=properties,
+            filters=filters,
+            offset=offset,
+            sort=sort,
+            after=after,
+        )
+        # Each object in response.objects contains .properties with your fields, and uuid
+        return [{"uuid": str(obj.uuid), **obj.properties} for obj in response.objects]
+    key = ("fetch", limit, properties, filters, offset, sort, after)
+    return _cached_read(collection_name, cache, key, load, cache_scope)
+
+class InvalidCursorError(ValueError):
+    pass
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Pack pagination state into an opaque, URL-safe continuation token."""
+    return base64.urlsafe_b64encode(json.dumps(state, default=str).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(state, dict):
+            raise ValueError("cursor is not an object")
+        return state
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+
+def search_non_vector_collection_page(
+    collection_name: str,
+    limit: int = 100,
+    properties: List[str] = [],
+    filters: Optional[_Filters] = None,
+    sort_property: str = "created_at",
+    ascending: bool = False,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Keyset pagination over `sort_property` (ties broken by UUID).
+
+    Unlike `offset`, the cost of a page does not grow with its depth: the
+    cursor carries only the `(sort value, UUID)` of the last object returned,
+    and the next page starts past that pair.
+
+    Args:
+        collection_name: Name of the collection to page through
+        limit: Page size
+        properties: List of properties to return (`sort_property` is added if missing)
+        filters: Filters to apply before paging
+        sort_property: Property that orders the pages
+        ascending: Sort direction
+        cursor: Token returned as `next_cursor` by the previous page, or None for the first page
+
+    Returns:
+        (page of objects, next_cursor or None when there are no more pages)
+
+    Raises:
+        InvalidCursorError: if `cursor` cannot be decoded
+    """
+    page_filters = filters
+    if cursor:
+        state = decode_cursor(cursor)
+        value, last_id = state.get("v"), state.get("id")
+        if value is None or not isinstance(last_id, str):
+            raise InvalidCursorError("Invalid cursor")
+        # `_id` compares as text, the same order Sort.by_id uses
+        if ascending:
+            past_value = Filter.by_property(sort_property).greater_than(value)
+            past_id = Filter.by_property("_id").greater_than(last_id)
+        else:
+            past_value = Filter.by_property(sort_property).less_than(value)
+            past_id = Filter.by_property("_id").less_than(last_id)
+        keyset = past_value | (Filter.by_property(sort_property).equal(value) & past_id)
+        page_filters = keyset if filters is None else filters & keyset
+
+    return_properties = properties if not properties or sort_property in properties else [*properties, sort_property]
+    objects = search_non_vector_collection(
+        collection_name=collection_name,
         limit=limit,
-        return_properties=properties,
-        filters=filters,
-        offset=offset,
-        sort=sort,
+        properties=return_properties,
+        filters=page_filters,
+        sort=Sort.by_property(sort_property, ascending=ascending).by_id(ascending=ascending),
     )
-    # Each object in response.objects contains .properties with your fields, and uuid
-    return [{"uuid": str(obj.uuid), **obj.properties} for obj in response.objects]
+    if len(objects) < limit:
+        return objects, None
+
+    last = objects[-1]
+    return objects, encode_cursor({"v": _cursor_value(last.get(sort_property)), "id": last["uuid"]})
+
+def _cursor_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+ITERATOR_PAGE_SIZE = int(os.getenv("WEAVIATE_ITERATOR_PAGE_SIZE", "500"))
+
+def iterate_collection(
+    collection_name: str,
+    properties: List[str] = [],
+    filters: Optional[_Filters] = None,
+    page_size: int = ITERATOR_PAGE_SIZE,
+) -> Iterator[dict]:
+    """
+    Yield every object of a collection, holding at most one page in memory.
+
+    Without filters this is Weaviate's cursor iterator (ordered by UUID). With
+    filters, which that iterator does not accept, it walks keyset pages on
+    `created_at` instead.
+
+    Args:
+        collection_name: Name of the collection to walk
+        properties: List of properties to return
+        filters: Filters to apply
+        page_size: Objects fetched per round trip
+
+    Returns:
+        Iterator of objects shaped like search_non_vector_collection results
+    """
+    if filters is None:
+        collection = client.collections.get(collection_name)
+        for obj in collection.iterator(return_properties=properties or None, cache_size=page_size):
+            yield {"uuid": str(obj.uuid), **obj.properties}
+        return
+
+    cursor = None
+    while True:
+        objects, cursor = search_non_vector_collection_page(
+            collection_name=collection_name,
+            limit=page_size,
+            properties=properties,
+            filters=filters,
+            sort_property="created_at",
+            ascending=True,
+            cursor=cursor,
+        )
+        yield from objects
+        if not cursor:
+            return
 
 def get_object_by_id(collection_name: str, uuid: str) -> dict:
     collection = client.collections.get(collection_name)
@@ -403,6 +796,7 @@ def search_vector_collection(
     filters: Optional[_Filters] = None,
     offset: Optional[int] = None,
     sort: Optional[Sorting] = None,
+    cache: bool = False,
 ) -> list[dict]:
     """
     Search for relevant collection using vector similarity.
@@ -415,21 +809,25 @@ def search_vector_collection(
         filters: Filters to apply to the search 
         offset: Offset to start from
         sort: Sorting to apply to the search
+        cache: Serve repeated queries from the result cache until the collection is written
 
     Returns:
         List of matching collection
     """
-    collection = client.collections.get(collection_name)
-    response = collection.query.near_text(
-        query=query,
-        limit=limit,
-        return_properties=properties,
-        filters=filters,
-        offset=offset,
-        sort=sort,
-    )
-    # Each object in response.objects contains .properties with your fields
-    return [obj.properties for obj in response.objects]
+    def load():
+        collection = client.collections.get(collection_name)
+        response = collection.query.near_vector(
+            near_vector=get_query_vector(query),
+            limit=limit,
+            return_properties=properties,
+            filters=filters,
+            offset=offset,
+            sort=sort,
+        )
+        # Each object in response.objects contains .properties with your fields
+        return [obj.properties for obj in response.objects]
+    key = ("near", normalize_query(query), limit, properties, filters, offset, sort)
+    return _cached_read(collection_name, cache, key, load)
 
 T = TypeVar('T', bound=Dict[str, Any])
 
@@ -446,6 +844,7 @@ def insert_to_collection(
         uuid = collection.data.insert(properties=properties, uuid=uuid)
     else:
         uuid = collection.data.insert(properties=properties)
+    bump_collection_generation(collection_name, properties, uuid)
 
     return uuid
 
@@ -456,7 +855,11 @@ def insert_to_collection_in_batch(
     # Get the collection
     collection = client.collections.get(collection_name)
     # Insert a single object
-    uuids = collection.data.insert_many(properties)
+    try:
+        uuids = collection.data.insert_many(properties)
+    finally:
+        for item in properties:
+            bump_collection_generation(collection_name, item)
     return uuids
 
 def update_collection_object(
@@ -468,6 +871,7 @@ def update_collection_object(
     collection = client.collections.get(collection_name)
     # Update a single object
     collection.data.update(properties=properties, uuid=uuid)
+    bump_collection_generation(collection_name, properties, uuid)
     return True
 
 def delete_collection_object(
@@ -478,6 +882,7 @@ def delete_collection_object(
     collection = client.collections.get(collection_name)
     # Delete a single object
     collection.data.delete_by_id(uuid)
+    bump_collection_generation(collection_name, uuid=uuid)
     return uuid
 
 def delete_collection_objects_many(
@@ -488,8 +893,209 @@ def delete_collection_objects_many(
     collection = client.collections.get(collection_name)
     # Delete a single object
     collection.data.delete_many(where=filters)
+    bump_collection_generation(collection_name)
     return True
 
+# Write-behind queue
+#
+# Writes that the caller does not need to wait for (chat turns, Q&A pairs) are
+# queued here and flushed by one background thread per process with
+# `insert_many`. A batch is sent as soon as it holds WRITE_BEHIND_MAX_BATCH
+# objects or its oldest object has waited WRITE_BEHIND_MAX_DELAY_MS, whichever
+# comes first. Callers get the object UUID back immediately, so related rows
+# (question -> answer) can reference each other before either is written.
+# Batch inserts are upserts, so retrying a batch is safe.
+
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+WRITE_BEHIND_MAX_DELAY_MS = int(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "200"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+
+class WriteBehindQueue:
+    def __init__(self, max_batch: int, max_delay_ms: int, max_retries: int):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.max_retries = max_retries
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "failed": 0, "batches": 0, "retries": 0, "errors": 0}
+        # Per caller thread: the failure count when it first enqueued since its last flush
+        self._local = threading.local()
+
+    def _failures(self) -> int:
+        return self._stats["failed"] + self._stats["errors"]
+
+    def _mark(self):
+        if getattr(self._local, "failures_mark", None) is None:
+            self._local.failures_mark = self._failures()
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="weaviate-write-behind", daemon=True)
+            self._thread.start()
+
+    def enqueue_insert(
+        self,
+        collection_name: str,
+        properties: Dict[str, Any],
+        uuid: Optional[str] = None,
+        vector: Optional[List[float]] = None,
+    ) -> str:
+        uuid = str(uuid or uuid_lib.uuid4())
+        data_object = wvc.data.DataObject(properties=properties, uuid=uuid, vector=vector)
+        self._mark()
+        self._queue.put(("insert", collection_name, data_object))
+        self._stats["enqueued"] += 1
+        self._ensure_thread()
+        return uuid
+
+    def enqueue_update(self, collection_name: str, uuid: str, properties: Dict[str, Any]):
+        """Queue a partial update. Updates to the same object within one batch are merged."""
+        self._mark()
+        self._queue.put(("update", collection_name, (str(uuid), properties)))
+        self._stats["enqueued"] += 1
+        self._ensure_thread()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until everything queued before this call has been written (or dropped).
+
+        Returns False on timeout, or if any write was dropped since this thread
+        first enqueued after its previous flush. Drops are counted queue-wide,
+        so a concurrent caller's failure can also fail this flush.
+        """
+        mark = getattr(self._local, "failures_mark", None)
+        self._local.failures_mark = None
+        if mark is None:
+            mark = self._failures()
+        if not self._thread or not self._thread.is_alive():
+            return self._queue.empty() and self._failures() == mark
+        done = threading.Event()
+        self._queue.put(("flush", None, done))
+        return done.wait(timeout) and self._failures() == mark
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": self._queue.qsize()}
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch: List[tuple] = []
+            waiters: List[threading.Event] = []
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                if item[0] == "flush":
+                    waiters.append(item[2])
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                self._stats["errors"] += 1
+                print(f"Write-behind flush failed: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch: List[tuple]):
+        by_collection: Dict[str, List[Any]] = {}
+        updates: Dict[tuple, Dict[str, Any]] = {}
+        for kind, collection_name, payload in batch:
+            if kind == "insert":
+                by_collection.setdefault(collection_name, []).append(payload)
+            else:
+                uuid, properties = payload
+                updates.setdefault((collection_name, uuid), {}).update(properties)
+        for collection_name, data_objects in by_collection.items():
+            self._insert_with_retry(collection_name, data_objects)
+        # Weaviate has no partial-update batch call; merging still turns a
+        # burst of updates to one object into a single request.
+        for (collection_name, uuid), properties in updates.items():
+            self._update_with_retry(collection_name, uuid, properties)
+
+    def _update_with_retry(self, collection_name: str, uuid: str, properties: Dict[str, Any]):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._stats["retries"] += 1
+                time.sleep(min(0.2 * 2 ** (attempt - 1), 5))
+            try:
+                client.collections.get(collection_name).data.update(uuid=uuid, properties=properties)
+                bump_collection_generation(collection_name, properties, uuid)
+                self._stats["written"] += 1
+                return
+            except Exception as e:
+                print(f"Write-behind update of {collection_name}/{uuid} failed (attempt {attempt + 1}): {e}")
+                if getattr(e, "status_code", None) == 404:
+                    # The object was deleted meanwhile; retrying cannot help.
+                    break
+        self._stats["failed"] += 1
+
+    def _insert_with_retry(self, collection_name: str, data_objects: List[Any]):
+        try:
+            self._insert_batch_with_retry(collection_name, data_objects)
+        finally:
+            # Even a partly written batch changes what reads of it return.
+            for data_object in data_objects:
+                bump_collection_generation(collection_name, data_object.properties, data_object.uuid)
+
+    def _insert_batch_with_retry(self, collection_name: str, data_objects: List[Any]):
+        pending = data_objects
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._stats["retries"] += 1
+                time.sleep(min(0.2 * 2 ** (attempt - 1), 5))
+            try:
+                collection = client.collections.get(collection_name)
+                response = collection.data.insert_many(pending)
+            except Exception as e:
+                print(f"Write-behind insert into {collection_name} failed (attempt {attempt + 1}): {e}")
+                continue
+            self._stats["batches"] += 1
+            failed = [pending[i] for i in (response.errors or {})]
+            self._stats["written"] += len(pending) - len(failed)
+            if not failed:
+                return
+            print(f"Write-behind: {len(failed)} objects rejected by {collection_name}: {list(response.errors.values())[0]}")
+            pending = failed
+        self._stats["failed"] += len(pending)
+        print(f"❌ Write-behind dropped {len(pending)} objects for {collection_name}, first uuids: {[str(o.uuid) for o in pending[:5]]}")
+
+write_behind = WriteBehindQueue(
+    max_batch=WRITE_BEHIND_MAX_BATCH,
+    max_delay_ms=WRITE_BEHIND_MAX_DELAY_MS,
+    max_retries=WRITE_BEHIND_MAX_RETRIES,
+)
+atexit.register(write_behind.flush, 30)
+
+def enqueue_insert(
+    collection_name: str,
+    properties: T,
+    uuid: Optional[str] = None,
+    vector: Optional[List[float]] = None,
+) -> str:
+    """Queue an insert on the write-behind queue and return the object's UUID right away."""
+    return write_behind.enqueue_insert(collection_name, properties, uuid, vector)
+
+def enqueue_update(collection_name: str, uuid: str, properties: T):
+    """Queue a partial update on the write-behind queue."""
+    write_behind.enqueue_update(collection_name, uuid, properties)
+
+def flush_writes(timeout: Optional[float] = 30) -> bool:
+    """Wait for this thread's queued writes; False if they timed out or any were dropped."""
+    return write_behind.flush(timeout)
+
 def get_collection_count(
     collection_name: str,
     filters: Optional[_Filters] = None,
@@ -514,6 +1120,22 @@ def get_collection_count(
     return response.total_count
 
 
+# Totals for list endpoints. Counting is an aggregate over the whole filter, so
+# it is cached briefly instead of being recomputed for every page.
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+count_cache: TTLCache[int] = TTLCache(maxsize=1024, ttl=COUNT_CACHE_TTL_SECONDS)
+
+def get_collection_count_cached(
+    collection_name: str,
+    cache_key: Any,
+    filters: Optional[_Filters] = None,
+) -> int:
+    """get_collection_count, memoized under (collection_name, cache_key) for COUNT_CACHE_TTL_SECONDS."""
+    return count_cache.get_or_set(
+        (collection_name, cache_key),
+        lambda: get_collection_count(collection_name=collection_name, filters=filters),
+    )
+
 def get_aggregate(
     collection_name: str,
     filters: Filter
@@ -524,3 +1146,69 @@ def get_aggregate(
         total_count=True
     )
     return response
+
+
+# Async variants used by the ASGI ask path (services/handle_ask_async.py)
+
+async def search_documents_async(query: str, limit: int = 3, cache: bool = True) -> list[dict]:
+    """Async variant of search_documents."""
+    async def load():
+        async_client = await get_async_client()
+        collection = async_client.collections.get(COLLECTION_DOCUMENTS)
+        response = await collection.query.near_vector(
+            near_vector=await get_query_vector_async(query),
+            limit=limit,
+            certainty=0.7,
+        )
+        return [obj.properties for obj in response.objects]
+    return await _cached_read_async(COLLECTION_DOCUMENTS, cache, ("near", normalize_query(query), limit), load)
+
+async def search_non_vector_collection_async(
+    collection_name: str,
+    limit: int = 100,
+    properties: List[str] = [],
+    filters: Optional[_Filters] = None,
+    offset: Optional[int] = None,
+    sort: Optional[Sorting] = None,
+    cache: bool = False,
+    cache_scope: Optional[str] = None,
+) -> list[dict]:
+    """Async variant of search_non_vector_collection."""
+    async def load():
+        async_client = await get_async_client()
+        collection = async_client.collections.get(collection_name)
+        response = await collection.query.fetch_objects(
+            limit=limit,
+            return_properties=properties,
+            filters=filters,
+            offset=offset,
+            sort=sort,
+        )
+        return [{"uuid": str(obj.uuid), **obj.properties} for obj in response.objects]
+    # Same key as the sync variant, so both share entries
+    key = ("fetch", limit, properties, filters, offset, sort, None)
+    return await _cached_read_async(collection_name, cache, key, load, cache_scope)
+
+async def fetch_object_by_id_async(collection_name: str, uuid: str) -> Optional[dict]:
+    """Fetch one object by UUID, returning its properties plus `uuid`, or None."""
+    async_client = await get_async_client()
+    collection = async_client.collections.get(collection_name)
+    response = await collection.query.fetch_object_by_id(uuid)
+    if not response:
+        return None
+    return {**response.properties, "uuid": response.uuid}
+
+async def insert_to_collection_async(
+    collection_name: str,
+    properties: T,
+    uuid: Optional[str] = None
+) -> str:
+    """Async variant of insert_to_collection."""
+    async_client = await get_async_client()
+    collection = async_client.collections.get(collection_name)
+    if uuid:
+        uuid = await collection.data.insert(properties=properties, uuid=uuid)
+    else:
+        uuid = await collection.data.insert(properties=properties)
+    bump_collection_generation(collection_name, properties, uuid)
+    return uuid
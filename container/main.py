@@ -16,7 +16,9 @@ def weaviate_connection():
         close_client()
 
 if __name__ == '__main__':
+    # Development server only. In production run:
+    #   gunicorn -c gunicorn.conf.py main:app
     with weaviate_connection():
         initialize_schema()
         port = int(os.environ.get("PORT", 8080))
-        app.run(host="0.0.0.0", port=port, threaded=False)
+        app.run(host="0.0.0.0", port=port, threaded=True)
@@ -0,0 +1,74 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from data_classes.common_classes import Agent, AgentProvider
+from libs.google_vertex import GeminiRuntime, compile_gemini_runtime
+from libs.langchain import check_model
+from libs.ttl_cache import TTLCache
+
+# Compiled agents are reused until the agent is edited through this process
+# (update_agent / delete_agent invalidate them). The TTL only bounds how long
+# another worker's edit can go unnoticed; on expiry the agent is re-fetched and
+# recompiled only if its `updated_at` changed.
+AGENT_RUNTIME_TTL_SECONDS = float(os.getenv("AGENT_RUNTIME_TTL_SECONDS", "60"))
+AGENT_RUNTIME_CACHE_SIZE = int(os.getenv("AGENT_RUNTIME_CACHE_SIZE", "512"))
+
+@dataclass
+class AgentRuntime:
+    agent: Agent
+    provider: AgentProvider
+    updated_at: Any = None
+    gemini: Optional[GeminiRuntime] = None
+
+agent_runtime_cache: TTLCache[AgentRuntime] = TTLCache(
+    maxsize=AGENT_RUNTIME_CACHE_SIZE,
+    ttl=AGENT_RUNTIME_TTL_SECONDS,
+)
+
+def build_agent(agent: Dict[str, Any]) -> Agent:
+    return Agent(
+        name=agent["name"],
+        description=agent["description"],
+        system_prompt=agent["system_prompt"],
+        tools=agent["tools"],
+        model=agent["model"],
+        temperature=agent["temperature"],
+        language=agent["language"],
+        created_at=agent["created_at"],
+        updated_at=agent["updated_at"],
+        author=agent["author"],
+        status=agent["status"],
+        agent_type=agent["agent_type"],
+        uuid=agent["uuid"],
+        corpus_id=agent["corpus_id"],
+        tags=agent["tags"],
+        conversation_starters=agent["conversation_starters"],
+    )
+
+def compile_agent_runtime(agent: Agent) -> AgentRuntime:
+    provider = check_model(agent.model)
+    gemini = compile_gemini_runtime(agent) if provider == AgentProvider.GOOGLE_VERTEX else None
+    return AgentRuntime(agent=agent, provider=provider, updated_at=agent.updated_at, gemini=gemini)
+
+def get_cached_agent_runtime(agent_id: str) -> Optional[AgentRuntime]:
+    return agent_runtime_cache.get(agent_id)
+
+def store_agent_runtime(agent_id: str, agent_data: Dict[str, Any]) -> AgentRuntime:
+    """
+    Cache the runtime for freshly fetched `agent_data`.
+
+    An expired entry with the same `updated_at` is kept instead of recompiled.
+    """
+    previous = agent_runtime_cache.peek(agent_id)
+    if previous and previous.updated_at == agent_data.get("updated_at"):
+        runtime = previous
+    else:
+        runtime = compile_agent_runtime(build_agent(agent_data))
+    agent_runtime_cache.set(agent_id, runtime)
+    return runtime
+
+def invalidate_agent_runtime(agent_id: str):
+    """Forget everything cached for an edited or deleted agent (compiled runtime and cached answers)."""
+    from services.answer_cache import invalidate_answer_cache
+    agent_runtime_cache.pop(str(agent_id))
+    invalidate_answer_cache(agent_id)
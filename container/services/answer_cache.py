@@ -0,0 +1,294 @@
+import os
+import re
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional, Tuple
+import numpy as np
+from weaviate.collections.classes.filters import Filter
+from data_classes.common_classes import StreamEvent, ApprovalStatus
+from libs.ttl_cache import TTLCache
+from libs.result_cache import GenerationTable, default_generations_path
+from libs.answer_store import PrecomputedAnswerStore
+from libs.side_tasks import submit_side_task
+from libs.embedding_cache import embed_texts
+from libs.weaviate_lib import (
+    COLLECTION_AGENTS,
+    EMBEDDING_MODEL,
+    get_query_vector,
+    search_non_vector_collection,
+)
+from services.handle_messages import iter_messages_with_related
+
+logger = logging.getLogger(__name__)
+
+# Per-agent semantic answer cache. A first-turn question whose embedding is
+# within ANSWER_CACHE_SIMILARITY_THRESHOLD (cosine) of a known question is
+# answered from the cache instead of the model. Known questions are:
+#   - approved Messages pairs of the agent (loaded when the agent is first asked),
+#   - Q&A pairs saved to the system without an agent, shared by every agent
+#     only when ANSWER_CACHE_SHARED_ANSWERS is on: they were not written for
+#     any particular persona or language,
+#   - answers precomputed in the background for the agent's conversation starters,
+#     stored on disk so that one worker per machine generates them per change.
+# Sets are built on the side-task pool, never on the ask path: until an
+# agent's set is ready, its lookups are misses. Editing the agent or its
+# corpus bumps the agent's generation (a document upload or delete bumps all
+# of them) in a table shared by the workers on the machine, so every worker
+# rebuilds its copy; the TTL bounds how long approvals take to show up.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() != "false"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "600"))
+ANSWER_CACHE_MAX_AGENTS = int(os.getenv("ANSWER_CACHE_MAX_AGENTS", "256"))
+# Replayed answers are streamed in pieces of about this many characters.
+ANSWER_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv("ANSWER_CACHE_REPLAY_CHUNK_CHARS", "24"))
+ANSWER_CACHE_GENERATIONS_PATH = os.getenv("ANSWER_CACHE_GENERATIONS_PATH", default_generations_path("answer_cache"))
+ANSWER_CACHE_SHARED_ANSWERS = os.getenv("ANSWER_CACHE_SHARED_ANSWERS", "false").lower() == "true"
+ANSWER_CACHE_STARTERS_PATH = os.getenv("ANSWER_CACHE_STARTERS_PATH", os.path.join(os.getcwd(), "temp", "starter_answers.sqlite"))
+
+SHARED_ANSWERS_KEY = "__shared__"
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    thought: str
+    source: str
+    similarity: float
+
+    def metadata(self) -> Dict[str, Any]:
+        return {"source": self.source, "similarity": round(self.similarity, 4), "question": self.question}
+
+class AnswerSet:
+    """Questions of one agent with their answers and unit-length question vectors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[str, str, str, str]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self.starters_scheduled = False
+        # Generation the set was built at; a different current one means it is stale
+        self.generation: Tuple[bytes, bytes] = (b"", b"")
+
+    def add(self, entries: List[Tuple[str, str, str, str]], vectors: List[List[float]]):
+        """Add (question, answer, thought, source) entries with their question vectors."""
+        if not entries:
+            return
+        rows = np.asarray(vectors, dtype=np.float32)
+        rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self._entries.extend(entries)
+            self._matrix = rows if self._matrix is None else np.vstack([self._matrix, rows])
+
+    def match(self, vector: np.ndarray, threshold: float) -> Optional[CachedAnswer]:
+        with self._lock:
+            if self._matrix is None:
+                return None
+            scores = self._matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+            question, answer, thought, source = self._entries[best]
+        return CachedAnswer(question, answer, thought, source, float(scores[best]))
+
+    def questions(self, source: str) -> set:
+        with self._lock:
+            return {entry[0] for entry in self._entries if entry[3] == source}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+answer_sets: TTLCache[AnswerSet] = TTLCache(maxsize=ANSWER_CACHE_MAX_AGENTS, ttl=ANSWER_CACHE_TTL_SECONDS)
+answer_generations = GenerationTable(ANSWER_CACHE_GENERATIONS_PATH)
+starter_answers = PrecomputedAnswerStore(ANSWER_CACHE_STARTERS_PATH)
+# Keys whose set is being built; one build per key at a time
+_loading: set = set()
+_loading_lock = threading.Lock()
+
+def _generation(agent_key: str) -> Tuple[bytes, bytes]:
+    return answer_generations.get(("all",)), answer_generations.get(("agent", agent_key))
+
+def _starter_generations(generation: Tuple[bytes, bytes]) -> List[str]:
+    """Starter generations valid at an answer set `generation`: without, then with Documents."""
+    agent_generation = f"agent:{generation[1].hex()}"
+    return [agent_generation, f"all:{generation[0].hex()}/{agent_generation}"]
+
+def starter_generation(agent_id: str, uses_documents: bool) -> str:
+    """
+    Generation to store an agent's starter answers at.
+
+    Only answers that retrieve from the shared Documents (OpenAI agents) are
+    dropped when Documents change; the others only when the agent or its corpus does.
+    """
+    return _starter_generations(_generation(agent_id))[1 if uses_documents else 0]
+
+def load_starter_answers(agent_id: str, answer_set: AnswerSet):
+    """Add the agent's stored starter answers that `answer_set` does not hold yet."""
+    known = answer_set.questions("starter")
+    rows = [row for row in starter_answers.get(agent_id, _starter_generations(answer_set.generation)) if row[0] not in known]
+    if rows:
+        answer_set.add(
+            [(question, answer, thought, "starter") for question, answer, thought in rows],
+            embed_texts([row[0] for row in rows], EMBEDDING_MODEL),
+        )
+
+def add_starter_answer(agent_id: str, generation: str, question: str, answer: str, thought: str = ""):
+    """Store a generated starter answer for every worker and add it to this worker's set."""
+    starter_answers.put(agent_id, generation, question, answer, thought)
+    answer_set = answer_sets.peek(agent_id)
+    if answer_set is not None and generation in _starter_generations(answer_set.generation):
+        answer_set.add([(question, answer, thought, "starter")], embed_texts([question], EMBEDDING_MODEL))
+
+def _answer_text(message: Dict[str, Any]) -> str:
+    return message.get("edited_content") or message.get("content") or ""
+
+def _load_answer_set(agent_key: str) -> AnswerSet:
+    """Build the answer set of an agent (or the shared set) from approved Messages pairs."""
+    # Read before loading: an invalidation during the load leaves the new set already stale
+    generation = _generation(agent_key)
+    if agent_key == SHARED_ANSWERS_KEY:
+        scope = Filter.by_property("agent_id").is_none(True)
+    else:
+        scope = Filter.by_property("agent_id").equal(agent_key)
+    entries = []
+    for message in iter_messages_with_related(ApprovalStatus.APPROVED.value, extra_filters=scope):
+        related = message.get("related_message")
+        # The row holding response_answer_id is the question, the related row its answer.
+        if related and message.get("content") and _answer_text(related):
+            entries.append((message["content"], _answer_text(related), related.get("thought") or "", "approved"))
+    answer_set = AnswerSet()
+    answer_set.generation = generation
+    if entries:
+        answer_set.add(entries, embed_texts([entry[0] for entry in entries], EMBEDDING_MODEL))
+    logger.info(f"Answer cache loaded {len(entries)} approved pairs for {agent_key}")
+    if agent_key != SHARED_ANSWERS_KEY:
+        load_starter_answers(agent_key, answer_set)
+    return answer_set
+
+def _build_answer_set(agent_key: str):
+    try:
+        answer_sets.set(agent_key, _load_answer_set(agent_key))
+    finally:
+        with _loading_lock:
+            _loading.discard(agent_key)
+
+def get_answer_set(agent_key: str) -> Optional[AnswerSet]:
+    """
+    The current answer set of an agent (or the shared set), or None while it is built.
+
+    A missing, expired or invalidated set is (re)built on the side-task pool;
+    the caller treats None as a cache miss and asks the model.
+    """
+    answer_set = answer_sets.get(agent_key)
+    if answer_set is not None and answer_set.generation == _generation(agent_key):
+        return answer_set
+    with _loading_lock:
+        if agent_key in _loading:
+            return None
+        _loading.add(agent_key)
+    try:
+        submit_side_task(("answer_set", agent_key), lambda _: _build_answer_set(agent_key))
+    except Exception:
+        with _loading_lock:
+            _loading.discard(agent_key)
+        raise
+    return None
+
+def _answer_keys(agent_id: str) -> List[str]:
+    return [agent_id, SHARED_ANSWERS_KEY] if ANSWER_CACHE_SHARED_ANSWERS else [agent_id]
+
+def find_cached_answer(agent_id: str, question: str) -> Optional[CachedAnswer]:
+    """Best cached answer for `question` above the similarity threshold, or None."""
+    if not ANSWER_CACHE_ENABLED or not agent_id or not question.strip():
+        return None
+    try:
+        answer_sets_ready = [
+            answer_set
+            for answer_set in (get_answer_set(key) for key in _answer_keys(agent_id))
+            if answer_set is not None and len(answer_set)
+        ]
+        # Nothing to match: don't pay for an embedding on the ask path
+        if not answer_sets_ready:
+            return None
+        vector = np.asarray(get_query_vector(question), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        matches = [answer_set.match(vector, ANSWER_CACHE_SIMILARITY_THRESHOLD) for answer_set in answer_sets_ready]
+    except Exception as e:
+        # The cache is an optimization; a failed lookup falls back to the model.
+        logger.error(f"Answer cache lookup failed for agent {agent_id}: {e}")
+        return None
+    matches = [match for match in matches if match]
+    return max(matches, key=lambda match: match.similarity) if matches else None
+
+async def find_cached_answer_async(agent_id: str, question: str) -> Optional[CachedAnswer]:
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    return await asyncio.to_thread(find_cached_answer, agent_id, question)
+
+def add_cached_answers(agent_id: Optional[str], pairs: List[Tuple[str, str]], source: str, thought: str = ""):
+    """
+    Add (question, answer) pairs to a loaded answer set.
+
+    `agent_id` None adds to the shared set. Sets that are not loaded yet are
+    left alone: they read approved pairs from the database when first used.
+    """
+    if not ANSWER_CACHE_ENABLED or not pairs:
+        return
+    answer_set = answer_sets.peek(agent_id or SHARED_ANSWERS_KEY)
+    if answer_set is None:
+        return
+    answer_set.add(
+        [(question, answer, thought, source) for question, answer in pairs],
+        embed_texts([question for question, _ in pairs], EMBEDDING_MODEL),
+    )
+
+def invalidate_answer_cache(agent_id: str):
+    """Mark the agent's answer set stale in every worker on the machine."""
+    answer_generations.bump(("agent", str(agent_id)))
+    answer_sets.pop(str(agent_id))
+
+def invalidate_all_answer_caches():
+    """Mark every answer set stale, e.g. after the shared Documents knowledge base changed."""
+    answer_generations.bump(("all",))
+    answer_sets.clear()
+
+def invalidate_answer_cache_for_corpus(corpus_id: str):
+    """Drop the answer sets of every agent that retrieves from `corpus_id`."""
+    try:
+        agents = search_non_vector_collection(
+            collection_name=COLLECTION_AGENTS,
+            limit=1000,
+            properties=["corpus_id"],
+            filters=Filter.by_property("corpus_id").equal(corpus_id),
+        )
+    except Exception as e:
+        logger.error(f"Failed to find agents of corpus {corpus_id}: {e}")
+        invalidate_all_answer_caches()
+        return
+    for agent in agents:
+        invalidate_answer_cache(agent["uuid"])
+
+def _replay_chunks(text: str) -> List[str]:
+    # Split after whitespace so the pieces look like model tokens and join back exactly.
+    pieces, current = [], ""
+    for word in re.findall(r"\S+\s*|\s+", text):
+        current += word
+        if len(current) >= ANSWER_CACHE_REPLAY_CHUNK_CHARS:
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+def replay_cached_answer(cached: CachedAnswer) -> Generator[StreamEvent, None, None]:
+    """Stream a cached answer with the same events a provider stream produces."""
+    if cached.thought:
+        yield StreamEvent(type="thought", data=cached.thought)
+    for piece in _replay_chunks(cached.answer):
+        yield StreamEvent(type="text", data=piece)
+    yield StreamEvent(type="end_of_stream", data="", metadata=None)
+
+async def replay_cached_answer_async(cached: CachedAnswer) -> AsyncGenerator[StreamEvent, None]:
+    for event in replay_cached_answer(cached):
+        yield event
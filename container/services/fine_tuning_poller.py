@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import Any, Dict, Optional
+from libs.google_vertex import get_one_fine_tuning_job
+from libs.weaviate_lib import update_collection_object, COLLECTION_FINE_TUNING_MODELS
+from services.handle_fine_tuning_models import get_fine_tuning_models_with_jobs
+from data_classes.common_classes import FineTuningStatus
+
+logger = logging.getLogger(__name__)
+
+# Vertex tuning jobs are polled in the background and their state is written
+# to the FineTuningModels row that tracks them (job_state, job_error, status,
+# model_path, training_metrics), so the job endpoints read Weaviate instead of
+# calling Vertex per request. One worker per machine polls, chosen by a file
+# lock; the others take over if it exits. Each job starts at the minimum
+# interval, which doubles while its state does not change and resets when it
+# does. Jobs started by any worker are picked up when the active rows are
+# re-read, or at once when started in the polling worker.
+FINE_TUNING_POLLER_ENABLED = os.getenv("FINE_TUNING_POLLER_ENABLED", "true").lower() != "false"
+FINE_TUNING_POLL_MIN_SECONDS = float(os.getenv("FINE_TUNING_POLL_MIN_SECONDS", "30"))
+FINE_TUNING_POLL_MAX_SECONDS = float(os.getenv("FINE_TUNING_POLL_MAX_SECONDS", "600"))
+FINE_TUNING_POLL_REFRESH_SECONDS = float(os.getenv("FINE_TUNING_POLL_REFRESH_SECONDS", "120"))
+FINE_TUNING_POLLER_LOCK_PATH = os.getenv(
+    "FINE_TUNING_POLLER_LOCK_PATH", os.path.join(tempfile.gettempdir(), "fine_tuning_poller.lock")
+)
+
+# Vertex job states that end a job; every other state keeps it training
+_FINAL_STATUSES = {
+    "JOB_STATE_SUCCEEDED": FineTuningStatus.COMPLETED,
+    "JOB_STATE_FAILED": FineTuningStatus.FAILED,
+    "JOB_STATE_EXPIRED": FineTuningStatus.FAILED,
+    "JOB_STATE_CANCELLED": FineTuningStatus.CANCELLED,
+}
+_ACTIVE_STATUSES = [FineTuningStatus.PENDING.value, FineTuningStatus.TRAINING.value]
+
+def _now() -> str:
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def job_properties(job: Dict[str, Any]) -> Dict[str, Any]:
+    """FineTuningModels properties describing a Vertex tuning job (`TuningJob.to_dict()`)."""
+    state = job.get("state", "")
+    tuned_model = job.get("tunedModel") or {}
+    metrics = {
+        key: job[name]
+        for key, name in [
+            ("tuning_data_stats", "tuningDataStats"),
+            ("experiment", "experiment"),
+            ("start_time", "startTime"),
+            ("end_time", "endTime"),
+        ]
+        if job.get(name)
+    }
+    properties = {
+        "job_state": state,
+        "job_error": (job.get("error") or {}).get("message", ""),
+        "status": _FINAL_STATUSES.get(state, FineTuningStatus.TRAINING).value,
+    }
+    if metrics:
+        properties["training_metrics"] = json.dumps(metrics, sort_keys=True)
+    if tuned_model.get("endpoint") or tuned_model.get("model"):
+        properties["model_path"] = tuned_model.get("endpoint") or tuned_model.get("model")
+    return properties
+
+@dataclass
+class _TrackedJob:
+    model_id: str
+    interval: float
+    next_poll_at: float
+    state: Optional[str] = None
+    properties: Optional[Dict[str, Any]] = None
+
+class FineTuningJobPoller:
+    def __init__(self, min_interval: float, max_interval: float, refresh_interval: float, lock_path: str):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.refresh_interval = refresh_interval
+        self.lock_path = lock_path
+        self._jobs: Dict[str, _TrackedJob] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"polls": 0, "transitions": 0, "errors": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="fine-tuning-poller", daemon=True)
+            self._thread.start()
+
+    def track(self, model_id: str, job_name: str, state: Optional[str] = None):
+        """Poll `job_name` from now on, writing its state to the `model_id` row."""
+        with self._lock:
+            self._jobs[job_name] = _TrackedJob(model_id, self.min_interval, time.monotonic() + self.min_interval, state)
+        self._wake.set()
+
+    def _refresh(self):
+        """Track active rows written by any worker; rows no longer active are dropped."""
+        # Raises on errors, so a failed read keeps the jobs tracked so far
+        rows = [
+            row
+            for status in _ACTIVE_STATUSES
+            for row in get_fine_tuning_models_with_jobs(limit=1000, status=status, raise_errors=True)
+        ]
+        active = {row["job_name"]: row for row in rows if row.get("job_name")}
+        with self._lock:
+            for job_name in list(self._jobs):
+                if job_name not in active:
+                    del self._jobs[job_name]
+            for job_name, row in active.items():
+                if job_name not in self._jobs:
+                    self._jobs[job_name] = _TrackedJob(row["uuid"], self.min_interval, time.monotonic(), row.get("job_state"))
+
+    def _poll(self, job_name: str, job: _TrackedJob):
+        self._stats["polls"] += 1
+        try:
+            properties = job_properties(get_one_fine_tuning_job(job_name))
+            changed = properties != job.properties
+            if changed:
+                update_collection_object(
+                    COLLECTION_FINE_TUNING_MODELS,
+                    job.model_id,
+                    {**properties, "job_synced_at": _now(), "updated_at": _now()},
+                )
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Polling fine-tuning job {job_name} failed: {e}")
+            job.interval = min(job.interval * 2, self.max_interval)
+            job.next_poll_at = time.monotonic() + job.interval
+            return
+        if job.state != properties["job_state"]:
+            self._stats["transitions"] += 1
+            logger.info(f"Fine-tuning job {job_name}: {job.state} -> {properties['job_state']}")
+            job.state = properties["job_state"]
+            job.interval = self.min_interval
+        elif changed:
+            # New metrics without a state change
+            job.interval = self.min_interval
+        else:
+            job.interval = min(job.interval * 2, self.max_interval)
+        job.properties = properties
+        if properties["status"] != FineTuningStatus.TRAINING.value:
+            with self._lock:
+                self._jobs.pop(job_name, None)
+            return
+        job.next_poll_at = time.monotonic() + job.interval
+
+    def _run(self):
+        # Only the worker holding the lock polls; the others retry until it is free.
+        # Never block in flock: under gevent that would stall the worker's event loop.
+        lock_file = open(self.lock_path, "a")
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(self.refresh_interval)
+        logger.info(f"Fine-tuning job poller started in process {os.getpid()}")
+        next_refresh = 0.0
+        while True:
+            self._wake.clear()
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + self.refresh_interval
+                try:
+                    self._refresh()
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    logger.warning(f"Reading active fine-tuning jobs failed, keeping the tracked ones: {e}")
+            try:
+                with self._lock:
+                    due = [(name, job) for name, job in self._jobs.items() if job.next_poll_at <= time.monotonic()]
+                for job_name, job in due:
+                    self._poll(job_name, job)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"Fine-tuning job poller error: {e}")
+            with self._lock:
+                next_at = min([job.next_poll_at for job in self._jobs.values()] + [next_refresh])
+            self._wake.wait(max(next_at - time.monotonic(), 0))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "tracked": len(self._jobs)}
+
+fine_tuning_poller = FineTuningJobPoller(
+    min_interval=FINE_TUNING_POLL_MIN_SECONDS,
+    max_interval=FINE_TUNING_POLL_MAX_SECONDS,
+    refresh_interval=FINE_TUNING_POLL_REFRESH_SECONDS,
+    lock_path=FINE_TUNING_POLLER_LOCK_PATH,
+)
+
+def start_fine_tuning_poller():
+    if FINE_TUNING_POLLER_ENABLED:
+        fine_tuning_poller.start()
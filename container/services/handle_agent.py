@@ -1,13 +1,14 @@
 import json
 from typing import List, Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate
-from libs.weaviate_lib import client, insert_to_collection, update_collection_object, delete_collection_object, COLLECTION_AGENTS
+from libs.weaviate_lib import client, insert_to_collection, update_collection_object, delete_collection_object, COLLECTION_AGENTS, get_query_vector
 from datetime import datetime
 import uuid
 import weaviate.classes as wvc
-from data_classes.common_classes import AgentStatus, AgentProvider
+from data_classes.common_classes import AgentStatus, AgentProvider, ChunkingStrategy
 from libs.langchain import get_langchain_model
 from libs.google_vertex import delete_corpus
+from services.agent_runtime import invalidate_agent_runtime
 
 def create_agent(
     name: str, 
@@ -131,7 +132,7 @@ def update_agent(agent_id: str, **kwargs) -> Dict[str, Any]:
     
     Args:
         agent_id: The UUID of the agent
-        **kwargs: Fields to update (name, description, system_prompt, tools, model, temperature, language, system_prompt, conversation_starters, tags)
+        **kwargs: Fields to update (name, description, system_prompt, tools, model, temperature, language, system_prompt, conversation_starters, tags, chunking_strategy)
     
     Returns:
         Updated agent configuration
@@ -149,11 +150,16 @@ def update_agent(agent_id: str, **kwargs) -> Dict[str, Any]:
                 update_data[key] = value
             elif key in ["tools", "conversation_starters", "tags"]:
                 update_data[key] = json.dumps(value) if isinstance(value, list) else value
+            elif key == "chunking_strategy":
+                if value and value not in [strategy.value for strategy in ChunkingStrategy]:
+                    return {"error": f"Invalid chunking_strategy '{value}'"}
+                update_data[key] = value
         
         update_data["updated_at"] = datetime.now()
         
         # Update in Weaviate
         success = update_collection_object(COLLECTION_AGENTS, agent_id, update_data)
+        invalidate_agent_runtime(agent_id)
         
         if success:
             return {"message": f"Agent '{agent_id}' updated successfully", "updated_fields": list(update_data.keys())}
@@ -178,6 +184,7 @@ def delete_agent(agent_id: str) -> Dict[str, Any]:
         if agent["corpus_id"]:
             delete_corpus(agent["corpus_id"])
         success = delete_collection_object(COLLECTION_AGENTS, agent_id)
+        invalidate_agent_runtime(agent_id)
         
         if success:
             return {"message": f"Agent '{agent_id}' deleted successfully"}
@@ -199,8 +206,8 @@ def search_agents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     """
     try:
         collection = client.collections.get(COLLECTION_AGENTS)
-        response = collection.query.near_text(
-            query=query,
+        response = collection.query.near_vector(
+            near_vector=get_query_vector(query),
             limit=limit,
             certainty=0.7
         )
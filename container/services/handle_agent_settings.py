@@ -1,5 +1,5 @@
 from typing import List, Dict, Any, Optional
-from libs.weaviate_lib import client, insert_to_collection, update_collection_object, delete_collection_object, COLLECTION_AGENT_SETTINGS
+from libs.weaviate_lib import client, insert_to_collection, update_collection_object, delete_collection_object, bump_collection_generation, COLLECTION_AGENT_SETTINGS
 from datetime import datetime
 import uuid
 import weaviate.classes as wvc
@@ -203,6 +203,7 @@ def delete_agent_settings_by_agent(agent_id: str) -> Dict[str, Any]:
         
         filters = wvc.query.Filter.by_property("agent_id").equal(agent_id)
         success = collection.data.delete_many(filters=filters)
+        bump_collection_generation(COLLECTION_AGENT_SETTINGS)
         
         if success:
             return {"message": f"All settings for agent '{agent_id}' deleted successfully"}
@@ -4,14 +4,30 @@ import secrets
 import hashlib
 import hmac
 import json
+import os
 from werkzeug.security import generate_password_hash
 from data_classes.common_classes import ApiKey, CreateApiKeyRequest, UpdateApiKeyRequest, ApiKeyStatus
-from libs.weaviate_lib import search_non_vector_collection, insert_to_collection, update_collection_object, delete_collection_object, COLLECTION_API_KEYS
+from libs.weaviate_lib import search_non_vector_collection, insert_to_collection, update_collection_object, delete_collection_object, enqueue_update, COLLECTION_API_KEYS
+from libs.ttl_cache import TTLCache
 from weaviate.collections.classes.filters import Filter
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Verified keys are trusted for API_KEY_CACHE_TTL_SECONDS. Updates and deletes
+# through this worker invalidate immediately; the TTL bounds how long another
+# worker's revocation can go unnoticed.
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "60"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+# last_used_at is only written once per window per key.
+API_KEY_LAST_USED_RESOLUTION_SECONDS = float(os.getenv("API_KEY_LAST_USED_RESOLUTION_SECONDS", "60"))
+
+verified_api_keys: TTLCache[Dict[str, Any]] = TTLCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL_SECONDS)
+# api_key_id -> key_hash of the keys in verified_api_keys, to invalidate by id.
+# Same size and TTL, so it stays bounded and lives as long as those entries.
+_api_key_hashes: TTLCache[str] = TTLCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL_SECONDS)
+_last_used_recorded: TTLCache[bool] = TTLCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_LAST_USED_RESOLUTION_SECONDS)
+
 class ApiKeyError(Exception):
     def __init__(self, message: str, status_code: int = 400):
         self.message = message
@@ -140,6 +156,7 @@ def update_api_key(api_key_id: str, user_id: str, request: UpdateApiKeyRequest)
             uuid=api_key_id,
             properties=update_data
         )
+        invalidate_api_key_cache(api_key_id)
         
         if not success:
             raise ApiKeyError("Failed to update API key", 500)
@@ -170,6 +187,7 @@ def delete_api_key(api_key_id: str, user_id: str) -> bool:
         
         # Delete from database
         success = delete_collection_object(COLLECTION_API_KEYS, api_key_id)
+        invalidate_api_key_cache(api_key_id)
         
         if not success:
             raise ApiKeyError("Failed to delete API key", 500)
@@ -191,11 +209,48 @@ def revoke_api_key(api_key_id: str, user_id: str) -> Dict[str, Any]:
         logger.error(f"Error revoking API key: {str(e)}")
         raise ApiKeyError(f"Failed to revoke API key: {str(e)}", 500)
 
+def invalidate_api_key_cache(api_key_id: str):
+    """Forget the cached verification of an API key after it changes."""
+    key_hash = _api_key_hashes.pop(str(api_key_id))
+    if key_hash:
+        verified_api_keys.pop(key_hash)
+
+def _is_expired(expires_at: Optional[str]) -> bool:
+    if not expires_at:
+        return False
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+    elif expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=UTC)
+    return datetime.now(UTC) > expires_at
+
+def _record_last_used(api_key_id: Optional[str]):
+    """Write last_used_at behind the request, at most once per resolution window per key."""
+    if not api_key_id or _last_used_recorded.get(api_key_id):
+        return
+    _last_used_recorded.set(api_key_id, True)
+    enqueue_update(
+        collection_name=COLLECTION_API_KEYS,
+        uuid=api_key_id,
+        properties={"last_used_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    )
+
 def validate_api_key(api_key: str) -> Optional[Dict[str, Any]]:
     """Validate an API key and return user info if valid"""
     try:
         key_hash = hash_api_key(api_key)
         
+        cached = verified_api_keys.get(key_hash)
+        if cached and not _is_expired(cached["expires_at"]):
+            # Keep the id mapping as recently used as the entry it invalidates
+            _api_key_hashes.get(str(cached["api_key_id"]))
+            _record_last_used(cached["api_key_id"])
+            return {
+                "user_id": cached["user_id"],
+                "permissions": cached["permissions"],
+                "api_key_id": cached["api_key_id"]
+            }
+        
         # Search for the API key
         filters = Filter.by_property("key_hash").equal(key_hash)
         api_keys = search_non_vector_collection(
@@ -216,27 +271,30 @@ def validate_api_key(api_key: str) -> Optional[Dict[str, Any]]:
         
         # Check if key is expired
         expires_at = api_key_data.get("expires_at")
-        if expires_at:
-            expires_datetime = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-            if datetime.now(UTC) > expires_datetime:
-                # Mark as expired
-                api_key_uuid = api_key_data.get("uuid")
-                if api_key_uuid:
-                    update_collection_object(
-                        collection_name=COLLECTION_API_KEYS,
-                        uuid=api_key_uuid,
-                        properties={"status": ApiKeyStatus.EXPIRED.value}
-                    )
-                return None
+        if _is_expired(expires_at):
+            # Mark as expired
+            api_key_uuid = api_key_data.get("uuid")
+            if api_key_uuid:
+                invalidate_api_key_cache(api_key_uuid)
+                update_collection_object(
+                    collection_name=COLLECTION_API_KEYS,
+                    uuid=api_key_uuid,
+                    properties={"status": ApiKeyStatus.EXPIRED.value}
+                )
+            return None
         
-        # Update last used timestamp
         api_key_uuid = api_key_data.get("uuid")
         if api_key_uuid:
-            update_collection_object(
-                collection_name=COLLECTION_API_KEYS,
-                uuid=api_key_uuid,
-                properties={"last_used_at": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")}
-            )
+            verified_api_keys.set(key_hash, {
+                "user_id": api_key_data.get("user_id"),
+                "permissions": api_key_data.get("permissions", []),
+                "api_key_id": api_key_uuid,
+                "expires_at": expires_at,
+            })
+            _api_key_hashes.set(str(api_key_uuid), key_hash)
+        
+        # Update last used timestamp
+        _record_last_used(api_key_uuid)
         
         return {
             "user_id": api_key_data.get("user_id"),
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any, Generator, Optional
 import json
-from libs.weaviate_lib import search_documents, insert_to_collection_in_batch, insert_to_collection, COLLECTION_MESSAGES
+import uuid
+from libs.weaviate_lib import search_documents, insert_to_collection_in_batch, enqueue_insert, cached_query_vector, COLLECTION_MESSAGES
 from data_classes.common_classes import AskRequest, Message, ApprovalStatus, Agent, Language, AgentProvider, StreamEvent
 from agents.buddha_agent import generate_answer
 from datetime import datetime, timedelta
@@ -9,11 +10,32 @@ from services.handle_agent import get_agent_by_id
 from agents.buddha_agent import get_default_buddha_agent
 from libs.open_ai import generate_openai_answer
 from libs.google_vertex import generate_gemini_response
-from libs.langchain import check_model
 from constants.separators import ENDING_SEPARATOR, STARTING_SEPARATOR
 from utils.string_utils import get_text_after_separator
-from services.handle_sections import get_section_by_id, update_section
-from agents.context_agent import generate_context
+from services.handle_sections import get_section_by_id, schedule_context_update
+from libs.stage_executor import StageExecutor
+from services.agent_runtime import (
+    AgentRuntime,
+    compile_agent_runtime,
+    get_cached_agent_runtime,
+    store_agent_runtime,
+)
+from services.answer_cache import (
+    AnswerSet,
+    CachedAnswer,
+    answer_sets,
+    add_starter_answer,
+    find_cached_answer,
+    load_starter_answers,
+    replay_cached_answer,
+    starter_answers,
+    starter_generation,
+)
+from libs.side_tasks import submit_side_task
+import time
+import logging
+logger = logging.getLogger(__name__)
+
 class AskError(Exception):
     def __init__(self, message: str, status_code: int = 400):
         self.message = message
@@ -40,28 +62,17 @@ def prepare_ask(body: AskRequest) -> tuple[Message, Message]:
 
     return last_user_message, previous_assistant_message
 
-def get_agent(agent_id: str, language: Language) -> Agent:
+def get_agent_runtime(agent_id: str, language: Language) -> AgentRuntime:
+    runtime = get_cached_agent_runtime(agent_id)
+    if runtime:
+        return runtime
     agent = get_agent_by_id(agent_id)
     if not agent or "error" in agent:
-        return get_default_buddha_agent(language)
-    return Agent(
-        name=agent["name"],
-        description=agent["description"],
-        system_prompt=agent["system_prompt"],
-        tools=agent["tools"],
-        model=agent["model"],
-        temperature=agent["temperature"],
-        language=agent["language"],
-        created_at=agent["created_at"],
-        updated_at=agent["updated_at"],
-        author=agent["author"],
-        status=agent["status"],
-        agent_type=agent["agent_type"],
-        uuid=agent["uuid"],
-        corpus_id=agent["corpus_id"],
-        tags=agent["tags"],
-        conversation_starters=agent["conversation_starters"],
-    )
+        return compile_agent_runtime(get_default_buddha_agent(language))
+    return store_agent_runtime(agent_id, agent)
+
+def get_agent(agent_id: str, language: Language) -> Agent:
+    return get_agent_runtime(agent_id, language).agent
 
 def handle_insert_messages(body: AskRequest, last_user_message: Message, answer: str):
     user_time = datetime.now()
@@ -88,14 +99,16 @@ def handle_ask_non_streaming(body: AskRequest) -> str:
         if not body.agent_id:
             raise AskError("Agent ID is required", 400)
         last_user_message, previous_assistant_message = prepare_ask(body)
-        contexts = get_contexts(last_user_message)
-        agent = get_agent(body.agent_id or "", body.language)
-        provider = check_model(agent.model)
+        cached = lookup_answer_cache(body, last_user_message)
+        if cached:
+            return cached.answer
+        runtime, chat_section, contexts, _ = run_pre_generation_stages(body, last_user_message)
+        schedule_starter_answers(body.agent_id, runtime, body.language)
+        agent = runtime.agent
+        provider = runtime.provider
         # 2. generate answer
         match provider.value:
             case AgentProvider.OPENAI.value:
-                contexts = get_contexts(last_user_message)
-                
                 response: str = generate_openai_answer(
                     agent = agent,
                     messages = body.messages, 
@@ -106,8 +119,9 @@ def handle_ask_non_streaming(body: AskRequest) -> str:
                 response: str = generate_gemini_response(
                     agent = agent,
                     messages = body.messages, 
-                    context = contexts,
-                    stream = False
+                    context = chat_section.get("context", None) if chat_section else None,
+                    stream = False,
+                    runtime = runtime.gemini,
                 )
         # answer = generate_answer(body.messages, contexts, body.options, body.language, body.model)
         # 3. save messages
@@ -131,6 +145,155 @@ def get_contexts(last_user_message: Message) -> List[Dict[str, str]]:
     ]
     return contexts
 
+def run_pre_generation_stages(
+    body: AskRequest,
+    last_user_message: Message,
+) -> tuple[AgentRuntime, Optional[Dict[str, Any]], Optional[List[Dict[str, str]]], Dict[str, float]]:
+    """
+    Run the lookups the model call depends on concurrently.
+
+    Returns:
+        (agent runtime, chat section or None, OpenAI contexts or None, per-stage timings in ms)
+    """
+    stages = StageExecutor()
+    runtime = get_cached_agent_runtime(body.agent_id)
+    if runtime is None:
+        stages.submit("agent", get_agent_runtime, body.agent_id, body.language)
+    if body.session_id:
+        stages.submit("section", get_section_by_id, body.session_id)
+    # Until the agent is known the provider is not either, so the document
+    # search is started speculatively and dropped if the agent is on Gemini.
+    if runtime is None or runtime.provider == AgentProvider.OPENAI:
+        stages.submit("contexts", get_contexts, last_user_message)
+
+    if runtime is None:
+        runtime = stages.result("agent")
+    chat_section = stages.result("section") if stages.has("section") else None
+    contexts = None
+    if runtime.provider == AgentProvider.OPENAI:
+        contexts = stages.result("contexts")
+    else:
+        stages.discard("contexts")
+    timings = stages.timings()
+    logger.info(f"ask pre-generation stages for agent {body.agent_id}: {timings}")
+    return runtime, chat_section, contexts, timings
+
+def start_answer_stream(
+    runtime: AgentRuntime,
+    body: AskRequest,
+    contexts: Optional[List[Dict[str, str]]],
+    context: Optional[str],
+) -> Generator[StreamEvent, None, None]:
+    """Start the provider's answer stream for `body`."""
+    agent = runtime.agent
+    match runtime.provider.value:
+        case AgentProvider.OPENAI.value:
+            return generate_openai_answer(
+                agent = agent,
+                messages = body.messages, 
+                contexts = contexts, 
+                stream = True
+            )
+        case AgentProvider.GOOGLE_VERTEX.value:
+            return generate_gemini_response(
+                agent = agent,
+                messages = body.messages, 
+                context = context if context else "" + ( "\n" + body.context if body.context else "" ),
+                stream = True,
+                runtime = runtime.gemini,
+            )
+
+def lookup_answer_cache(body: AskRequest, last_user_message: Message) -> Optional[CachedAnswer]:
+    """
+    Cached answer for the opening question of a conversation.
+
+    Later turns depend on the conversation so far and always go to the model.
+    """
+    if body.context or sum(1 for msg in body.messages if msg.role == "user") != 1:
+        return None
+    return find_cached_answer(body.agent_id, last_user_message.content)
+
+def schedule_starter_answers(agent_id: str, runtime: AgentRuntime, language: Language):
+    """
+    Make sure the agent's conversation starters have precomputed answers.
+
+    Checked once per loaded answer set. The answers are stored for every worker
+    on the machine and generated by the first worker to claim them.
+    """
+    starters = runtime.agent.conversation_starters
+    if isinstance(starters, str):
+        starters = json.loads(starters) if starters else []
+    if not starters:
+        return
+    answer_set = answer_sets.peek(agent_id)
+    if answer_set is None or answer_set.starters_scheduled:
+        return
+    answer_set.starters_scheduled = True
+    submit_side_task(
+        ("starter_answers", agent_id),
+        lambda _: _precompute_starter_answers(agent_id, runtime, language, starters, answer_set),
+    )
+
+def _precompute_starter_answers(agent_id: str, runtime: AgentRuntime, language: Language, starters: List[str], answer_set: AnswerSet):
+    generation = starter_generation(agent_id, runtime.provider == AgentProvider.OPENAI)
+    if not starter_answers.claim(agent_id, generation):
+        # Generated, or being generated, by another worker
+        if starter_answers.is_done(agent_id, generation):
+            load_starter_answers(agent_id, answer_set)
+        else:
+            answer_set.starters_scheduled = False  # look again on a later ask
+        return
+    try:
+        stored = {row[0] for row in starter_answers.get(agent_id, [generation])}
+        generated = 0
+        for starter in starters:
+            if starter in stored or find_cached_answer(agent_id, starter):
+                continue
+            body = AskRequest(messages=[Message(role="user", content=starter)], agent_id=agent_id, language=language)
+            contexts = get_contexts(body.messages[0]) if runtime.provider == AgentProvider.OPENAI else None
+            answer, thought = "", ""
+            for chunk in start_answer_stream(runtime, body, contexts, None):
+                if chunk.type == "text":
+                    answer += chunk.data
+                elif chunk.type == "thought":
+                    thought += chunk.data
+            if answer:
+                add_starter_answer(agent_id, generation, starter, answer, thought)
+                generated += 1
+        starter_answers.finish(agent_id, generation)
+    except Exception:
+        starter_answers.release(agent_id, generation)
+        raise
+    logger.info(f"Precomputed {generated} conversation starter answers for agent {agent_id}")
+
+def build_turn_properties(
+    body: AskRequest,
+    last_user_message: Message,
+    answer: str,
+    thought: str,
+    response_answer_id: str,
+) -> tuple[Dict[str, Any], Dict[str, Any]]:
+    """Build the (answer, question) `Messages` rows persisted at the end of a turn."""
+    user_time = datetime.now()
+    answer_properties = {
+        "session_id": body.session_id,
+        "content": answer,
+        "thought": thought,
+        "role": "assistant",
+        "created_at": (user_time + timedelta(milliseconds=2000)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "agent_id": body.agent_id,
+    }
+    question_properties = {
+        "session_id": body.session_id,
+        "content": last_user_message.content,
+        "role": last_user_message.role,
+        "created_at": user_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "response_answer_id": str(response_answer_id),
+        "approval_status": ApprovalStatus.PENDING.value,
+        "agent_id": body.agent_id,
+    }
+    return answer_properties, question_properties
+
 def format_response(chunk: StreamEvent, text_only: bool) -> str:
     if text_only:
         if ENDING_SEPARATOR in chunk.data:
@@ -155,34 +318,34 @@ def handle_ask_streaming(body: AskRequest, is_test: bool = False) -> Response:
                 text_only = body.options.get('text_only', False)
                 if not text_only:
                     text_only = False
-                agent = get_agent(body.agent_id, body.language)
-                if not agent:
-                    raise AskError("Agent not found", 404)
-                context: Optional[str] = None
-                if body.session_id:
-                    chat_section = get_section_by_id(body.session_id)
+                # Speak while generating: audio events are multiplexed into the event stream
+                speech = None
+                if body.options.get('speak') and not text_only:
+                    from services.handle_tts import speech_options
+                    try:
+                        speech = speech_options(body.options.get('tts'), body.language)
+                    except ValueError as e:
+                        raise AskError(str(e), 400)
+                started_at = time.perf_counter()
+                cached = None if is_test else lookup_answer_cache(body, last_user_message)
+                if cached:
+                    # Replay a known answer; only the section is still needed.
+                    chat_section = get_section_by_id(body.session_id) if body.session_id else None
+                    timings = {"answer_cache_ms": round((time.perf_counter() - started_at) * 1000, 1)}
+                    stream: Generator[StreamEvent, None, None] = replay_cached_answer(cached)
+                else:
+                    runtime, chat_section, contexts, timings = run_pre_generation_stages(body, last_user_message)
+                    agent = runtime.agent
+                    if not agent:
+                        raise AskError("Agent not found", 404)
+                    context: Optional[str] = None
                     if chat_section:
                         context = chat_section.get("context", None)
-                    else:
-                        context = None
-                provider = check_model(agent.model)
-                match provider.value:
-                    case AgentProvider.OPENAI.value:
-                        contexts = get_contexts(last_user_message)
-                        
-                        stream: Generator[StreamEvent, None, None] = generate_openai_answer(
-                            agent = agent,
-                            messages = body.messages, 
-                            contexts = contexts, 
-                            stream = True
-                        )
-                    case AgentProvider.GOOGLE_VERTEX.value:
-                        stream: Generator[StreamEvent, None, None] = generate_gemini_response(
-                            agent = agent,
-                            messages = body.messages, 
-                            context = context if context else "" + ( "\n" + body.context if body.context else "" ),
-                            stream = True
-                        )
+                    stream = start_answer_stream(runtime, body, contexts, context)
+                    schedule_starter_answers(body.agent_id, runtime, body.language)
+                if speech:
+                    from services.handle_tts import speak_while_generating
+                    stream = speak_while_generating(stream, **speech)
                 
                 full_response = ""
                 thought_response = ""
@@ -194,14 +357,16 @@ def handle_ask_streaming(body: AskRequest, is_test: bool = False) -> Response:
                     elif chunk.type == "thought":
                         thought_response += chunk.data
                         yield format_response(chunk, text_only)
+                    elif chunk.type == "audio":
+                        yield format_response(chunk, text_only)
                     elif chunk.type == "end_of_stream":
                         # response_content, response_thought = get_text_after_separator(full_response, ENDING_SEPARATOR)
                         
                         # After streaming is complete, save the messages
-                        user_time = datetime.now()
                         # test agent dont save messages:
+                        question_id = None
+                        response_answer_id = None
                         if not is_test:
-                            response_answer_id = None
                             
                             # if body.context:
                             #     response_answer_id = insert_to_collection(
@@ -229,47 +394,28 @@ def handle_ask_streaming(body: AskRequest, is_test: bool = False) -> Response:
                             #             }
                             #         )
                             # else:
-                            response_answer_id = insert_to_collection(
-                                collection_name=COLLECTION_MESSAGES,
-                                properties={
-                                    "session_id": body.session_id,
-                                    "content": full_response,
-                                    "thought": thought_response,
-                                    "role": "assistant",
-                                    "created_at": (user_time + timedelta(milliseconds=2000)).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                                    "agent_id": body.agent_id,
-                                }
+                            # Both rows go through the write-behind queue; the answer
+                            # id is generated here so the question can reference it.
+                            response_answer_id = str(uuid.uuid4())
+                            answer_properties, question_properties = build_turn_properties(
+                                body, last_user_message, full_response, thought_response, response_answer_id
                             )
-                            question_id = insert_to_collection(
-                                collection_name=COLLECTION_MESSAGES,
-                                properties={
-                                    "session_id": body.session_id,
-                                    "content": last_user_message.content,
-                                    "role": last_user_message.role,
-                                    "created_at": user_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                                    "response_answer_id": str(response_answer_id),
-                                    "approval_status": ApprovalStatus.PENDING.value,
-                                    "agent_id": body.agent_id,
-                                }
+                            enqueue_insert(COLLECTION_MESSAGES, answer_properties, response_answer_id)
+                            # Reuse the retrieval vector of the question instead of re-embedding it
+                            question_id = enqueue_insert(
+                                COLLECTION_MESSAGES,
+                                question_properties,
+                                vector=cached_query_vector(last_user_message.content),
                             )
                         chunk.metadata = {
                             "question_id": str(question_id),
                             "response_answer_id": str(response_answer_id),
+                            "timings": timings,
+                            "answer_cache": cached.metadata() if cached else None,
                         }
                         yield format_response(chunk, text_only)
-                        if body.session_id:
-                            new_context = generate_context(last_user_message.content, context)
-                            if new_context:
-                                if chat_section:
-                                    update_section(
-                                        section_id=body.session_id,
-                                        context=new_context,
-                                    )
-                                # else:
-                                #     insert_to_collection(
-                                #         collection_name=COLLECTION_CHATS,
-                                #         properties={"context": new_context},
-                                #     )
+                        if body.session_id and chat_section:
+                            schedule_context_update(body.session_id, last_user_message.content)
                 
             except Exception as e:
                 raise AskError(str(e), 500)
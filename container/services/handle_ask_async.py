@@ -0,0 +1,143 @@
+import asyncio
+import uuid
+from typing import List, Dict, Any, AsyncGenerator, Optional
+from libs.weaviate_lib import (
+    search_documents_async,
+    fetch_object_by_id_async,
+    enqueue_insert,
+    cached_query_vector,
+    COLLECTION_AGENTS,
+    COLLECTION_MESSAGES,
+)
+from data_classes.common_classes import AskRequest, Message, Language, AgentProvider
+from agents.buddha_agent import get_default_buddha_agent
+from libs.open_ai import generate_openai_answer_async
+from libs.google_vertex import generate_gemini_response_async
+from services.handle_ask import AskError, prepare_ask, build_turn_properties, format_response, schedule_starter_answers
+from services.answer_cache import find_cached_answer_async, replay_cached_answer_async
+from services.agent_runtime import (
+    AgentRuntime,
+    compile_agent_runtime,
+    get_cached_agent_runtime,
+    store_agent_runtime,
+)
+from services.handle_sections import get_section_by_id_async, schedule_context_update
+
+# Async twin of services/handle_ask.py, served by asgi.py. Every network wait
+# (Weaviate, OpenAI, Gemini) is awaited, so one event loop can hold thousands
+# of open answer streams instead of one OS thread per stream.
+
+async def get_agent_runtime_async(agent_id: str, language: Language) -> AgentRuntime:
+    runtime = get_cached_agent_runtime(agent_id)
+    if runtime:
+        return runtime
+    try:
+        agent = await fetch_object_by_id_async(COLLECTION_AGENTS, agent_id)
+    except Exception as e:
+        print(f"Error getting agent {agent_id}: {e}")
+        agent = None
+    if not agent:
+        return compile_agent_runtime(get_default_buddha_agent(language))
+    return store_agent_runtime(agent_id, agent)
+
+async def get_contexts_async(last_user_message: Message) -> List[Dict[str, str]]:
+    relevant_docs = await search_documents_async(last_user_message.content)
+    return [
+        {
+            "title": doc["title"],
+            "content": doc["content"],
+            "description": doc["description"]
+        }
+        for doc in relevant_docs
+    ]
+
+async def _get_section_context(session_id: Optional[str]) -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+    if not session_id:
+        return None, None
+    chat_section = await get_section_by_id_async(session_id)
+    if not chat_section:
+        return None, None
+    return chat_section, chat_section.get("context", None)
+
+async def handle_ask_streaming_async(body: AskRequest, is_test: bool = False) -> AsyncGenerator[str, None]:
+    """
+    Stream an answer for `body` as `data: {...}` events, like handle_ask_streaming.
+
+    Raises:
+        AskError: before the first event when the request is invalid.
+    """
+    last_user_message, _ = prepare_ask(body)
+    if not body.agent_id:
+        raise AskError("Agent ID is required", 400)
+    if not body.options:
+        raise AskError("Options are required", 400)
+    text_only = body.options.get('text_only', False) or False
+
+    async def generate() -> AsyncGenerator[str, None]:
+        cached = None
+        if not is_test and not body.context and sum(1 for msg in body.messages if msg.role == "user") == 1:
+            cached = await find_cached_answer_async(body.agent_id, last_user_message.content)
+        if cached:
+            chat_section, _ = await _get_section_context(body.session_id)
+            stream = replay_cached_answer_async(cached)
+        else:
+            # The agent and the chat section are independent lookups.
+            runtime, (chat_section, context) = await asyncio.gather(
+                get_agent_runtime_async(body.agent_id, body.language),
+                _get_section_context(body.session_id),
+            )
+            agent = runtime.agent
+            match runtime.provider.value:
+                case AgentProvider.OPENAI.value:
+                    contexts = await get_contexts_async(last_user_message)
+                    stream = generate_openai_answer_async(
+                        agent = agent,
+                        messages = body.messages,
+                        contexts = contexts,
+                    )
+                case AgentProvider.GOOGLE_VERTEX.value:
+                    stream = generate_gemini_response_async(
+                        agent = agent,
+                        messages = body.messages,
+                        context = context if context else "" + ( "\n" + body.context if body.context else "" ),
+                        runtime = runtime.gemini,
+                    )
+            schedule_starter_answers(body.agent_id, runtime, body.language)
+
+        full_response = ""
+        thought_response = ""
+        async for chunk in stream:
+            if chunk.type == "text":
+                full_response += chunk.data
+                yield format_response(chunk, text_only)
+            elif chunk.type == "thought":
+                thought_response += chunk.data
+                yield format_response(chunk, text_only)
+            elif chunk.type == "end_of_stream":
+                question_id = None
+                response_answer_id = None
+                # test agent dont save messages:
+                if not is_test:
+                    # The answer id is generated here so the question can reference it;
+                    # both rows go through the write-behind queue.
+                    response_answer_id = str(uuid.uuid4())
+                    answer_properties, question_properties = build_turn_properties(
+                        body, last_user_message, full_response, thought_response, response_answer_id
+                    )
+                    enqueue_insert(COLLECTION_MESSAGES, answer_properties, response_answer_id)
+                    # Reuse the retrieval vector of the question instead of re-embedding it
+                    question_id = enqueue_insert(
+                        COLLECTION_MESSAGES,
+                        question_properties,
+                        vector=cached_query_vector(last_user_message.content),
+                    )
+                chunk.metadata = {
+                    "question_id": str(question_id),
+                    "response_answer_id": str(response_answer_id),
+                    "answer_cache": cached.metadata() if cached else None,
+                }
+                yield format_response(chunk, text_only)
+                if body.session_id and chat_section:
+                    schedule_context_update(body.session_id, last_user_message.content)
+
+    return generate()
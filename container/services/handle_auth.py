@@ -3,12 +3,16 @@ from typing import Optional, Dict, Any
 import jwt
 from werkzeug.security import generate_password_hash, check_password_hash
 from data_classes.common_classes import User, AuthRequest, PasswordResetRequest, ResetPasswordRequest, PasswordResetToken
-from libs.weaviate_lib import search_non_vector_collection, insert_to_collection, COLLECTION_TOKEN_BLACKLIST, update_collection_object
+from libs.weaviate_lib import search_non_vector_collection, insert_to_collection, COLLECTION_TOKEN_BLACKLIST, COLLECTION_PASSWORD_RESET_TOKENS, update_collection_object, delete_collection_objects_many
+from libs.bloom_filter import BloomFilter
 from weaviate.collections.classes.filters import Filter
 from services.handle_email import send_password_reset_email, send_password_reset_confirmation_email, EmailError
 import os
+import time
 import uuid
 import secrets
+import hashlib
+import threading
 from data_classes.common_classes import UserRole
 
 # JWT Configuration
@@ -16,6 +20,17 @@ JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key')  # In production, use a
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION = timedelta(days=1)  # Token expires in 1 day
 
+# Blacklisted JWTs are mirrored into a per-worker Bloom filter so that the
+# common case (token not revoked) needs no database call. A background thread
+# pulls rows added since the last refresh every TOKEN_BLACKLIST_REFRESH_SECONDS
+# and runs the expiry sweepers every AUTH_SWEEP_INTERVAL_SECONDS.
+TOKEN_BLACKLIST_REFRESH_SECONDS = float(os.getenv("TOKEN_BLACKLIST_REFRESH_SECONDS", "10"))
+AUTH_SWEEP_INTERVAL_SECONDS = float(os.getenv("AUTH_SWEEP_INTERVAL_SECONDS", "3600"))
+TOKEN_BLACKLIST_PAGE_SIZE = 1000
+# Rows are re-read this far behind the newest one seen, so a row committed late
+# (or stamped by a worker with a slightly slow clock) is not missed.
+TOKEN_BLACKLIST_REFRESH_OVERLAP = timedelta(seconds=60)
+
 class AuthError(Exception):
     def __init__(self, message: str, status_code: int = 401):
         self.message = message
@@ -36,8 +51,9 @@ def create_jwt_token(user_id: str) -> str:
 def verify_jwt_token(token: str) -> Dict[str, Any]:
     """Verify a JWT token and return the payload"""
     try:
-        # First check if token is blacklisted
-        if is_token_blacklisted(token):
+        # First check if token is blacklisted; only Bloom filter hits (or an
+        # unavailable filter) are confirmed against the database.
+        if token_blacklist.might_contain(token) is not False and is_token_blacklisted(token):
             raise AuthError("Token has been revoked", 401)
             
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
@@ -69,6 +85,7 @@ def blacklist_token(token: str, user_id: str) -> bool:
             collection_name=COLLECTION_TOKEN_BLACKLIST,
             properties=token_data
         )
+        token_blacklist.add(token)
         
         return blacklist_id is not None
     except Exception as e:
@@ -94,12 +111,132 @@ def is_token_blacklisted(token: str) -> bool:
 def cleanup_expired_blacklisted_tokens():
     """Clean up expired tokens from blacklist"""
     try:
-        # This would require a more sophisticated cleanup mechanism
-        # For now, we'll rely on the token expiration check in verify_jwt_token
-        pass
+        # An expired token is rejected by jwt.decode anyway, so its blacklist row is dead weight.
+        now = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+        delete_collection_objects_many(
+            collection_name=COLLECTION_TOKEN_BLACKLIST,
+            filters=Filter.by_property("expires_at").less_than(now)
+        )
     except Exception as e:
         print(f"Error cleaning up expired tokens: {str(e)}")
 
+class TokenBlacklistCache:
+    def __init__(self, refresh_seconds: float, sweep_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.sweep_seconds = sweep_seconds
+        self._bloom: Optional[BloomFilter] = None
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _fetch_since(self, since: Optional[datetime]) -> list[Dict[str, Any]]:
+        filters = Filter.by_property("expires_at").greater_than(datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        if since:
+            filters = filters & Filter.by_property("blacklisted_at").greater_or_equal(since)
+        rows, offset = [], 0
+        while True:
+            page = search_non_vector_collection(
+                collection_name=COLLECTION_TOKEN_BLACKLIST,
+                filters=filters,
+                limit=TOKEN_BLACKLIST_PAGE_SIZE,
+                offset=offset,
+                properties=["token", "blacklisted_at"]
+            )
+            rows.extend(page)
+            if len(page) < TOKEN_BLACKLIST_PAGE_SIZE:
+                return rows
+            offset += TOKEN_BLACKLIST_PAGE_SIZE
+
+    def _advance_watermark(self, rows: list[Dict[str, Any]]):
+        stamps = [row["blacklisted_at"] for row in rows if isinstance(row.get("blacklisted_at"), datetime)]
+        if stamps:
+            newest = max(stamps)
+            if self._watermark is None or newest > self._watermark:
+                self._watermark = newest
+        elif self._watermark is None:
+            self._watermark = datetime.now(UTC)
+
+    def reload(self):
+        """Rebuild the filter from every unexpired blacklist row."""
+        rows = self._fetch_since(None)
+        bloom = BloomFilter(capacity=max(len(rows) * 2, 10000))
+        for row in rows:
+            bloom.add(self._key(row["token"]))
+        with self._lock:
+            self._bloom = bloom
+            self._watermark = None
+            self._advance_watermark(rows)
+
+    def refresh(self):
+        """Add rows blacklisted since the last refresh (by any worker)."""
+        if self._bloom is None or self._bloom.saturated:
+            self.reload()
+            return
+        rows = self._fetch_since(self._watermark - TOKEN_BLACKLIST_REFRESH_OVERLAP)
+        for row in rows:
+            self._bloom.add(self._key(row["token"]))
+        with self._lock:
+            self._advance_watermark(rows)
+
+    def add(self, token: str):
+        if self._bloom is not None:
+            self._bloom.add(self._key(token))
+
+    def might_contain(self, token: str) -> Optional[bool]:
+        """
+        Returns:
+            False if the token is certainly not blacklisted, True if it may be,
+            None if the filter could not be loaded.
+        """
+        self._ensure_thread()
+        if self._bloom is None:
+            # One request loads the filter; concurrent ones fall back to the database.
+            if not self._load_lock.acquire(blocking=False):
+                return None
+            try:
+                if self._bloom is None:
+                    self.reload()
+            except Exception as e:
+                print(f"Error loading token blacklist: {str(e)}")
+                return None
+            finally:
+                self._load_lock.release()
+        return self._key(token) in self._bloom
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="auth-blacklist-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                if time.monotonic() - last_sweep >= self.sweep_seconds:
+                    last_sweep = time.monotonic()
+                    cleanup_expired_blacklisted_tokens()
+                    cleanup_expired_reset_tokens()
+                    self.reload()
+                else:
+                    self.refresh()
+            except Exception as e:
+                print(f"Error refreshing token blacklist: {str(e)}")
+
+token_blacklist = TokenBlacklistCache(
+    refresh_seconds=TOKEN_BLACKLIST_REFRESH_SECONDS,
+    sweep_seconds=AUTH_SWEEP_INTERVAL_SECONDS,
+)
+
 def request_password_reset(email: str) -> Dict[str, Any]:
     """Request password reset - generate token and send email"""
     try:
@@ -251,10 +388,12 @@ def reset_password(token: str, new_password: str) -> Dict[str, Any]:
 def cleanup_expired_reset_tokens():
     """Clean up expired reset tokens"""
     try:
-        current_time = datetime.now(UTC)
-        # This would require a more sophisticated cleanup mechanism
-        # For now, we'll rely on the expiration check in reset_password
-        pass
+        current_time = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+        # Used tokens can never be redeemed again, so they go too.
+        delete_collection_objects_many(
+            collection_name=COLLECTION_PASSWORD_RESET_TOKENS,
+            filters=Filter.by_property("expires_at").less_than(current_time) | Filter.by_property("used").equal(True)
+        )
     except Exception as e:
         print(f"Error cleaning up expired reset tokens: {str(e)}")
 
@@ -1,10 +1,10 @@
 import os
 import smtplib
-import ssl
 import logging
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Optional
+from libs.email_outbox import SMTPConnection, get_email_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +15,10 @@ SMTP_USERNAME = os.getenv('SMTP_USERNAME')  # Your PrivateEmail address
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')  # Your PrivateEmail password
 FROM_EMAIL = os.getenv('FROM_EMAIL', SMTP_USERNAME)
 DOMAIN_URL = os.getenv('DOMAIN_URL', 'http://localhost:3000')
+# Set to false for a local SMTP stand-in without TLS; credentials are then optional
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() != 'false'
+# Queue mail in the outbox (libs/email_outbox.py) instead of sending it inside the request
+EMAIL_OUTBOX_ENABLED = os.getenv('EMAIL_OUTBOX_ENABLED', 'true').lower() != 'false'
 
 class EmailError(Exception):
     def __init__(self, message: str, status_code: int = 500):
@@ -22,10 +26,27 @@ class EmailError(Exception):
         self.status_code = status_code
         super().__init__(self.message)
 
+def _smtp_configured() -> bool:
+    return bool(FROM_EMAIL) and (bool(SMTP_USERNAME and SMTP_PASSWORD) or not SMTP_STARTTLS)
+
+def _smtp_connection() -> SMTPConnection:
+    return SMTPConnection(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, starttls=SMTP_STARTTLS)
+
+def _send_message(email: str, message: MIMEMultipart, kind: str):
+    """Queue the message in the outbox, or send it right away when the outbox is disabled."""
+    if EMAIL_OUTBOX_ENABLED:
+        get_email_outbox(_smtp_connection).enqueue(FROM_EMAIL, email, message.as_string(), kind)
+        return
+    connection = _smtp_connection()
+    try:
+        connection.send(FROM_EMAIL, email, message.as_string())
+    finally:
+        connection.close()
+
 def send_password_reset_email(email: str, reset_token: str) -> bool:
-    """Send password reset email with magic link using PrivateEmail SMTP"""
+    """Queue the password reset email with magic link (sent by the outbox over PrivateEmail SMTP)"""
     try:
-        if not SMTP_USERNAME or not SMTP_PASSWORD:
+        if not _smtp_configured():
             logger.error("SMTP credentials not configured")
             raise EmailError("Email service not configured", 500)
         
@@ -101,15 +122,9 @@ def send_password_reset_email(email: str, reset_token: str) -> bool:
         message.attach(text_part)
         message.attach(html_part)
         
-        # Send email using SMTP
-        context = ssl.create_default_context()
-        
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls(context=context)  # Enable TLS encryption
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.sendmail(FROM_EMAIL, email, message.as_string())
+        _send_message(email, message, "password_reset")
         
-        logger.info(f"Password reset email sent successfully to {email}")
+        logger.info(f"Password reset email queued for {email}")
         return True
         
     except smtplib.SMTPException as e:
@@ -120,9 +135,9 @@ def send_password_reset_email(email: str, reset_token: str) -> bool:
         raise EmailError(f"Failed to send reset email: {str(e)}", 500)
 
 def send_password_reset_confirmation_email(email: str) -> bool:
-    """Send confirmation email after password reset using PrivateEmail SMTP"""
+    """Queue the confirmation email after password reset (sent by the outbox over PrivateEmail SMTP)"""
     try:
-        if not SMTP_USERNAME or not SMTP_PASSWORD:
+        if not _smtp_configured():
             logger.error("SMTP credentials not configured")
             return False
         
@@ -185,13 +200,7 @@ def send_password_reset_confirmation_email(email: str) -> bool:
         message.attach(text_part)
         message.attach(html_part)
         
-        # Send email using SMTP
-        context = ssl.create_default_context()
-        
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls(context=context)  # Enable TLS encryption
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.sendmail(FROM_EMAIL, email, message.as_string())
+        _send_message(email, message, "password_reset_confirmation")
         
         return True
         
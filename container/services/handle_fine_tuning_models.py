@@ -25,7 +25,7 @@ def get_fine_tuning_model_by_id(model_id: str) -> Optional[Dict[str, Any]]:
             properties=["name", "description", "base_model", "status", "language", 
                        "created_at", "updated_at", "author", "training_data_path", 
                        "validation_data_path", "hyperparameters", "training_metrics", 
-                       "model_path", "version"]
+                       "model_path", "version", "job_name", "job_state", "job_error", "job_synced_at"]
         )
         if models:
             model = models[0]
@@ -46,7 +46,7 @@ def get_fine_tuning_model_by_name(name: str) -> Optional[Dict[str, Any]]:
             properties=["name", "description", "base_model", "status", "language", 
                        "created_at", "updated_at", "author", "training_data_path", 
                        "validation_data_path", "hyperparameters", "training_metrics", 
-                       "model_path", "version"]
+                       "model_path", "version", "job_name", "job_state", "job_error", "job_synced_at"]
         )
         if models:
             model = models[0]
@@ -56,6 +56,49 @@ def get_fine_tuning_model_by_name(name: str) -> Optional[Dict[str, Any]]:
         print(f"Error getting fine-tuning model by name: {str(e)}")
         return None
 
+def get_fine_tuning_model_by_job_name(job_name: str) -> Optional[Dict[str, Any]]:
+    """Get the fine-tuning model tracking a Vertex tuning job"""
+    try:
+        filters = Filter.by_property("job_name").equal(job_name)
+        models = search_non_vector_collection(
+            collection_name=COLLECTION_FINE_TUNING_MODELS,
+            filters=filters,
+            limit=1,
+            properties=["name", "description", "base_model", "status", "language", 
+                       "created_at", "updated_at", "author", "training_data_path", 
+                       "validation_data_path", "hyperparameters", "training_metrics", 
+                       "model_path", "version", "job_name", "job_state", "job_error", "job_synced_at"],
+            cache=True
+        )
+        if models:
+            model = models[0]
+            return model
+        return None
+    except Exception as e:
+        print(f"Error getting fine-tuning model by job name: {str(e)}")
+        return None
+
+def get_fine_tuning_models_with_jobs(limit: int = 100, status: str = None, raise_errors: bool = False) -> List[Dict[str, Any]]:
+    """Get the fine-tuning models that have a Vertex tuning job, newest first (`raise_errors` to tell a failed read from no jobs)"""
+    filters = Filter.by_property("job_name").like("*")
+    if status:
+        filters = filters & Filter.by_property("status").equal(status)
+    try:
+        return search_non_vector_collection(
+            collection_name=COLLECTION_FINE_TUNING_MODELS,
+            limit=limit,
+            properties=["name", "base_model", "status", "created_at", "updated_at", "training_data_path",
+                       "training_metrics", "model_path", "job_name", "job_state", "job_error", "job_synced_at"],
+            sort=Sort.by_property("created_at", ascending=False),
+            filters=filters,
+            cache=True
+        )
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error getting fine-tuning models with jobs: {str(e)}")
+        return []
+
 def get_all_fine_tuning_models(limit: int = 100, offset: int = 0, search: str = "", 
                               status: str = None, language: str = None) -> List[Dict[str, Any]]:
     """Get all fine-tuning models with pagination and filtering"""
@@ -91,7 +134,7 @@ def get_all_fine_tuning_models(limit: int = 100, offset: int = 0, search: str =
             properties=["name", "description", "base_model", "status", "language", 
                        "created_at", "updated_at", "author", "training_data_path", 
                        "validation_data_path", "hyperparameters", "training_metrics", 
-                       "model_path", "version"],
+                       "model_path", "version", "job_name", "job_state", "job_error", "job_synced_at"],
             sort=sort,
             filters=filters
         )
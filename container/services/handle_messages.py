@@ -1,14 +1,17 @@
 from data_classes.common_classes import Message
-from typing import List, Optional
+import os
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
 from libs.weaviate_lib import search_vector_collection, search_non_vector_collection, update_collection_object, delete_collection_object, get_object_by_id, COLLECTION_MESSAGES, insert_to_collection_in_batch, COLLECTION_DOCUMENTS
 from typing import Dict, Any
-from weaviate.collections.classes.filters import Filter
+from weaviate.collections.classes.filters import Filter, _Filters
 from weaviate.collections.classes.grpc import Sort
 from datetime import datetime
 import logging
 from data_classes.common_classes import ApprovalStatus
-from libs.weaviate_lib import insert_to_collection
-from libs.jsonl_converter import convert_json_to_jsonl, save_jsonl_to_file, convert_messages_to_fine_tune_format, validate_fine_tune_data
+from libs.weaviate_lib import enqueue_insert, flush_writes, iterate_collection, search_non_vector_collection_page, get_collection_count_cached
+from libs.jsonl_converter import write_fine_tune_jsonl
 from google.cloud import aiplatform
 from google.cloud.aiplatform_v1.types import training_pipeline
 from google.cloud.aiplatform_v1.services.pipeline_service import PipelineServiceClient
@@ -50,7 +53,9 @@ def get_messages(session_id: str, limit: int = 10) -> List[Message]:
         filters=filters,
         limit=limit,
         properties=["content", "role", "created_at", "thought", "like_user_ids", "dislike_user_ids", "feedback", "agent_id"],
-        sort=Sort.by_property("created_at", ascending=True).by_property("role", ascending=False)
+        sort=Sort.by_property("created_at", ascending=True).by_property("role", ascending=False),
+        cache=True,
+        cache_scope=session_id,
     )
     # turn joined likes into array dict
     for message in messages:
@@ -69,7 +74,9 @@ def get_messages_list(
     agent_id: Optional[str] = None,
     search: Optional[str] = None,
     include_related: bool = True,
-    approval_status: Optional[str] = None
+    approval_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
 ) -> Dict[str, Any]:
     """
     Get a list of messages with pagination and filtering.
@@ -83,8 +90,11 @@ def get_messages_list(
         search: Search in message content
         include_related: Whether to include related messages (default: False for performance)
         approval_status: Filter by approval status (APPROVED, PENDING, REJECTED)
+        cursor: `next_cursor` from the previous page (newest first, keyset paging; ignored with `search`)
+        include_total: Whether to add the (cached) total number of matching messages
     Returns:
-        Dictionary containing messages and pagination info
+        Dictionary containing messages and pagination info, with `next_cursor`
+        set when another page can be requested
     """
     try:
         # Ensure reasonable limits
@@ -125,6 +135,7 @@ def get_messages_list(
                 filters = approval_status_filter
                 
         # Get messages
+        next_cursor = None
         if search:
             # Use vector search for content search
             messages = search_vector_collection(
@@ -135,6 +146,17 @@ def get_messages_list(
                 offset=offset,
                 properties=["content", "role", "created_at", "session_id", "agent_id", "feedback", "response_answer_id", "approval_status", "edited_content", "thought", "like_user_ids", "dislike_user_ids"]
             )
+        elif cursor or not offset:
+            # Keyset paging: deep pages cost the same as the first one
+            messages, next_cursor = search_non_vector_collection_page(
+                collection_name=COLLECTION_MESSAGES,
+                limit=limit,
+                filters=filters,
+                properties=["content", "role", "created_at", "session_id", "agent_id", "feedback", "response_answer_id", "approval_status", "edited_content", "thought", "like_user_ids", "dislike_user_ids"],
+                sort_property="created_at",
+                ascending=False,
+                cursor=cursor,
+            )
         else:
             # Use non-vector search for regular queries
             messages = search_non_vector_collection(
@@ -159,20 +181,32 @@ def get_messages_list(
             if message['related_message'] and message['related_message'].get("dislike_user_ids"):
                 message["related_message"]["dislike_user_ids"] = message["related_message"]["dislike_user_ids"].split(",")
         
-        return {
+        result = {
             "messages": messages_with_related,
             "limit": limit,
             "offset": offset,
-            "count": len(messages)
+            "count": len(messages),
+            "next_cursor": next_cursor
         }
+        if include_total:
+            result["total"] = get_collection_count_cached(
+                collection_name=COLLECTION_MESSAGES,
+                cache_key=(session_id, role, agent_id, include_related, approval_status),
+                filters=filters
+            )
+        return result
         
     except Exception as e:
         return {"error": f"Failed to get messages: {str(e)}"}
 
 
-def attach_related_messages(messages):
+def attach_related_messages(messages, strict: bool = False):
     """
     Attach related messages using batch queries for better performance.
+
+    By default a failed fetch is logged and every message gets
+    `related_message=None`. With `strict`, the fetch is retried and the
+    error raised, for callers that must not lose pairs (exports).
     """
     # Collect all unique response_answer_ids
     response_ids = set()
@@ -182,7 +216,8 @@ def attach_related_messages(messages):
     
     # Batch fetch all related messages
     related_messages = {}
-    if response_ids:
+    attempts = RELATED_FETCH_ATTEMPTS if strict else 1
+    for attempt in range(attempts if response_ids else 0):
         try:
             # Use batch query instead of individual queries
             filters = Filter.by_id().contains_any(list(response_ids))
@@ -194,9 +229,15 @@ def attach_related_messages(messages):
             )
             for msg in related_results:
                 related_messages[msg["uuid"]] = msg
+            break
         except Exception as e:
-            # Log error but don't fail the entire request
-            logger.error(f"Failed to fetch related messages: {str(e)}")
+            logger.error(f"Failed to fetch related messages (attempt {attempt + 1}/{attempts}): {str(e)}")
+            if not strict:
+                # Log error but don't fail the entire request
+                break
+            if attempt + 1 == attempts:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
     # Attach related messages
     for message in messages:
         response_id = str(message.get("response_answer_id"))
@@ -303,7 +344,8 @@ def save_q_and_a_pairs_to_system(q_and_a_pairs: List[Dict[str, str]]) -> Dict[st
     Save Q&A pairs to the system as documents.
     
     Args:
-        q_and_a_pairs: List of dictionaries containing 'question' and 'answer' keys
+        q_and_a_pairs: List of dictionaries containing 'question' and 'answer' keys,
+            and optionally the 'agent_id' the pair belongs to
     
     Returns:
         Dictionary containing success/error message and saved document IDs
@@ -318,9 +360,10 @@ def save_q_and_a_pairs_to_system(q_and_a_pairs: List[Dict[str, str]]) -> Dict[st
             if not isinstance(pair, dict) or 'question' not in pair or 'answer' not in pair:
                 return {"error": f"Invalid Q&A pair format at index {i}"}
             
+        for pair in q_and_a_pairs:
             question = pair['question']
             answer = pair['answer']
-            response_answer_id = insert_to_collection(
+            response_answer_id = enqueue_insert(
                 collection_name=COLLECTION_MESSAGES,
                 properties={
                     "content": answer,
@@ -329,17 +372,33 @@ def save_q_and_a_pairs_to_system(q_and_a_pairs: List[Dict[str, str]]) -> Dict[st
                     "mode": "fine-tune"
                 }
             )
-            insert_to_collection(
+            question_properties = {
+                "content": question,
+                "role": 'assistant',
+                "created_at": current_time,
+                "mode": "fine-tune",
+                "response_answer_id": str(response_answer_id),
+                "approval_status": ApprovalStatus.APPROVED.value
+            }
+            if pair.get('agent_id'):
+                question_properties["agent_id"] = pair['agent_id']
+            enqueue_insert(
                 collection_name=COLLECTION_MESSAGES,
-                properties={
-                    "content": question,
-                    "role": 'assistant',
-                    "created_at": current_time,
-                    "mode": "fine-tune",
-                    "response_answer_id": str(response_answer_id),
-                    "approval_status": ApprovalStatus.APPROVED.value
-                }
+                properties=question_properties
             )
+        # The pairs are written in batches by the write-behind queue; wait for
+        # them so the response still means "saved".
+        if not flush_writes():
+            return {"error": "Failed to save Q&A pairs: writes timed out or were rejected"}
+
+        # Approved pairs answer repeat questions straight away (pairs without
+        # an agent_id go to the shared set, see ANSWER_CACHE_SHARED_ANSWERS).
+        from services.answer_cache import add_cached_answers
+        pairs_by_agent: Dict[Optional[str], List[tuple]] = {}
+        for pair in q_and_a_pairs:
+            pairs_by_agent.setdefault(pair.get('agent_id'), []).append((pair['question'], pair['answer']))
+        for agent_id, pairs in pairs_by_agent.items():
+            add_cached_answers(agent_id, pairs, "q_and_a")
         
         return {
             "message": f"Successfully saved {len(q_and_a_pairs)} Q&A pairs to system",
@@ -351,12 +410,87 @@ def save_q_and_a_pairs_to_system(q_and_a_pairs: List[Dict[str, str]]) -> Dict[st
         return {"error": f"Failed to save Q&A pairs: {str(e)}"}
 
 
-def fine_tune_messages(messages: List[Dict[str, Any]], base_model: str = "gemini-2.5-flash") -> Dict[str, Any]:
+FINE_TUNE_EXPORT_PAGE_SIZE = int(os.getenv("FINE_TUNE_EXPORT_PAGE_SIZE", "500"))
+# Tries of each page's answer fetch during an export before the export fails
+RELATED_FETCH_ATTEMPTS = int(os.getenv("RELATED_FETCH_ATTEMPTS", "3"))
+FINE_TUNE_BUCKET = os.getenv("FINE_TUNE_BUCKET", "buddha-ai-bucket")
+
+def iter_messages_with_related(
+    approval_status: Optional[str] = ApprovalStatus.APPROVED.value,
+    page_size: int = FINE_TUNE_EXPORT_PAGE_SIZE,
+    extra_filters: Optional[_Filters] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every question message (optionally with `approval_status`) with its
+    answer attached as `related_message`.
+
+    Walks the whole collection a page at a time and resolves each page's answers
+    with one batched query, so memory stays bounded by `page_size`. A page
+    whose answers cannot be fetched raises instead of yielding unanswered
+    questions, so no pair is silently left out.
+
+    Without `extra_filters` this is Weaviate's cursor iterator over the whole
+    collection, with the question and approval checks done here.
+    `extra_filters` narrows the questions further (e.g. to one agent); they
+    are applied by the server, which pages on the `created_at` keyset.
+    """
+    properties = ["content", "role", "created_at", "session_id", "agent_id", "response_answer_id", "approval_status"]
+    if extra_filters is None:
+        messages = (
+            message
+            for message in iterate_collection(COLLECTION_MESSAGES, properties=properties, page_size=page_size)
+            if message.get("response_answer_id")
+            and (not approval_status or message.get("approval_status") == approval_status)
+        )
+    else:
+        filters = Filter.by_property("response_answer_id").is_none(False) & extra_filters
+        if approval_status:
+            filters = filters & Filter.by_property("approval_status").equal(approval_status)
+        messages = iterate_collection(
+            collection_name=COLLECTION_MESSAGES,
+            properties=properties,
+            filters=filters,
+            page_size=page_size,
+        )
+    while True:
+        page = list(islice(messages, page_size))
+        if not page:
+            return
+        yield from attach_related_messages(page, strict=True)
+
+def _start_fine_tuning_job(training_file_path: str, training_pairs_count: int, base_model: str) -> Dict[str, Any]:
+    """Upload a JSONL training file and create the fine-tuning job; the local file is removed afterwards."""
+    try:
+        # Upload JSONL file to GCS
+        training_data_path = upload_to_gcs(training_file_path, FINE_TUNE_BUCKET)
+    finally:
+        os.remove(training_file_path)
+
+    # Create fine-tuning job
+    job_info = create_fine_tuning_job(
+        training_data_path=training_data_path,
+        base_model=base_model,
+        model_display_name=f"fine_tuned_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        hyperparameters={
+            "epoch_count": 3,
+            "batch_size": 4,
+            "learning_rate": 0.0001
+        }
+    )
+    
+    return {
+        "message": "Fine-tuning job created successfully",
+        "job_info": job_info,
+        "training_pairs_count": training_pairs_count,
+        "training_data_path": training_data_path
+    }
+
+def fine_tune_messages(messages: Iterable[Dict[str, Any]], base_model: str = "gemini-2.5-flash") -> Dict[str, Any]:
     """
     Fine tune messages using Google Vertex AI.
     
     Args:
-        messages: List of message dictionaries with the structure:
+        messages: Iterable of message dictionaries with the structure:
                  {
                    "content": "message content",
                    "role": "user" or "assistant",
@@ -366,57 +500,35 @@ def fine_tune_messages(messages: List[Dict[str, Any]], base_model: str = "gemini
                      "role": "user" or "assistant"
                    }
                  }
+                 A generator (see iter_messages_with_related) is consumed
+                 one message at a time.
     
     Returns:
         Dictionary containing fine-tuning job information
     """
     try:
-        if not messages:
+        if messages is None or (isinstance(messages, list) and not messages):
             return {"error": "No messages provided for fine-tuning"}
         
-        # Convert messages to the required format for Vertex AI fine-tuning
-        fine_tune_data = convert_messages_to_fine_tune_format(messages)
+        # Convert, validate and write the training file in one pass
+        temp_file_path, training_pairs_count = write_fine_tune_jsonl(messages)
         
-        if not fine_tune_data:
+        if not training_pairs_count:
+            os.remove(temp_file_path)
             return {"error": "No valid conversation pairs found for fine-tuning"}
         
-        logger.info(f"Prepared {len(fine_tune_data)} conversation pairs for fine-tuning")
-        
-        # Validate the data format
-        validate_fine_tune_data(fine_tune_data)
+        logger.info(f"Prepared {training_pairs_count} conversation pairs for fine-tuning")
         
-        # Convert to JSONL format
-        jsonl_content = convert_json_to_jsonl(fine_tune_data)
-        
-        # Save JSONL content to a temporary file
-        temp_file_path = save_jsonl_to_file(jsonl_content)
-        
-        # Upload JSONL file to GCS
-        training_data_path = upload_to_gcs(temp_file_path, "buddha-ai-bucket")
-        
-        # Create fine-tuning job
-        job_info = create_fine_tuning_job(
-            training_data_path=training_data_path,
-            base_model=base_model,
-            model_display_name=f"fine_tuned_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            hyperparameters={
-                "epoch_count": 3,
-                "batch_size": 4,
-                "learning_rate": 0.0001
-            }
-        )
-        
-        return {
-            "message": "Fine-tuning job created successfully",
-            "job_info": job_info,
-            "training_pairs_count": len(fine_tune_data),
-            "training_data_path": training_data_path
-        }
+        return _start_fine_tuning_job(temp_file_path, training_pairs_count, base_model)
         
     except Exception as e:
         logger.error(f"Error fine tuning messages: {str(e)}")
         return {"error": f"Failed to fine tune messages: {str(e)}"}
 
+def fine_tune_approved_messages(base_model: str = "gemini-2.5-flash") -> Dict[str, Any]:
+    """Fine tune on every APPROVED conversation pair, streamed from the Messages collection."""
+    return fine_tune_messages(iter_messages_with_related(ApprovalStatus.APPROVED.value), base_model)
+
 
 def like_message(message_id: str, user_id: str) -> Dict[str, Any]:
     """
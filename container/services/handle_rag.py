@@ -1,16 +1,19 @@
 from werkzeug.datastructures import FileStorage 
-from libs.google_vertex import add_file_async, upload_temp_file_async
+from libs.google_vertex import add_file_async, upload_temp_file_async, stage_file_for_import_async, import_files_async, RAG_IMPORT_BUCKET, RAG_IMPORT_BATCH_SIZE
 from services.handle_agent import get_agent_by_id, update_agent
-from typing import List, Dict, Any, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
 import asyncio
 import tempfile
 import os
 from werkzeug.utils import secure_filename
-from libs.google_vertex import add_corpus
+from libs.google_vertex import add_corpus, get_rag_file_hashes
+from libs.dedup import UPLOAD_DEDUP_ENABLED, RAG_FILE_HASH_PREFIX, dedup_stats, file_digest
 """
 Each agent has a rag corpus_id
 when user upload a file, it will be uploaded to the rag corpus_id
 if the agent does not have a rag corpus_id, it will be created
+a file already in the corpus (same content hash) is not uploaded again
+with RAG_IMPORT_BUCKET set, files are staged to GCS and imported in batches
 """
 
 async def handle_upload_file(files: List[FileStorage], agent_id: str) -> AsyncGenerator[Dict[str, Any], None]:
@@ -28,9 +31,23 @@ async def handle_upload_file(files: List[FileStorage], agent_id: str) -> AsyncGe
         update_agent(agent_id, corpus_id=corpus_id)
         yield {"status": "corpus_created", "corpus_id": corpus_id, "message": "RAG corpus created successfully"}
     
+    async for update in upload_files_to_corpus(files, agent["corpus_id"]):
+        yield update
+
+async def upload_files_to_corpus(files: List[FileStorage], corpus_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Upload files to a RAG corpus, yielding per-file progress updates.
+
+    Files are uploaded one `rag.upload_file` each, or staged to GCS and
+    imported in batches when RAG_IMPORT_BUCKET is set; the updates are the
+    same either way, plus `staged` and `importing` for the latter.
+    """
     total_files = len(files)
     successful_count = 0
     failed_count = 0
+    duplicate_count = 0
+    bytes_saved = 0
+    corpus_hashes = None
     
     yield {"status": "starting_upload", "total_files": total_files, "message": f"Starting upload of {total_files} files"}
     
@@ -69,14 +86,43 @@ async def handle_upload_file(files: List[FileStorage], agent_id: str) -> AsyncGe
             file.save(temp_file.name)
             temp_file.close()
             
-            temp_files_data.append({
+            file_data = {
                 'temp_path': temp_file.name,
                 'display_name': display_name,
                 'original_filename': original_filename,
                 'content_type': file.content_type,
                 'size': file.content_length if hasattr(file, 'content_length') else None,
                 'index': index
-            })
+            }
+            
+            if UPLOAD_DEDUP_ENABLED:
+                content_hash, size = file_digest(temp_file.name)
+                file_data['content_hash'] = content_hash
+                if corpus_hashes is None:
+                    try:
+                        corpus_hashes = get_rag_file_hashes(corpus_id)
+                    except Exception as e:
+                        print(f"Warning: Could not list corpus files for deduplication: {e}")
+                        corpus_hashes = {}
+                duplicate_of = corpus_hashes.get(content_hash) or next(
+                    (data['original_filename'] for data in temp_files_data if data['content_hash'] == content_hash), None
+                )
+                if duplicate_of:
+                    os.remove(temp_file.name)
+                    duplicate_count += 1
+                    bytes_saved += size
+                    dedup_stats.record(duplicate_files=1, bytes_saved=size)
+                    yield {
+                        "status": "duplicate",
+                        "filename": original_filename,
+                        "progress": f"{index}/{total_files}",
+                        "duplicate_of": duplicate_of,
+                        "bytes_saved": size,
+                        "message": f"{original_filename} is already in the corpus"
+                    }
+                    continue
+            
+            temp_files_data.append(file_data)
             
         except Exception as e:
             failed_count += 1
@@ -90,69 +136,149 @@ async def handle_upload_file(files: List[FileStorage], agent_id: str) -> AsyncGe
                 "message": f"Failed to prepare {file.filename}: {str(e)}"
             }
     
-    # Now create async tasks for all prepared files
-    tasks = []
-    task_to_metadata = {}
+    async for status, file_data, payload in _upload_prepared(temp_files_data, corpus_id):
+        if status in ("uploading", "staged", "importing"):
+            yield {
+                "status": status,
+                "filename": file_data['original_filename'],
+                "progress": f"{file_data['index']}/{total_files}",
+                "message": f"{status.capitalize()} {file_data['original_filename']}..."
+            }
+            continue
+        
+        if status == "success":
+            successful_count += 1
+            yield {
+                "status": "success", 
+                "filename": file_data['original_filename'],
+                "content_type": file_data['content_type'],
+                "size": file_data['size'],
+                "progress": f"{file_data['index']}/{total_files}",
+                "successful_count": successful_count,
+                "failed_count": failed_count,
+                "message": f"Successfully uploaded {file_data['original_filename']}",
+                "result": payload
+            }
+        else:
+            failed_count += 1
+            yield {
+                "status": "failed",
+                "filename": file_data['original_filename'],
+                "error": str(payload),
+                "progress": f"{file_data['index']}/{total_files}",
+                "successful_count": successful_count,
+                "failed_count": failed_count,
+                "message": f"Failed to upload {file_data['original_filename']}: {str(payload)}"
+            }
+        
+        # Clean up temporary file
+        try:
+            if os.path.exists(file_data['temp_path']):
+                os.remove(file_data['temp_path'])
+        except OSError as e:
+            print(f"Warning: Could not remove temporary file {file_data['temp_path']}: {e}")
+    
+    if successful_count:
+        # Cached answers of the agents retrieving from this corpus may be outdated now
+        from services.answer_cache import invalidate_answer_cache_for_corpus
+        await asyncio.to_thread(invalidate_answer_cache_for_corpus, corpus_id)
+    
+    # Final summary
+    yield {
+        "status": "completed",
+        "corpus_id": corpus_id,
+        "total_files": total_files,
+        "successful_count": successful_count,
+        "failed_count": failed_count,
+        "duplicate_count": duplicate_count,
+        "bytes_saved": bytes_saved,
+        "message": f"Upload completed. {successful_count} successful, {failed_count} failed, {duplicate_count} duplicate"
+    }
+
+async def _upload_prepared(temp_files_data: List[Dict[str, Any]], corpus_id: str) -> AsyncGenerator[Tuple[str, Dict[str, Any], Any], None]:
+    """
+    Upload saved files to a corpus, yielding `(status, file_data, payload)`:
+    `uploading`/`staged`/`importing` progress, then one `success` (payload: result
+    message) or `failed` (payload: the exception) per file, in completion order.
+    """
+    if RAG_IMPORT_BUCKET:
+        async for update in _import_via_gcs(temp_files_data, corpus_id):
+            yield update
+        return
     
+    tasks = {}
     for file_data in temp_files_data:
-        index = file_data['index']
-        yield {"status": "uploading", "filename": file_data['original_filename'], "progress": f"{index}/{total_files}", "message": f"Uploading {file_data['original_filename']}..."}
-        
-        # Create async task for this file using the temp path
-        task = asyncio.create_task(upload_temp_file_async(file_data['temp_path'], file_data['display_name'], agent["corpus_id"]))
-        tasks.append(task)
-        task_to_metadata[task] = file_data
+        yield "uploading", file_data, None
+        description = RAG_FILE_HASH_PREFIX + file_data['content_hash'] if file_data.get('content_hash') else None
+        task = asyncio.create_task(upload_temp_file_async(file_data['temp_path'], file_data['display_name'], corpus_id, description))
+        tasks[task] = file_data
     
-    # Process completed tasks as they finish
     pending_tasks = set(tasks)
-    
     while pending_tasks:
-        # Wait for at least one task to complete
         done, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
+        for completed_task in done:
+            try:
+                yield "success", tasks[completed_task], completed_task.result()
+            except Exception as e:
+                yield "failed", tasks[completed_task], e
+
+async def _import_via_gcs(temp_files_data: List[Dict[str, Any]], corpus_id: str) -> AsyncGenerator[Tuple[str, Dict[str, Any], Any], None]:
+    """
+    Stage files to RAG_IMPORT_BUCKET and import them RAG_IMPORT_BATCH_SIZE at a
+    time. Files keep being staged while a batch imports; batches import one
+    after the other, as Vertex allows one import per corpus at a time.
+    """
+    staging = {}
+    for file_data in temp_files_data:
+        yield "uploading", file_data, None
+        task = asyncio.create_task(stage_file_for_import_async(
+            file_data['temp_path'], file_data['display_name'], corpus_id, file_data.get('content_hash')
+        ))
+        staging[task] = file_data
+    
+    staged: List[Tuple[str, Dict[str, Any]]] = []
+    importing: Optional[asyncio.Task] = None
+    import_batch: List[Tuple[str, Dict[str, Any]]] = []
+    pending_tasks = set(staging)
+    while pending_tasks or staged:
+        if importing is None and staged and (len(staged) >= RAG_IMPORT_BATCH_SIZE or not pending_tasks):
+            import_batch, staged = staged[:RAG_IMPORT_BATCH_SIZE], staged[RAG_IMPORT_BATCH_SIZE:]
+            importing = asyncio.create_task(import_files_async(corpus_id, [uri for uri, _ in import_batch]))
+            pending_tasks.add(importing)
+            for _, file_data in import_batch:
+                yield "importing", file_data, None
         
-        # Process all completed tasks
+        done, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
         for completed_task in done:
-            file_data = task_to_metadata[completed_task]
+            if completed_task is not importing:
+                file_data = staging[completed_task]
+                try:
+                    uri = completed_task.result()
+                except Exception as e:
+                    yield "failed", file_data, e
+                    continue
+                staged.append((uri, file_data))
+                yield "staged", file_data, uri
+                continue
             
+            importing = None
             try:
-                result = await completed_task
-                successful_count += 1
-                yield {
-                    "status": "success", 
-                    "filename": file_data['original_filename'],
-                    "content_type": file_data['content_type'],
-                    "size": file_data['size'],
-                    "progress": f"{file_data['index']}/{total_files}",
-                    "successful_count": successful_count,
-                    "failed_count": failed_count,
-                    "message": f"Successfully uploaded {file_data['original_filename']}",
-                    "result": result
-                }
+                imported = completed_task.result()
             except Exception as e:
-                failed_count += 1
-                yield {
-                    "status": "failed",
-                    "filename": file_data['original_filename'],
-                    "error": str(e),
-                    "progress": f"{file_data['index']}/{total_files}",
-                    "successful_count": successful_count,
-                    "failed_count": failed_count,
-                    "message": f"Failed to upload {file_data['original_filename']}: {str(e)}"
-                }
-            finally:
-                # Clean up temporary file
-                try:
-                    if os.path.exists(file_data['temp_path']):
-                        os.remove(file_data['temp_path'])
-                except OSError as e:
-                    print(f"Warning: Could not remove temporary file {file_data['temp_path']}: {e}")
-    
-    # Final summary
-    yield {
-        "status": "completed",
-        "corpus_id": agent["corpus_id"],
-        "total_files": total_files,
-        "successful_count": successful_count,
-        "failed_count": failed_count,
-        "message": f"Upload completed. {successful_count} successful, {failed_count} failed"
-    }
+                for _, file_data in import_batch:
+                    yield "failed", file_data, e
+                continue
+            for uri, file_data in import_batch:
+                if uri in imported:
+                    yield "success", file_data, f"File '{file_data['display_name']}' imported successfully to RagCorpus. RagFile ID: {imported[uri]}"
+                else:
+                    yield "failed", file_data, Exception(f"Vertex did not import {uri}")
+
+def upload_files_to_corpus_blocking(files: List[FileStorage], corpus_id: str) -> List[Dict[str, Any]]:
+    """Run upload_files_to_corpus to completion; returns its per-file `success`, `duplicate` and `failed` updates."""
+    async def collect_updates():
+        return [
+            update async for update in upload_files_to_corpus(files, corpus_id)
+            if update["status"] in ("success", "duplicate", "failed")
+        ]
+    return asyncio.run(collect_updates())
@@ -6,14 +6,20 @@ from libs.weaviate_lib import (
     COLLECTION_CHATS,
     insert_to_collection,
     search_non_vector_collection,
+    search_non_vector_collection_page,
+    search_non_vector_collection_async,
     search_vector_collection,
     update_collection_object,
     delete_collection_object,
-    get_collection_count
+    get_collection_count_cached
 )
 from weaviate.collections.classes.filters import Filter
 from weaviate.collections.classes.grpc import Sort
 from agents.sumary_agent import generate_summary
+from agents.context_agent import generate_context
+from libs.side_tasks import submit_side_task
+
+SECTION_TITLE_PLACEHOLDER_LENGTH = 50
 
 def create_section(section: Section) -> Optional[Dict[str, Any]]:
     """Create a new section
@@ -27,13 +33,16 @@ def create_section(section: Section) -> Optional[Dict[str, Any]]:
         Dict[str, Any]: The created section data or None if failed
     """
     now = datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
-    if not section.title and section.messages:
-        messages = [Message(**msg) if isinstance(msg, dict) else msg for msg in section.messages]
-        section.title = generate_summary(messages, section.language)
     if not section.order:
         section.order = 0
     if not section.uuid:
         section.uuid = str(uuid.uuid4())
+    if not section.title and section.messages:
+        # The summary title is generated in the background; until it is
+        # written, the section is titled with the start of the first message.
+        messages = [Message(**msg) if isinstance(msg, dict) else msg for msg in section.messages]
+        section.title = messages[0].content[:SECTION_TITLE_PLACEHOLDER_LENGTH]
+        submit_side_task(("title", section.uuid), _generate_section_title, (section.uuid, messages, section.language))
     properties = {
         "title": section.title,
         "order": section.order,
@@ -47,27 +56,56 @@ def create_section(section: Section) -> Optional[Dict[str, Any]]:
     section_uuid = insert_to_collection(COLLECTION_CHATS, properties, section.uuid)
     return get_section_by_id(section_uuid)
 
-def get_sections(email: str, limit: int = 10, offset: int = 0) -> tuple[List[Dict[str, Any]], int]:
-    """Get all sections with pagination and total count"""
+def get_sections(
+    email: str,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
+    """
+    Get the user's sections, newest first.
+
+    The first page (offset 0) and every `cursor` page are read with keyset
+    pagination and come with a `next_cursor`; a non-zero `offset` keeps the old
+    offset paging.
+
+    Returns:
+        Tuple of (sections, total_count or None when not requested, next_cursor)
+    """
     filters = Filter.by_property("author").equal(email)
-    
+    properties = ["title", "order", "created_at", "updated_at", "context", "language", "agent_id"]
+
     # Get sections data
-    sections = search_non_vector_collection(
-        collection_name=COLLECTION_CHATS,
-        limit=limit,
-        offset=offset,
-        properties=["title", "order", "created_at", "updated_at", "context", "language", "agent_id"],
-        sort=Sort.by_property("created_at", ascending=False),
-        filters=filters
-    )
-    
+    next_cursor = None
+    if cursor or not offset:
+        sections, next_cursor = search_non_vector_collection_page(
+            collection_name=COLLECTION_CHATS,
+            limit=limit,
+            properties=properties,
+            filters=filters,
+            sort_property="created_at",
+            ascending=False,
+            cursor=cursor,
+        )
+    else:
+        sections = search_non_vector_collection(
+            collection_name=COLLECTION_CHATS,
+            limit=limit,
+            offset=offset,
+            properties=properties,
+            sort=Sort.by_property("created_at", ascending=False),
+            filters=filters
+        )
+
     # Get total count
-    total_count = get_collection_count(
+    total_count = get_collection_count_cached(
         collection_name=COLLECTION_CHATS,
+        cache_key=("author", email),
         filters=filters
-    )
-    
-    return sections, total_count
+    ) if include_total else None
+
+    return sections, total_count, next_cursor
 
 def get_section_by_id(section_id: str) -> Optional[Dict[str, Any]]:
     """Get a section by its ID"""
@@ -76,7 +114,9 @@ def get_section_by_id(section_id: str) -> Optional[Dict[str, Any]]:
         collection_name=COLLECTION_CHATS,
         limit=1,
         properties=["title", "order", "created_at", "updated_at", "context", "language", "agent_id"],
-        filters=filters
+        filters=filters,
+        cache=True,
+        cache_scope=section_id,
     )
 
     if not sections:
@@ -84,6 +124,20 @@ def get_section_by_id(section_id: str) -> Optional[Dict[str, Any]]:
     
     return sections[0]
 
+async def get_section_by_id_async(section_id: str) -> Optional[Dict[str, Any]]:
+    """Async variant of get_section_by_id"""
+    sections = await search_non_vector_collection_async(
+        collection_name=COLLECTION_CHATS,
+        limit=1,
+        properties=["title", "order", "created_at", "updated_at", "context", "language", "agent_id"],
+        filters=Filter.by_id().equal(section_id),
+        cache=True,
+        cache_scope=section_id,
+    )
+    if not sections:
+        return None
+    return sections[0]
+
 def update_section(section_id: str, **kwargs) -> bool:
     """
     Update a section with partial properties.
@@ -126,6 +180,27 @@ def update_section(section_id: str, **kwargs) -> bool:
         print(f"Error updating section: {str(e)}")
         return False
 
+def _generate_section_title(payloads: List[tuple]):
+    section_id, messages, language = payloads[-1]
+    title = generate_summary(messages, language)
+    if title:
+        update_section(section_id=section_id, title=title)
+
+def _update_section_context(payloads: List[tuple]):
+    section_id = payloads[0][0]
+    section = get_section_by_id(section_id)
+    if not section:
+        return
+    # Every turn since the last update is folded into one context call.
+    user_prompt = "\n".join(prompt for _, prompt in payloads)
+    new_context = generate_context(user_prompt, section.get("context", None))
+    if new_context:
+        update_section(section_id=section_id, context=new_context)
+
+def schedule_context_update(section_id: str, user_prompt: str):
+    """Refresh the section's context from `user_prompt` in the background (debounced per section)."""
+    submit_side_task(("context", section_id), _update_section_context, (section_id, user_prompt))
+
 def delete_section(section_id: str) -> bool:
     """Delete a section"""
     try:
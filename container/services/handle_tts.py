@@ -1,14 +1,142 @@
 import os
 import io
+import re
+import time
 import logging
-from typing import Generator, Optional
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional, Tuple
 from google.cloud import texttospeech
 from google.cloud.texttospeech_v1 import SynthesizeSpeechRequest
 from flask import Response, stream_template
 import base64
+from libs.audio_cache import AudioCache
+from libs.tts_streaming import GoogleStreamingSynthesizer, StubStreamingSynthesizer, STREAMING_ENCODINGS, wav_stream_header
+from data_classes.common_classes import Language, StreamEvent
 
 logger = logging.getLogger(__name__)
 
+# Long texts are split into segments at sentence ends (then clauses, then
+# words), synthesized in parallel on a pool of TTS_SYNTHESIS_CONCURRENCY
+# threads shared by all requests, and streamed back in order. The first
+# segment is kept short so playback starts after one short request.
+TTS_SEGMENT_MAX_CHARS = int(os.getenv("TTS_SEGMENT_MAX_CHARS", "1000"))
+TTS_FIRST_SEGMENT_MAX_CHARS = int(os.getenv("TTS_FIRST_SEGMENT_MAX_CHARS", "200"))
+TTS_SYNTHESIS_CONCURRENCY = int(os.getenv("TTS_SYNTHESIS_CONCURRENCY", "4"))
+# Audio is written to the response in pieces of this size.
+TTS_STREAM_CHUNK_BYTES = int(os.getenv("TTS_STREAM_CHUNK_BYTES", str(32 * 1024)))
+
+# Synthesized segments are cached on disk by (text, voice, language, encoding,
+# rate, pitch, gain), so repeated answers (conversation starters, popular
+# teachings) replay without calling the API.
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() != "false"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.getcwd(), "temp", "tts_cache"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+# A sentence ends at ., !, ? or … (with closing quotes or brackets) followed by
+# whitespace, or at CJK sentence punctuation.
+_SENTENCE = re.compile(r'.+?(?:[.!?…]+["\'”’)\]]*(?=\s)|[。！？]+|$)', re.S)
+_CLAUSE_BOUNDARY = re.compile(r'(?<=[,;:，；：—])\s*')
+
+# Encodings whose audio comes back as a WAV file, header included
+_WAV_ENCODINGS = {
+    texttospeech.AudioEncoding.LINEAR16,
+    texttospeech.AudioEncoding.MULAW,
+    texttospeech.AudioEncoding.ALAW,
+}
+
+# `/api/v1/tts/stream` uses bidirectional streaming synthesis when the voice
+# and parameters allow it (Chirp HD voices, no MP3, no pitch or gain), so audio
+# frames are forwarded as the API produces them; otherwise, or if the stream
+# fails before its first frame, it falls back to the segmented unary path.
+# "stub" streams paced silence without calling the API, for offline testing;
+# "off" always uses the unary path.
+TTS_STREAMING_BACKEND = os.getenv("TTS_STREAMING_BACKEND", "google").lower()
+TTS_STREAMING_SAMPLE_RATE_HERTZ = int(os.getenv("TTS_STREAMING_SAMPLE_RATE_HERTZ", "24000"))
+TTS_STUB_FIRST_FRAME_MS = float(os.getenv("TTS_STUB_FIRST_FRAME_MS", "150"))
+TTS_STUB_MS_PER_CHAR = float(os.getenv("TTS_STUB_MS_PER_CHAR", "60"))
+
+_synthesis_pool = ThreadPoolExecutor(max_workers=TTS_SYNTHESIS_CONCURRENCY, thread_name_prefix="tts")
+audio_cache = AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024) if TTS_CACHE_ENABLED else None
+
+def _pack(pieces: List[str], max_chars: int, separator: str = " ") -> List[str]:
+    packed = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            packed.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        packed.append(current)
+    return packed
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Split a sentence longer than `max_chars` at clauses, then words, then characters."""
+    pieces = []
+    for clause in _pack([c for c in _CLAUSE_BOUNDARY.split(sentence) if c], max_chars):
+        if len(clause) <= max_chars:
+            pieces.append(clause)
+            continue
+        for words in _pack(clause.split(), max_chars):
+            pieces.extend(words[i:i + max_chars] for i in range(0, len(words), max_chars))
+    return pieces
+
+def segment_text(
+    text: str,
+    max_chars: int = TTS_SEGMENT_MAX_CHARS,
+    first_max_chars: int = TTS_FIRST_SEGMENT_MAX_CHARS,
+) -> List[str]:
+    """
+    Split text into segments of whole sentences, at most `max_chars` long.
+
+    Sentences longer than that are split at clauses, then words. The first
+    segment is at most `first_max_chars` long unless its first sentence is
+    longer, so the first audio comes back quickly.
+    """
+    pieces = []
+    for match in _SENTENCE.finditer(text):
+        sentence = " ".join(match.group().split())
+        if not sentence:
+            continue
+        pieces.extend([sentence] if len(sentence) <= max_chars else _split_long(sentence, max_chars))
+    if not pieces:
+        return []
+    first_limit = min(first_max_chars, max_chars)
+    first, consumed = pieces[0], 1
+    while consumed < len(pieces) and len(first) + 1 + len(pieces[consumed]) <= first_limit:
+        first = f"{first} {pieces[consumed]}"
+        consumed += 1
+    return [first] + _pack(pieces[consumed:], max_chars)
+
+def _split_wav(audio: bytes) -> Tuple[bytes, bytes]:
+    """(header, samples) of a WAV file; the header is empty if `audio` is not one."""
+    if audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return b"", audio
+    offset = 12
+    while offset + 8 <= len(audio):
+        chunk_id = audio[offset:offset + 4]
+        chunk_size = int.from_bytes(audio[offset + 4:offset + 8], "little")
+        if chunk_id == b"data":
+            return audio[:offset + 8], audio[offset + 8:]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return b"", audio
+
+def _wav_header(header: bytes, data_size: Optional[int]) -> bytes:
+    """`header` with its RIFF and data sizes set for `data_size` bytes of samples (None: unknown, streaming)."""
+    header = bytearray(header)
+    riff_size = 0xFFFFFFFF if data_size is None else min(len(header) - 8 + data_size, 0xFFFFFFFF)
+    header[4:8] = riff_size.to_bytes(4, "little")
+    header[-4:] = (0xFFFFFFFF if data_size is None else min(data_size, 0xFFFFFFFF)).to_bytes(4, "little")
+    return bytes(header)
+
+def _iter_chunks(audio: bytes) -> Iterator[bytes]:
+    view = memoryview(audio)
+    for start in range(0, len(audio), TTS_STREAM_CHUNK_BYTES):
+        yield bytes(view[start:start + TTS_STREAM_CHUNK_BYTES])
+
 class TTSStreamingService:
     def __init__(self):
         """Initialize TTS service with Google Cloud credentials"""
@@ -18,7 +146,17 @@ class TTSStreamingService:
             logger.info("TTS client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize TTS client: {str(e)}")
-            raise
+            if TTS_STREAMING_BACKEND != "stub":
+                raise
+            # The stub backend streams without credentials
+            self.client = None
+        self.streaming = None
+        if TTS_STREAMING_BACKEND == "google":
+            self.streaming = GoogleStreamingSynthesizer(self.client)
+        elif TTS_STREAMING_BACKEND == "stub":
+            self.streaming = StubStreamingSynthesizer(first_frame_ms=TTS_STUB_FIRST_FRAME_MS, ms_per_char=TTS_STUB_MS_PER_CHAR)
+        self._first_byte_lock = threading.Lock()
+        self._first_byte_stats: Dict[str, Dict[str, float]] = {}
 
     def synthesize_speech_stream(
         self, 
@@ -46,72 +184,219 @@ class TTSStreamingService:
             Audio data chunks as bytes
         """
         try:
-            # Configure the voice
-            voice = texttospeech.VoiceSelectionParams(
-                language_code=language_code,
-                name=voice_name
+            audio_content = self.synthesize_segment(
+                text, voice_name, language_code, audio_encoding, speaking_rate, pitch, volume_gain_db
             )
+            yield from _iter_chunks(audio_content)
 
-            # Configure the audio
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=audio_encoding,
-                speaking_rate=speaking_rate,
-                pitch=pitch,
-                volume_gain_db=volume_gain_db
-            )
+        except Exception as e:
+            logger.error(f"Error synthesizing speech: {str(e)}")
+            raise
 
-            # Create the synthesis input
-            synthesis_input = texttospeech.SynthesisInput(text=text)
+    def synthesize_segment(
+        self,
+        text: str,
+        voice_name: str = "en-US-Standard-A",
+        language_code: str = "en-US",
+        audio_encoding: texttospeech.AudioEncoding = texttospeech.AudioEncoding.MP3,
+        speaking_rate: float = 1.0,
+        pitch: float = 0.0,
+        volume_gain_db: float = 0.0
+    ) -> bytes:
+        """
+        Synthesize one request's worth of text, through the audio cache.
 
-            # Perform the text-to-speech request
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
+        Returns:
+            The audio of `text` as returned by the API
+        """
+        key = None
+        if audio_cache:
+            key = AudioCache.make_key(
+                text, voice_name, language_code, int(audio_encoding), float(speaking_rate), float(pitch), float(volume_gain_db)
             )
+            cached = audio_cache.get(key)
+            if cached is not None:
+                return cached
 
-            # Stream the audio data
-            audio_content = response.audio_content
-            
-            # For now, we'll yield the entire audio content
-            # In a more advanced implementation, you could chunk it
-            yield audio_content
+        # Configure the voice
+        voice = texttospeech.VoiceSelectionParams(
+            language_code=language_code,
+            name=voice_name
+        )
 
-        except Exception as e:
-            logger.error(f"Error synthesizing speech: {str(e)}")
-            raise
+        # Configure the audio
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=audio_encoding,
+            speaking_rate=speaking_rate,
+            pitch=pitch,
+            volume_gain_db=volume_gain_db
+        )
+
+        # Create the synthesis input
+        synthesis_input = texttospeech.SynthesisInput(text=text)
+
+        # Perform the text-to-speech request
+        response = self.client.synthesize_speech(
+            input=synthesis_input,
+            voice=voice,
+            audio_config=audio_config
+        )
+
+        if key:
+            audio_cache.put(key, response.audio_content)
+        return response.audio_content
+
+    def synthesize_segments(self, segments: List[str], **kwargs) -> Iterator[bytes]:
+        """
+        Synthesize segments on the shared pool, yielding each one's audio in order.
+
+        At most two segments per pool thread are in flight ahead of the
+        consumer; the rest are cancelled if it stops early.
+        """
+        pending = deque(segments)
+        in_flight = deque()
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < TTS_SYNTHESIS_CONCURRENCY * 2:
+                    in_flight.append(_synthesis_pool.submit(self.synthesize_segment, pending.popleft(), **kwargs))
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
 
     def synthesize_speech_chunked(
         self, 
         text: str, 
-        chunk_size: int = 1000,  # Characters per chunk
+        chunk_size: int = TTS_SEGMENT_MAX_CHARS,  # Maximum characters per segment
         **kwargs
     ) -> Generator[bytes, None, None]:
         """
         Synthesize speech in chunks for better streaming experience.
         
+        The text is split at sentence (then clause) boundaries into segments
+        of at most `chunk_size` characters, which are synthesized in parallel
+        and streamed in order. WAV encodings are sent as one WAV stream: the
+        first segment's header (with an unknown length) and then samples only.
+        
         Args:
             text: Text to synthesize
-            chunk_size: Number of characters per chunk
+            chunk_size: Maximum characters per segment
             **kwargs: Other TTS parameters
         
         Yields:
             Audio data chunks as bytes
         """
         try:
-            # Split text into chunks
-            text_chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
-            
-            for chunk in text_chunks:
-                if chunk.strip():  # Skip empty chunks
-                    # Synthesize each chunk
-                    for audio_chunk in self.synthesize_speech_stream(chunk, **kwargs):
-                        yield audio_chunk
+            segments = segment_text(text, chunk_size)
+            as_wav = len(segments) > 1 and kwargs.get("audio_encoding") in _WAV_ENCODINGS
+            for index, audio_content in enumerate(self.synthesize_segments(segments, **kwargs)):
+                if as_wav:
+                    header, audio_content = _split_wav(audio_content)
+                    if index == 0 and header:
+                        yield _wav_header(header, None)
+                yield from _iter_chunks(audio_content)
                         
         except Exception as e:
             logger.error(f"Error in chunked speech synthesis: {str(e)}")
             raise
 
+    def synthesize_audio(self, text: str, chunk_size: int = TTS_SEGMENT_MAX_CHARS, **kwargs) -> bytes:
+        """
+        Synthesize a whole text (segmented and in parallel, like
+        synthesize_speech_chunked) into one audio file.
+        """
+        segments = segment_text(text, chunk_size)
+        parts = list(self.synthesize_segments(segments, **kwargs))
+        header = b""
+        if len(parts) > 1 and kwargs.get("audio_encoding") in _WAV_ENCODINGS:
+            header, parts[0] = _split_wav(parts[0])
+            parts[1:] = [_split_wav(part)[1] for part in parts[1:]]
+            if header:
+                header = _wav_header(header, sum(len(part) for part in parts))
+        # One allocation of the final size, instead of growing a bytes object per part
+        return b"".join([header, *parts])
+
+    def synthesize_speech_low_latency(
+        self,
+        text: str,
+        voice_name: str = "en-US-Standard-A",
+        language_code: str = "en-US",
+        audio_encoding: texttospeech.AudioEncoding = texttospeech.AudioEncoding.MP3,
+        speaking_rate: float = 1.0,
+        pitch: float = 0.0,
+        volume_gain_db: float = 0.0,
+        chunk_size: int = TTS_SEGMENT_MAX_CHARS,
+    ) -> Generator[bytes, None, None]:
+        """
+        Stream speech through streaming synthesis when possible, else synthesize_speech_chunked.
+
+        The text is sent as its segments, and frames are yielded as the API
+        returns them, after a WAV header for the raw encodings. Logs the
+        time to the first audio byte.
+
+        Yields:
+            Audio data chunks as bytes
+        """
+        started_at = time.perf_counter()
+        unary_kwargs = dict(
+            voice_name=voice_name, language_code=language_code, audio_encoding=audio_encoding,
+            speaking_rate=speaking_rate, pitch=pitch, volume_gain_db=volume_gain_db,
+        )
+        backend, frames = "unary", None
+        if (
+            self.streaming
+            and self.streaming.supports(voice_name)
+            and audio_encoding in STREAMING_ENCODINGS
+            and pitch == 0.0
+            and volume_gain_db == 0.0
+        ):
+            try:
+                stream = self.streaming.stream(
+                    segment_text(text, chunk_size), voice_name, language_code, audio_encoding,
+                    TTS_STREAMING_SAMPLE_RATE_HERTZ, speaking_rate,
+                )
+                # Until the first frame nothing is sent, so the unary path can still take over
+                first_frame = next(stream, b"")
+                backend = self.streaming.name
+                frames = self._prepend(wav_stream_header(audio_encoding, TTS_STREAMING_SAMPLE_RATE_HERTZ) + first_frame, stream)
+            except Exception as e:
+                logger.warning(f"Streaming synthesis failed, falling back to unary synthesis: {str(e)}")
+        if frames is None:
+            frames = self.synthesize_speech_chunked(text, chunk_size, **unary_kwargs)
+        yield from self.timed_first_byte(frames, backend, started_at, len(text))
+
+    @staticmethod
+    def _prepend(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+        yield first
+        yield from rest
+
+    def timed_first_byte(self, frames: Iterable[bytes], backend: str, started_at: float, chars: int) -> Iterator[bytes]:
+        """Pass frames through, logging and recording the time until the first non-empty one."""
+        waiting = True
+        for frame in frames:
+            if waiting and frame:
+                waiting = False
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+                logger.info(f"TTS first audio byte after {elapsed_ms:.0f} ms ({backend}, {chars} chars)")
+                with self._first_byte_lock:
+                    stats = self._first_byte_stats.setdefault(backend, {"requests": 0, "total_ms": 0.0, "max_ms": 0.0})
+                    stats["requests"] += 1
+                    stats["total_ms"] += elapsed_ms
+                    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            yield frame
+
+    def first_byte_stats(self) -> Dict[str, Dict[str, float]]:
+        """Time to first audio byte per backend: requests, avg_ms and max_ms."""
+        with self._first_byte_lock:
+            return {
+                backend: {
+                    "requests": stats["requests"],
+                    "avg_ms": round(stats["total_ms"] / stats["requests"], 1),
+                    "max_ms": round(stats["max_ms"], 1),
+                }
+                for backend, stats in self._first_byte_stats.items()
+            }
+
     def get_available_voices(self, language_code: str = "en-US") -> list:
         """
         Get available voices for a language.
@@ -133,6 +418,165 @@ class TTSStreamingService:
 # Global TTS service instance
 tts_service = TTSStreamingService()
 
+def tts_stats() -> Dict[str, Any]:
+    return {
+        "first_byte": tts_service.first_byte_stats(),
+        "audio_cache": audio_cache.stats() if audio_cache else {"hits": 0, "misses": 0, "hit_rate": 0.0},
+    }
+
+# Speaking while the answer is generated: streamed text is cut into
+# sentences (or paragraphs and list items) as soon as each one is complete,
+# and every sentence is synthesized on the TTS pool while the model keeps
+# writing.
+# End of a sentence in streamed text: terminal punctuation (not a decimal or
+# list number) and closers followed by whitespace, CJK terminal punctuation,
+# or a line break.
+_SENTENCE_END = re.compile(r'(?:(?<!\d)\.+|[!?…]+)["\'”’)\]*_]*\s+|[。！？]+|\n+')
+_MARKDOWN_LINK = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+_URL = re.compile(r'https?://\S+')
+_MARKDOWN_SYMBOLS = re.compile(r'^\s*(?:#+|>+|[-*+]|\d+[.)])\s+|[*_`~|]+', re.M)
+
+AUDIO_ENCODING_NAMES = {"MP3", "LINEAR16", "OGG_OPUS", "MULAW", "ALAW"}
+
+AUDIO_CONTENT_TYPES = {
+    texttospeech.AudioEncoding.MP3: "audio/mpeg",
+    texttospeech.AudioEncoding.LINEAR16: "audio/wav",
+    texttospeech.AudioEncoding.OGG_OPUS: "audio/ogg",
+    texttospeech.AudioEncoding.MULAW: "audio/wav",
+    texttospeech.AudioEncoding.ALAW: "audio/wav",
+}
+
+_DEFAULT_VOICES = {
+    Language.VI.value: ("vi-VN-Standard-A", "vi-VN"),
+    Language.EN.value: ("en-US-Standard-A", "en-US"),
+}
+
+def speakable_text(text: str) -> str:
+    """Markdown answer text as it should be read aloud: link texts, no symbols or URLs."""
+    text = _MARKDOWN_LINK.sub(r"\1", text)
+    text = _URL.sub("", text)
+    text = _MARKDOWN_SYMBOLS.sub("", text)
+    return " ".join(text.split())
+
+class SentenceAccumulator:
+    """
+    Collects streamed text and releases it one complete sentence at a time.
+
+    A sentence is complete once the whitespace after its punctuation has
+    arrived, so "3." is not cut before "14". Text that grows past `max_chars`
+    without a sentence end is released at clauses or words instead.
+    """
+
+    def __init__(self, max_chars: int = TTS_SEGMENT_MAX_CHARS):
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the sentences it completed, ready to speak."""
+        self.buffer += text
+        sentences = []
+        while True:
+            match = _SENTENCE_END.search(self.buffer)
+            if not match:
+                break
+            sentences.append(self.buffer[:match.end()])
+            self.buffer = self.buffer[match.end():]
+        if len(self.buffer) > self.max_chars:
+            *complete, self.buffer = _split_long(self.buffer, self.max_chars)
+            sentences.extend(complete)
+        return [speakable for speakable in map(speakable_text, sentences) if speakable]
+
+    def flush(self) -> List[str]:
+        """The rest of the text, at the end of the stream."""
+        rest, self.buffer = speakable_text(self.buffer), ""
+        return [rest] if rest else []
+
+def speech_options(options: Optional[Dict[str, Any]], language: Any = None) -> Dict[str, Any]:
+    """
+    TTS parameters of an ask request's `options.tts`, with the voice of the
+    request's language by default.
+
+    Raises:
+        ValueError: on an unknown audio encoding or an out-of-range parameter
+    """
+    options = options or {}
+    language = getattr(language, "value", language)
+    default_voice, default_language_code = _DEFAULT_VOICES.get(language, _DEFAULT_VOICES[Language.EN.value])
+    encoding_name = str(options.get("audio_encoding", "MP3")).upper()
+    if encoding_name not in AUDIO_ENCODING_NAMES:
+        raise ValueError(f"Unknown audio encoding: {encoding_name}")
+    speech = {
+        "voice_name": options.get("voice_name", default_voice),
+        "language_code": options.get("language_code", default_language_code),
+        "audio_encoding": texttospeech.AudioEncoding[encoding_name],
+        "speaking_rate": float(options.get("speaking_rate", 1.0)),
+        "pitch": float(options.get("pitch", 0.0)),
+        "volume_gain_db": float(options.get("volume_gain_db", 0.0)),
+    }
+    if not (0.25 <= speech["speaking_rate"] <= 4.0):
+        raise ValueError("Speaking rate must be between 0.25 and 4.0")
+    if not (-20.0 <= speech["pitch"] <= 20.0):
+        raise ValueError("Pitch must be between -20.0 and 20.0")
+    if not (-96.0 <= speech["volume_gain_db"] <= 16.0):
+        raise ValueError("Volume gain must be between -96.0 and 16.0")
+    return speech
+
+def speak_while_generating(events: Iterable[StreamEvent], **speech) -> Generator[StreamEvent, None, None]:
+    """
+    Pass an answer's StreamEvents through, adding `audio` events that speak its text.
+
+    Each completed sentence of the `text` events is synthesized on the TTS pool
+    while later events keep flowing. Audio events follow the text they speak,
+    in order, as soon as their synthesis is done; the remaining ones are sent
+    before `end_of_stream`. Each carries one sentence's base64 audio (a
+    complete file in `audio_encoding`) and its `sequence`, `text` and
+    `content_type` in metadata. A sentence that fails to synthesize gets an
+    audio event with no data and an `error`, and the text stream goes on.
+
+    Args:
+        events: The answer stream
+        **speech: TTS parameters, see speech_options
+    """
+    accumulator = SentenceAccumulator()
+    content_type = AUDIO_CONTENT_TYPES.get(speech.get("audio_encoding"), "audio/mpeg")
+    in_flight = deque()
+    sequence = 0
+
+    def submit(sentences: List[str]):
+        nonlocal sequence
+        for sentence in sentences:
+            in_flight.append((sequence, sentence, _synthesis_pool.submit(tts_service.synthesize_segment, sentence, **speech)))
+            sequence += 1
+
+    def finished(wait: bool) -> Generator[StreamEvent, None, None]:
+        while in_flight and (wait or in_flight[0][2].done()):
+            index, sentence, future = in_flight.popleft()
+            metadata = {"sequence": index, "text": sentence, "content_type": content_type}
+            try:
+                audio = base64.b64encode(future.result()).decode("utf-8")
+            except Exception as e:
+                logger.error(f"Error synthesizing sentence {index}: {str(e)}")
+                audio, metadata["error"] = "", str(e)
+            yield StreamEvent(type="audio", data=audio, metadata=metadata)
+
+    try:
+        for event in events:
+            if event.type == "end_of_stream":
+                submit(accumulator.flush())
+                yield from finished(wait=True)
+                yield event
+                continue
+            yield event
+            if event.type == "text":
+                submit(accumulator.feed(event.data))
+            yield from finished(wait=False)
+        # Streams that end without end_of_stream still get all their audio
+        submit(accumulator.flush())
+        yield from finished(wait=True)
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
+
 
 def create_audio_stream_response(
     text: str,
@@ -171,15 +615,18 @@ def create_audio_stream_response(
         def generate_audio():
             try:
                 if chunked:
-                    for audio_chunk in tts_service.synthesize_speech_chunked(
+                    for audio_chunk in tts_service.synthesize_speech_low_latency(
                         text, voice_name=voice_name, language_code=language_code, 
                         audio_encoding=audio_encoding, **kwargs
                     ):
                         yield audio_chunk
                 else:
-                    for audio_chunk in tts_service.synthesize_speech_stream(
-                        text, voice_name=voice_name, language_code=language_code,
-                        audio_encoding=audio_encoding, **kwargs
+                    for audio_chunk in tts_service.timed_first_byte(
+                        tts_service.synthesize_speech_stream(
+                            text, voice_name=voice_name, language_code=language_code,
+                            audio_encoding=audio_encoding, **kwargs
+                        ),
+                        "unary", time.perf_counter(), len(text)
                     ):
                         yield audio_chunk
             except Exception as e:
@@ -222,12 +669,10 @@ def synthesize_text_to_base64(
         Base64 encoded audio data
     """
     try:
-        audio_content = b""
-        for chunk in tts_service.synthesize_speech_stream(
+        audio_content = tts_service.synthesize_audio(
             text, voice_name=voice_name, language_code=language_code,
             audio_encoding=audio_encoding, **kwargs
-        ):
-            audio_content += chunk
+        )
         
         return base64.b64encode(audio_content).decode('utf-8')
         
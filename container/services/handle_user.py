@@ -1,7 +1,7 @@
 from datetime import datetime, UTC
 from typing import List, Dict, Any, Optional
 from werkzeug.security import generate_password_hash
-from libs.weaviate_lib import get_aggregate, search_non_vector_collection, insert_to_collection, update_collection_object, delete_collection_object
+from libs.weaviate_lib import get_aggregate, search_non_vector_collection, search_non_vector_collection_page, InvalidCursorError, insert_to_collection, update_collection_object, delete_collection_object
 from weaviate.classes.query import Filter
 from weaviate.collections.classes.grpc import Sort
 import uuid
@@ -52,27 +52,55 @@ def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
         print(f"Error getting user by email: {str(e)}")
         return None
 
-def get_all_users(limit: int = 100, offset: int = 0, search: str = "") -> List[Dict[str, Any]]:
-    """Get all users with pagination"""
-    sort = Sort.by_property("created_at", ascending=False)
+def get_all_users(
+    limit: int = 100,
+    offset: int = 0,
+    search: str = "",
+    cursor: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Get all users with pagination, newest first.
+
+    The first page and `cursor` pages use keyset pagination; a non-zero
+    `offset` keeps offset paging.
+
+    Returns:
+        Tuple of (users, next_cursor or None when there are no more pages)
+
+    Raises:
+        InvalidCursorError: if `cursor` is not a token returned by this endpoint
+    """
     if search:
         filters = Filter.by_property("name").like(search) | Filter.by_property("email").like(search)
     else:
         filters = None
+    properties = ["email", "name", "role", "created_at", "updated_at"]
     try:
+        if cursor or not offset:
+            return search_non_vector_collection_page(
+                collection_name="Users",
+                limit=limit,
+                properties=properties,
+                filters=filters,
+                sort_property="created_at",
+                ascending=False,
+                cursor=cursor,
+            )
         users = search_non_vector_collection(
             collection_name="Users",
             limit=limit,
             offset=offset,
-            properties=["email", "name", "role", "created_at", "updated_at"],
-            sort=sort,
+            properties=properties,
+            sort=Sort.by_property("created_at", ascending=False),
             filters=filters
         )
         
-        return users
+        return users, None
+    except InvalidCursorError:
+        raise
     except Exception as e:
         print(f"Error getting all users: {str(e)}")
-        return []
+        return [], None
 
 def create_user(user_data: Dict[str, Any]) -> str:
     """Create a new user"""
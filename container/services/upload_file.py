@@ -1,78 +1,407 @@
-from libs.pdf_lib import process_pdf, read_pdf_from_buffer, allowed_file
+import os
+import queue
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from libs.pdf_lib import allowed_file, chunk_pdf_pages
+from libs.chunker import CHUNKING_STRATEGY
+from libs.pdf_extract import iter_pdf_pages
+from libs.pipeline import StagePipeline
+from libs.dedup import UPLOAD_DEDUP_ENABLED, dedup_stats, file_digest
+from libs.embedding_cache import embed_texts, text_hash
 from werkzeug.datastructures import FileStorage
-from typing import List, Tuple, Dict, Any, Optional
-from libs.weaviate_lib import upload_documents, search_non_vector_collection, insert_to_collection, COLLECTION_DOCUMENTS, update_collection_object, delete_collection_object, COLLECTION_FILES, client, delete_collection_objects_many, get_collection_count
+from typing import Callable, Generator, List, Tuple, Dict, Any, Optional
+from libs.weaviate_lib import DOCUMENT_CLIENT_VECTORS, EMBEDDING_MODEL, COLLECTION_AGENTS, upload_documents, search_non_vector_collection, insert_to_collection, COLLECTION_DOCUMENTS, update_collection_object, delete_collection_object, COLLECTION_FILES, client, delete_collection_objects_many, get_collection_count_cached, search_non_vector_collection_page, iterate_collection, get_collection_count, get_document_vectors_by_hash, InvalidCursorError
 from weaviate.collections.classes.filters import Filter
 from weaviate.collections.classes.grpc import Sort
 from datetime import datetime
-from data_classes.common_classes import Document, File
+from data_classes.common_classes import Document, File, ChunkingStrategy
+from services.answer_cache import invalidate_all_answer_caches
 
-def upload_file(files: List[FileStorage], description: str, author: str) -> Tuple[List[dict], int]:
-    if not files:
-        raise Exception("No files uploaded")
+# Uploaded PDFs are ingested concurrently, UPLOAD_MAX_CONCURRENT_FILES at a
+# time. Each file runs through a pipeline of stages on their own threads
+# (extract -> chunk -> embed -> insert) connected by bounded queues, so a
+# file's first chunks are embedded and inserted while its later pages are
+# still being extracted.
+UPLOAD_MAX_CONCURRENT_FILES = int(os.getenv("UPLOAD_MAX_CONCURRENT_FILES", "3"))
+# Chunks embedded and inserted together.
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "64"))
+# Items buffered between two stages.
+UPLOAD_STAGE_QUEUE_SIZE = int(os.getenv("UPLOAD_STAGE_QUEUE_SIZE", "4"))
 
-    results = []
-    for file in files:
-        if not allowed_file(file.filename):
-            raise Exception(f"File type not allowed for {file.filename}. Only PDF files are accepted.")
-        # Read PDF content from buffer
-        pdf_content = read_pdf_from_buffer(file)
-        
-        # Process the PDF content
-        chunks = process_pdf(
-            text=pdf_content,
+def resolve_chunking_strategy(strategy: Optional[str] = None, agent_id: Optional[str] = None) -> str:
+    """
+    Chunking strategy of an upload: `strategy` if given, else the agent's, else CHUNKING_STRATEGY.
+
+    Raises:
+        ValueError: if the chosen strategy is not a ChunkingStrategy value
+    """
+    if not strategy and agent_id:
+        agent = search_non_vector_collection(
+            collection_name=COLLECTION_AGENTS,
+            limit=1,
+            properties=["chunking_strategy"],
+            filters=Filter.by_id().equal(agent_id),
         )
-        file_id = create_file(File(
-            name=file.filename,
-            path=file.filename,
-            author=author
-        ))
-        if not file_id:
-            raise Exception("Failed to create file")
-        # Convert chunks to a serializable format
-        serialized_chunks = [
-            {
+        strategy = agent[0].get("chunking_strategy") if agent else None
+    return ChunkingStrategy(strategy or CHUNKING_STRATEGY).value
+
+def find_file_by_hash(content_hash: str) -> Optional[Dict[str, Any]]:
+    """The stored file with exactly this content, if any."""
+    file = search_non_vector_collection(
+        collection_name=COLLECTION_FILES,
+        filters=Filter.by_property("content_hash").equal(content_hash),
+        properties=["name", "content_hash", "size"],
+        limit=1
+    )
+    return file[0] if file else None
+
+def _reuse_vectors(documents: List[Dict[str, Any]]) -> int:
+    """Give documents whose content is already embedded in Documents that vector; returns how many."""
+    # Without client vectors each row is vectorized with its own title and description
+    if not UPLOAD_DEDUP_ENABLED or not DOCUMENT_CLIENT_VECTORS:
+        return 0
+    hashes = [text_hash(document["content"]) for document in documents]
+    vectors = get_document_vectors_by_hash(list(set(hashes)))
+    reused = 0
+    for document, content_hash in zip(documents, hashes):
+        if content_hash in vectors:
+            document["vector"] = vectors[content_hash]
+            reused += 1
+    return reused
+
+def _save_upload(file: FileStorage) -> str:
+    suffix = "." + file.filename.rsplit(".", 1)[1] if "." in file.filename else ""
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    file.save(temp_file)
+    temp_file.close()
+    return temp_file.name
+
+def _ingest_file(
+    file_data: Dict[str, Any],
+    description: str,
+    author: str,
+    emit: Callable[[Dict[str, Any]], None],
+    keep_chunks: bool = False,
+    chunking_strategy: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run one saved upload through the ingestion stages, reporting progress through `emit`."""
+    filename = file_data["filename"]
+    counts = {"pages": 0, "chunks": 0, "embedded": 0, "deduplicated": 0, "inserted": 0}
+    failed_objects = 0
+    kept_chunks = []
+
+    def progress(stage: str, status: str = "processing"):
+        if status == "stage_completed" and pipeline.stopped:
+            return
+        emit({"status": status, "filename": filename, "stage": stage, "progress": file_data["progress"], **counts})
+
+    file_id = create_file(File(
+        name=filename,
+        path=filename,
+        author=author,
+        content_hash=file_data.get("content_hash"),
+        size=file_data.get("size"),
+    ))
+    if not file_id:
+        raise Exception("Failed to create file")
+
+    def extract():
+        for page in iter_pdf_pages(file_data["temp_path"]):
+            counts["pages"] += 1
+            yield page
+        progress("extract", "stage_completed")
+
+    def chunk(pages):
+        for chunk in chunk_pdf_pages(pages, strategy=chunking_strategy):
+            counts["chunks"] += 1
+            yield {
                 "content": chunk.page_content,
-                "title": file.filename,
+                "title": filename,
                 "file_id": file_id,
                 "description": description,
                 "author": author,
+                "page_start": chunk.metadata.get("page_start"),
+                "page_end": chunk.metadata.get("page_end"),
             }
-            for chunk in chunks
-        ]
-        results.append({
-            "filename": file.filename,
-            "num_chunks": len(chunks),
-            "chunks": serialized_chunks
-        })
-        
-        failed_objects = upload_documents(serialized_chunks)
+        progress("chunk", "stage_completed")
 
-        return results, len(failed_objects)
-    
-    return results, 0
+    def embed(documents):
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) < UPLOAD_BATCH_SIZE:
+                continue
+            yield embed_batch(batch)
+            batch = []
+        if batch:
+            yield embed_batch(batch)
+        progress("embed", "stage_completed")
+
+    def embed_batch(batch):
+        # Chunks already in the index (from any file) keep their vector
+        reused = _reuse_vectors(batch)
+        counts["deduplicated"] += reused
+        dedup_stats.record(duplicate_chunks=reused, embeddings_saved=reused)
+        missing = [document for document in batch if "vector" not in document]
+        if DOCUMENT_CLIENT_VECTORS and missing:
+            vectors = embed_texts([document["content"] for document in missing], EMBEDDING_MODEL)
+            for document, vector in zip(missing, vectors):
+                document["vector"] = vector
+        counts["embedded"] += len(missing)
+        return batch
+
+    def insert(batches):
+        for batch in batches:
+            failed = upload_documents(batch)
+            counts["inserted"] += len(batch) - len(failed)
+            if keep_chunks:
+                kept_chunks.extend({k: v for k, v in document.items() if k != "vector"} for document in batch)
+            progress("insert")
+            yield len(failed)
+
+    pipeline = StagePipeline(
+        extract(),
+        [("chunk", chunk), ("embed", embed), ("insert", insert)],
+        queue_size=UPLOAD_STAGE_QUEUE_SIZE,
+    )
+    try:
+        for failed in pipeline:
+            failed_objects += failed
+    except Exception:
+        # Don't leave a half-ingested file behind.
+        try:
+            delete_file_with_transaction(file_id)
+        except Exception as e:
+            print(f"Failed to clean up file {file_id}: {e}")
+        raise
+
+    result = {"file_id": file_id, "num_chunks": counts["chunks"], "failed_objects": failed_objects, **counts}
+    if keep_chunks:
+        result["chunks"] = kept_chunks
+    return result
+
+def upload_files_streaming(
+    files: List[FileStorage],
+    description: str,
+    author: str,
+    keep_chunks: bool = False,
+    chunking_strategy: Optional[str] = None,
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Ingest uploaded PDFs concurrently, yielding progress updates.
+
+    `chunking_strategy` is a ChunkingStrategy value (default: CHUNKING_STRATEGY).
+
+    Yields dicts with a `status` like `handle_rag.handle_upload_file`:
+    `starting_upload`, `preparing`, per-stage `processing`/`stage_completed`
+    (with `pages`, `chunks`, `embedded`, `deduplicated` and `inserted`
+    counts), one `success` or `failed` per file carrying its `failed_objects`,
+    and a final `completed` summary.
+
+    A file whose content is already stored, or repeats an earlier file of the
+    same upload, is not ingested; it gets a `duplicate` update naming the
+    existing file instead. The summary reports the bytes and embeddings
+    deduplication saved.
+    """
+    total_files = len(files)
+    successful_count = 0
+    failed_count = 0
+    duplicate_count = 0
+    bytes_saved = 0
+    embeddings_saved = 0
+    failed_objects: Dict[str, int] = {}
+
+    yield {"status": "starting_upload", "total_files": total_files, "message": f"Starting upload of {total_files} files"}
+
+    # Uploads are read in the request thread; the pipeline works on copies.
+    prepared = []
+    for index, file in enumerate(files, 1):
+        progress = f"{index}/{total_files}"
+        yield {"status": "preparing", "filename": file.filename, "progress": progress, "message": f"Preparing {file.filename}..."}
+        if not file.filename or not allowed_file(file.filename):
+            failed_count += 1
+            yield {
+                "status": "failed",
+                "filename": file.filename or "unknown",
+                "error": f"File type not allowed for {file.filename}. Only PDF files are accepted.",
+                "progress": progress,
+                "successful_count": successful_count,
+                "failed_count": failed_count,
+            }
+            continue
+        file_data = {"filename": file.filename, "temp_path": _save_upload(file), "progress": progress}
+        if UPLOAD_DEDUP_ENABLED:
+            file_data["content_hash"], file_data["size"] = file_digest(file_data["temp_path"])
+            duplicate = next((p for p in prepared if p["content_hash"] == file_data["content_hash"]), None)
+            existing = None if duplicate else find_file_by_hash(file_data["content_hash"])
+            if duplicate or existing:
+                os.remove(file_data["temp_path"])
+                # An existing file's chunks would all have been embedded again
+                saved = get_collection_count(COLLECTION_DOCUMENTS, Filter.by_property("file_id").equal(existing["uuid"])) if existing else 0
+                duplicate_count += 1
+                bytes_saved += file_data["size"]
+                embeddings_saved += saved
+                dedup_stats.record(duplicate_files=1, bytes_saved=file_data["size"], embeddings_saved=saved)
+                yield {
+                    "status": "duplicate",
+                    "filename": file.filename,
+                    "progress": progress,
+                    "file_id": existing["uuid"] if existing else None,
+                    "duplicate_of": existing["name"] if existing else duplicate["filename"],
+                    "bytes_saved": file_data["size"],
+                    "embeddings_saved": saved,
+                    "message": f"{file.filename} is already uploaded as {existing['name'] if existing else duplicate['filename']}",
+                }
+                continue
+        prepared.append(file_data)
+
+    events: queue.Queue = queue.Queue()
+    inserted_any = False
+    with ThreadPoolExecutor(max_workers=UPLOAD_MAX_CONCURRENT_FILES, thread_name_prefix="ingest") as pool:
+        futures = {
+            pool.submit(_ingest_file, file_data, description, author, events.put, keep_chunks, chunking_strategy): file_data
+            for file_data in prepared
+        }
+        pending = set(futures)
+        while pending or not events.empty():
+            try:
+                yield events.get(timeout=0.2)
+                continue
+            except queue.Empty:
+                pass
+            for future in [f for f in pending if f.done()]:
+                pending.discard(future)
+                file_data = futures[future]
+                try:
+                    os.remove(file_data["temp_path"])
+                except OSError as e:
+                    print(f"Warning: Could not remove temporary file {file_data['temp_path']}: {e}")
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed_count += 1
+                    yield {
+                        "status": "failed",
+                        "filename": file_data["filename"],
+                        "error": str(e),
+                        "progress": file_data["progress"],
+                        "successful_count": successful_count,
+                        "failed_count": failed_count,
+                        "message": f"Failed to ingest {file_data['filename']}: {str(e)}",
+                    }
+                    continue
+                successful_count += 1
+                failed_objects[file_data["filename"]] = result["failed_objects"]
+                inserted_any = inserted_any or result["inserted"] > 0
+                embeddings_saved += result["deduplicated"]
+                yield {
+                    "status": "success",
+                    "filename": file_data["filename"],
+                    "progress": file_data["progress"],
+                    "successful_count": successful_count,
+                    "failed_count": failed_count,
+                    "message": f"Successfully ingested {file_data['filename']}",
+                    "result": result,
+                }
+
+    if inserted_any:
+        invalidate_all_answer_caches()
+    if UPLOAD_DEDUP_ENABLED:
+        print(f"Deduplication: {dedup_stats.stats()}")
+
+    yield {
+        "status": "completed",
+        "total_files": total_files,
+        "successful_count": successful_count,
+        "failed_count": failed_count,
+        "duplicate_count": duplicate_count,
+        "bytes_saved": bytes_saved,
+        "embeddings_saved": embeddings_saved,
+        "failed_objects": failed_objects,
+        "message": f"Upload completed. {successful_count} successful, {failed_count} failed, {duplicate_count} duplicate",
+    }
+
+def upload_file(
+    files: List[FileStorage],
+    description: str,
+    author: str,
+    chunking_strategy: Optional[str] = None,
+) -> Tuple[List[dict], int]:
+    """Ingest uploaded PDFs and return (per-file results with chunks, total failed objects)."""
+    if not files:
+        raise Exception("No files uploaded")
+    for file in files:
+        if not allowed_file(file.filename):
+            raise Exception(f"File type not allowed for {file.filename}. Only PDF files are accepted.")
+
+    results = []
+    failed_objects = 0
+    for update in upload_files_streaming(files, description, author, keep_chunks=True, chunking_strategy=chunking_strategy):
+        if update["status"] == "failed":
+            raise Exception(update["error"])
+        if update["status"] == "duplicate":
+            results.append({
+                "filename": update["filename"],
+                "num_chunks": 0,
+                "chunks": [],
+                "file_id": update["file_id"],
+                "duplicate_of": update["duplicate_of"],
+            })
+        if update["status"] == "success":
+            result = update["result"]
+            failed_objects += result["failed_objects"]
+            results.append({
+                "filename": update["filename"],
+                "num_chunks": result["num_chunks"],
+                "chunks": result["chunks"],
+            })
+    return results, failed_objects
 
 # manage files
-def get_files(limit: int, offset: int) -> tuple[List[Dict[str, Any]], int]:
+def get_files(
+    limit: int,
+    offset: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
     """
     Get all files with pagination and total count
+
+    The first page and `cursor` pages use keyset pagination and return a
+    `next_cursor`; a non-zero `offset` keeps offset paging.
+
+    Returns:
+        Tuple of (files, total_count or None when not requested, next_cursor)
     """
+    properties = ["name", "path", "author", "created_at", "updated_at"]
     # Get files data
-    files = search_non_vector_collection(
-        collection_name=COLLECTION_FILES,
-        limit=limit,    
-        offset=offset,
-        properties=["name", "path", "author", "created_at", "updated_at"],
-        sort=Sort.by_property("created_at", ascending=True)
-    )
-    
+    next_cursor = None
+    if cursor or not offset:
+        files, next_cursor = search_non_vector_collection_page(
+            collection_name=COLLECTION_FILES,
+            limit=limit,
+            properties=properties,
+            sort_property="created_at",
+            ascending=True,
+            cursor=cursor,
+        )
+    else:
+        files = search_non_vector_collection(
+            collection_name=COLLECTION_FILES,
+            limit=limit,
+            offset=offset,
+            properties=properties,
+            sort=Sort.by_property("created_at", ascending=True)
+        )
+
     # Get total count
-    total_count = get_collection_count(
-        collection_name=COLLECTION_FILES
-    )
-    
+    total_count = get_collection_count_cached(
+        collection_name=COLLECTION_FILES,
+        cache_key=None,
+    ) if include_total else None
+
     files = [File(**file) for file in files]
-    return files, total_count
+    return files, total_count, next_cursor
 
 def create_file(file: File) -> str:
     """
@@ -88,6 +417,8 @@ def create_file(file: File) -> str:
             "name": file.name,
             "path": file.path,
             "author": file.author,
+            "content_hash": file.content_hash,
+            "size": file.size,
             "created_at": now,
             "updated_at": now
         }
@@ -101,7 +432,7 @@ def get_file_by_name(name: str) -> Optional[File]:
     file = search_non_vector_collection(
         collection_name=COLLECTION_FILES,
         filters=Filter.by_property("name").equal(name),
-        properties=["name", "path", "author", "created_at", "updated_at"],
+        properties=["name", "path", "author", "content_hash", "size", "created_at", "updated_at"],
         limit=1
     )
     if not file:
@@ -115,7 +446,7 @@ def get_file_by_id(file_id: str) -> File:
     file = search_non_vector_collection(
         collection_name=COLLECTION_FILES,
         filters=Filter.by_id().equal(file_id),
-        properties=["name", "path", "author", "created_at", "updated_at"],
+        properties=["name", "path", "author", "content_hash", "size", "created_at", "updated_at"],
         limit=1
     )
     if not file:
@@ -207,6 +538,7 @@ def delete_file_with_transaction(file_id: str) -> bool:
             collection_name=COLLECTION_FILES,
             uuid=file_id
         )
+        invalidate_all_answer_caches()
         
         return True
 
@@ -218,31 +550,169 @@ def delete_file(file_id: str) -> bool:
     """Delete a file and its associated documents in a transaction"""
     return delete_file_with_transaction(file_id)
 
+def reingest_file(
+    file_id: str,
+    file: FileStorage,
+    description: str,
+    author: str,
+    chunking_strategy: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Replace the content of a file with a new version, re-embedding only what changed.
+
+    The new version is chunked like an upload and every chunk is matched by
+    content hash against the file's existing Documents rows:
+
+    - same content on the same pages: the row is left alone (`unchanged`);
+    - same content on other pages: only the page range is updated (`moved`),
+      its vector is kept;
+    - new content: a row is inserted and embedded (`inserted`);
+    - rows matching no chunk of the new version are deleted (`deleted`).
+
+    Inserts happen before deletes, so the file is never without documents.
+
+    Returns:
+        Diff summary: file_id, chunks, unchanged, moved, inserted, deleted, failed_objects
+    """
+    if not file or not file.filename or not allowed_file(file.filename):
+        raise Exception("File type not allowed. Only PDF files are accepted.")
+    get_file_by_id(file_id)
+
+    temp_path = _save_upload(file)
+    try:
+        content_hash, size = file_digest(temp_path)
+        chunks = list(chunk_pdf_pages(iter_pdf_pages(temp_path), strategy=chunking_strategy))
+    finally:
+        os.remove(temp_path)
+
+    existing: Dict[str, List[Dict[str, Any]]] = {}
+    for row in iterate_collection(
+        COLLECTION_DOCUMENTS,
+        properties=["content", "content_hash", "page_start", "page_end"],
+        filters=Filter.by_property("file_id").equal(file_id),
+    ):
+        # Rows ingested before content_hash existed are hashed here and get it stored on update
+        existing.setdefault(row.get("content_hash") or text_hash(row.get("content") or ""), []).append(row)
+
+    unchanged = 0
+    moves = []
+    new_documents = []
+    for chunk in chunks:
+        chunk_hash = text_hash(chunk.page_content)
+        page_start, page_end = chunk.metadata.get("page_start"), chunk.metadata.get("page_end")
+        rows = existing.get(chunk_hash)
+        if not rows:
+            new_documents.append({
+                "content": chunk.page_content,
+                "title": file.filename,
+                "file_id": file_id,
+                "description": description,
+                "author": author,
+                "page_start": page_start,
+                "page_end": page_end,
+            })
+            continue
+        # Prefer the row already on these pages, so a repeated passage isn't shuffled around
+        row = next((r for r in rows if r.get("page_start") == page_start and r.get("page_end") == page_end), rows[0])
+        rows.remove(row)
+        if row.get("content_hash") and row.get("page_start") == page_start and row.get("page_end") == page_end:
+            unchanged += 1
+        else:
+            moves.append((row, {"page_start": page_start, "page_end": page_end, "content_hash": chunk_hash}))
+
+    failed_objects = 0
+    for start in range(0, len(new_documents), UPLOAD_BATCH_SIZE):
+        batch = new_documents[start:start + UPLOAD_BATCH_SIZE]
+        reused = _reuse_vectors(batch)
+        dedup_stats.record(duplicate_chunks=reused, embeddings_saved=reused)
+        failed_objects += len(upload_documents(batch))
+
+    stale = [row["uuid"] for rows in existing.values() for row in rows]
+    for start in range(0, len(stale), UPLOAD_BATCH_SIZE):
+        delete_collection_objects_many(
+            collection_name=COLLECTION_DOCUMENTS,
+            filters=Filter.by_id().contains_any(stale[start:start + UPLOAD_BATCH_SIZE]),
+        )
+
+    for row, properties in moves:
+        # None of these properties is vectorized, so the stored vector is kept
+        update_collection_object(COLLECTION_DOCUMENTS, row["uuid"], properties)
+
+    update_collection_object(
+        collection_name=COLLECTION_FILES,
+        uuid=file_id,
+        properties={
+            "content_hash": content_hash,
+            "size": size,
+            "updated_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        },
+    )
+    if new_documents or stale or moves:
+        invalidate_all_answer_caches()
+
+    summary = {
+        "file_id": file_id,
+        "chunks": len(chunks),
+        "unchanged": unchanged,
+        "moved": len(moves),
+        "inserted": len(new_documents) - failed_objects,
+        "deleted": len(stale),
+        "failed_objects": failed_objects,
+    }
+    print(f"Re-ingested file {file_id}: {summary}")
+    return summary
+
 # manage documents 
 
-def get_documents(limit: int, offset: int) -> tuple[List[Dict[str, Any]], int]:
+def get_documents(
+    limit: int,
+    offset: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
     """
     Get all documents with pagination and total count
-    
+
+    The first page and `cursor` pages use keyset pagination and return a
+    `next_cursor`; a non-zero `offset` keeps offset paging.
+
     Returns:
-        Tuple of (documents, total_count)
+        Tuple of (documents, total_count or None when not requested, next_cursor)
+
+    Raises:
+        InvalidCursorError: if `cursor` is not a token returned by this endpoint
     """
+    properties = ["title", "content", "description", "author", "created_at", "updated_at"]
     try:
         # Get documents data
-        documents = search_non_vector_collection(
-            collection_name=COLLECTION_DOCUMENTS,
-            limit=limit,
-            offset=offset,
-            properties=["title", "content", "description", "author", "created_at", "updated_at"],
-            sort=Sort.by_property("created_at", ascending=True)
-        )
-        
+        next_cursor = None
+        if cursor or not offset:
+            documents, next_cursor = search_non_vector_collection_page(
+                collection_name=COLLECTION_DOCUMENTS,
+                limit=limit,
+                properties=properties,
+                sort_property="created_at",
+                ascending=True,
+                cursor=cursor,
+            )
+        else:
+            documents = search_non_vector_collection(
+                collection_name=COLLECTION_DOCUMENTS,
+                limit=limit,
+                offset=offset,
+                properties=properties,
+                sort=Sort.by_property("created_at", ascending=True)
+            )
+
         # Get total count
-        total_count = get_collection_count(
-            collection_name=COLLECTION_DOCUMENTS
-        )
-        
-        return documents, total_count
+        total_count = get_collection_count_cached(
+            collection_name=COLLECTION_DOCUMENTS,
+            cache_key=None,
+        ) if include_total else None
+
+        return documents, total_count, next_cursor
+    except InvalidCursorError:
+        raise
     except Exception as e:
         raise Exception(f"Error getting documents: {str(e)}")
 
@@ -311,6 +781,7 @@ def create_document(document: Document) -> Document:
         
         if not document_id:
             raise Exception("Failed to create document")
+        invalidate_all_answer_caches()
             
         # Set the ID and return the document
         document.uuid = document_id
@@ -372,6 +843,7 @@ def update_document(document_id: str, payload: Document) -> Document:
         
         if not success:
             raise Exception("Failed to update document")
+        invalidate_all_answer_caches()
 
         return update_document
         
@@ -407,6 +879,7 @@ def delete_document(document_id: str) -> bool:
         
         if not success:
             raise Exception("Failed to delete document")
+        invalidate_all_answer_caches()
             
         return True
         